@@ -7,7 +7,7 @@ from starlette.requests import Request
 from app.api.dependencies.database import get_new_async_conn
 from app.core.config import API_PREFIX, DOMAIN, ROOT_PATH, UNIQUE_KEY
 from app.db.gen.queries import models
-from app.db.gen.queries.users import GetUserRow
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
 from app.services import auth_service
 from app.services.authorization import ROLE_PERMISSIONS
 from app.services.users import UsersService
@@ -24,12 +24,17 @@ async def get_user_from_token(
     token: str = Depends(oauth2_scheme),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
+    """
+    Resolved once per request, since FastAPI caches dependencies, on the same connection as the route.
+    Repeated requests with the same token are served from memory for ``AUTH_USER_CACHE_TTL`` seconds.
+    """
     users_service = UsersService(conn)
     try:
-        username = auth_service.get_username_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
-        if not username:
+        await auth_service.refresh_revocation_epoch()
+        payload = auth_service.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+        if not payload.username:
             return None
-        user = await users_service.get_user_by_username(username=username)
+        user = await users_service.get_authenticated_user(username=payload.username, issued_at=payload.iat)
         if not user:
             return None
     except Exception as e:
@@ -40,7 +45,7 @@ async def get_user_from_token(
 
 async def get_current_active_user(
     request: Request,
-    current_user: GetUserRow = Depends(get_user_from_token),
+    current_user: GetAuthUserByUsernameRow = Depends(get_user_from_token),
 ):
     if not current_user:
         raise HTTPException(
@@ -60,7 +65,7 @@ async def get_current_active_user(
 
 async def email_is_verified(
     request: Request,
-    current_user: GetUserRow = Depends(get_current_active_user),
+    current_user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
 ):
     if not current_user.is_verified:
         raise HTTPException(
@@ -73,7 +78,7 @@ class RoleVerifier:
     def __init__(self, required_role: models.Role):
         self.required_role = required_role
 
-    def __call__(self, request: Request, current_user: GetUserRow = Depends(get_user_from_token)) -> None:
+    def __call__(self, request: Request, current_user: GetAuthUserByUsernameRow = Depends(get_user_from_token)) -> None:
         if self.required_role not in ROLE_PERMISSIONS[current_user.role]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,7 @@
+from starlette.requests import Request
+
+from app.stream.checker import NotificationsChecker
+
+
+def get_notifications_checker(request: Request) -> NotificationsChecker:
+    return request.app.state._notifications_checker
@@ -16,7 +16,7 @@ async def get_user_by_username_from_path(
 ) -> UserPublic:
     raise NotImplementedError
     users_service = UsersService(conn)
-    user = await users_repo.get_user_by_username(username=username, get_db_data=True)
+    user = await users_repo.get_user_by_username(username=username)
 
     if not user:
         raise HTTPException(
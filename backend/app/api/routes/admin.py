@@ -1,4 +1,6 @@
-from fastapi import Depends, Path, Response
+from typing import Optional
+
+from fastapi import Depends, Path, Query, Response
 from fastapi.exceptions import HTTPException
 from fastapi.param_functions import Body
 from fastapi.routing import APIRouter
@@ -10,45 +12,94 @@ from starlette import status
 from app.api.dependencies.auth import RoleVerifier
 from app.api.dependencies.database import get_new_async_conn
 from app.api.routes.utils.errors import exception_handler
-from app.db.gen.queries import models
+from app.api.routes.utils.streaming import json_array_response
+from app.core.cache import response_cache
+from app.core.locks import lock_metrics
 from app.db.gen.queries.global_notifications import (
     CreateGlobalNotificationParams,
 )
 from app.db.gen.queries.models import PasswordResetRequest, Role
-from app.models.user import RoleUpdate
+from app.db.gen.queries.personal_notifications import (
+    CreatePersonalNotificationsParams,
+)
+from app.db.gen.queries.users import ListAllUsersRow, SearchUsersRow
+from app.models.global_notifications import NotificationsBulkCreated
+from app.models.user import RoleUpdate, UserVerification
+from app.services.authentication import password_hashing_executor
 from app.services.global_notifications import GlobalNotificationsService
 from app.services.password_reset_requests import PwdResetReqService
-from app.services.users import UsersService
+from app.services.personal_notifications import PersonalNotificationsService
+from app.services.users import UsersService, authenticated_users_cache
+from app.stream import registry
 
 router = APIRouter()
 
 
 @router.get(
     "/users/",
-    response_model=list[models.User],
+    response_model=list[ListAllUsersRow],
     name="admin:list-users",
     status_code=status.HTTP_200_OK,
 )
 async def list_all_users(
+    after_user_id: int = Query(
+        0,
+        ge=0,
+        description="user_id of the last user of the previous page. Omit it to start from the first user.",
+    ),
+    page_size: Optional[int] = Query(None, ge=1, description="Number of users to retrieve. Omit it to get every user."),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
     users_service = UsersService(conn)
-    async with exception_handler(conn):
-        return await users_service.list_all_users()
+    return await json_array_response(
+        users_service.stream_users(after_user_id=after_user_id, page_size=page_size),
+        conn=conn,
+    )
+
+
+@router.get(
+    "/users/search/",
+    response_model=list[SearchUsersRow],
+    name="admin:search-users",
+    status_code=status.HTTP_200_OK,
+)
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=200),
+    after_rank: Optional[float] = Query(
+        None,
+        description="rank of the last user of the previous page. Omit it to start from the most similar user.",
+    ),
+    after_user_id: int = Query(0, ge=0, description="user_id of the last user of the previous page."),
+    page_size: int = Query(20, ge=1, le=100),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    return await json_array_response(
+        users_service.search_users(query=q, after_rank=after_rank, after_user_id=after_user_id, page_size=page_size),
+        conn=conn,
+    )
 
 
 @router.get(
     "/users-unverified/",
-    response_model=list[models.User],
+    response_model=list[ListAllUsersRow],
     name="admin:list-unverified-users",
     status_code=status.HTTP_200_OK,
 )
 async def list_unverified_users(
+    after_user_id: int = Query(
+        0,
+        ge=0,
+        description="user_id of the last user of the previous page. Omit it to start from the first user.",
+    ),
+    page_size: Optional[int] = Query(None, ge=1, description="Number of users to retrieve. Omit it to get every user."),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
     users_service = UsersService(conn)
-    async with exception_handler(conn):
-        return await users_service.list_all_users(is_verified=False)
+    return await json_array_response(
+        users_service.stream_users(is_verified=False, after_user_id=after_user_id, page_size=page_size),
+        conn=conn,
+    )
 
 
 @router.post(
@@ -66,6 +117,20 @@ async def verify_user_by_email(
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@router.post(
+    "/users-unverified/bulk/",
+    response_model=list[UserVerification],
+    name="admin:verify-users-by-email-bulk",
+    status_code=status.HTTP_200_OK,
+)
+async def verify_users_by_email_bulk(
+    user_emails: list[str] = Body(..., embed=True),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    return await json_array_response(users_service.stream_verify_users(user_emails=user_emails), conn=conn)
+
+
 @router.get(
     "/reset-user-password/",
     response_model=list[PasswordResetRequest],
@@ -132,6 +197,36 @@ async def create_global_notification(
         return await gn_service.create_global_notification(notification=notification)
 
 
+@router.post(
+    "/create-global-notifications/",
+    response_model=NotificationsBulkCreated,
+    name="admin:create-global-notifications-bulk",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_global_notifications_bulk(
+    notifications: list[CreateGlobalNotificationParams] = Body(..., embed=True),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    gn_service = GlobalNotificationsService(conn)
+    async with exception_handler(conn):
+        return await gn_service.create_global_notifications_bulk(notifications=notifications)
+
+
+@router.post(
+    "/create-personal-notifications/",
+    response_model=NotificationsBulkCreated,
+    name="admin:create-personal-notifications-bulk",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_personal_notifications_bulk(
+    notifications: CreatePersonalNotificationsParams = Body(..., embed=True),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    pn_service = PersonalNotificationsService(conn)
+    async with exception_handler(conn):
+        return await pn_service.create_personal_notifications_bulk(notifications=notifications)
+
+
 @router.delete(
     "/delete-global-notification/{id}/",
     name="admin:delete-global-notification",
@@ -160,3 +255,18 @@ async def update_user_role(
     users_service = UsersService(conn)
     async with exception_handler(conn):
         await users_service.update_user_role(role_update=role_update)
+
+
+@router.get(
+    "/metrics/",
+    name="admin:get-metrics",
+    status_code=status.HTTP_200_OK,
+)
+async def get_metrics():
+    return {
+        "password_hashing": password_hashing_executor.stats(),
+        "authenticated_users_cache": authenticated_users_cache.stats(),
+        "locks": lock_metrics.stats(),
+        "response_cache": response_cache.stats(),
+        "streams": {"open": len(registry), "listening": registry.listening},
+    }
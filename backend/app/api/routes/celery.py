@@ -1,12 +1,14 @@
 from celery.result import AsyncResult
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query
 from starlette.status import HTTP_202_ACCEPTED
 
 from app.api.dependencies.auth import RoleVerifier, email_is_verified
 from app.api.routes.utils.errors import task_exception_handler
+from app.celery.locking import get_task_progress
 from app.celery.models import TaskAccepted, TaskStatus, TaskType
 from app.celery.worker import celery_app
 from app.db.gen.queries.models import Role
+from app.models.global_notifications import PersonalNotificationFanOut
 
 router = APIRouter()
 
@@ -24,8 +26,10 @@ def get_status(task_id):
         # task_type=task_result.task_type,
         task_status=task_result.status,
         task_result=task_result.result,
+        task_progress=get_task_progress(task_id),
     )
 
+
 @router.get(
     "/vacuum-analyze/",
     status_code=HTTP_202_ACCEPTED,
@@ -37,3 +41,42 @@ def run_vacuum_analyze_task():
     with task_exception_handler():
         task = celery_app.send_task("vacuum_analyze_task")
         return TaskAccepted(task_id=task.id, task_type=TaskType.VACUUM_ANALYZE)
+
+
+@router.get(
+    "/rebuild-user-notification-state/",
+    status_code=HTTP_202_ACCEPTED,
+    response_model=TaskAccepted,
+    name="celery:rebuild-user-notification-state",
+    dependencies=[Depends(RoleVerifier(Role.ADMIN))],
+)
+def run_rebuild_user_notification_state_task():
+    with task_exception_handler():
+        task = celery_app.send_task("rebuild_user_notification_state_task")
+        return TaskAccepted(task_id=task.id, task_type=TaskType.REBUILD_USER_NOTIFICATION_STATE)
+
+
+@router.get(
+    "/manage-personal-notifications-partitions/",
+    status_code=HTTP_202_ACCEPTED,
+    response_model=TaskAccepted,
+    name="celery:manage-personal-notifications-partitions",
+    dependencies=[Depends(RoleVerifier(Role.ADMIN))],
+)
+def run_manage_personal_notifications_partitions_task():
+    with task_exception_handler():
+        task = celery_app.send_task("manage_personal_notifications_partitions_task")
+        return TaskAccepted(task_id=task.id, task_type=TaskType.MANAGE_PERSONAL_NOTIFICATIONS_PARTITIONS)
+
+
+@router.post(
+    "/fan-out-personal-notification/",
+    status_code=HTTP_202_ACCEPTED,
+    response_model=TaskAccepted,
+    name="celery:fan-out-personal-notification",
+    dependencies=[Depends(RoleVerifier(Role.ADMIN))],
+)
+def run_fan_out_personal_notification_task(fan_out: PersonalNotificationFanOut = Body(..., embed=True)):
+    with task_exception_handler():
+        task = celery_app.send_task("fan_out_personal_notification_task", kwargs={"fan_out": fan_out.dict()})
+        return TaskAccepted(task_id=task.id, task_type=TaskType.FAN_OUT_PERSONAL_NOTIFICATION)
@@ -3,12 +3,14 @@ from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.api.dependencies.auth import get_current_active_user
 from app.api.dependencies.database import get_async_conn
+from app.api.routes.utils.caching import cached_response
 from app.api.routes.utils.errors import exception_handler
 from app.db.gen.queries.models import Profile
 from app.db.gen.queries.profiles import UpdateProfileParams
-from app.db.gen.queries.users import GetUserRow
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
 from app.models.profile import ProfileUpdate
 from app.services.profiles import ProfilesService
+from app.services.users import UsersService
 
 router = APIRouter()
 
@@ -18,6 +20,7 @@ router = APIRouter()
     response_model=Profile,
     name="profiles:get-profile-by-username",
 )
+@cached_response(response_model=Profile, tags=lambda profile: [UsersService.get_cache_tag(user_id=profile.user_id)])
 async def get_profile_by_username(
     username: str = Path(..., min_length=3, regex="^[a-zA-Z0-9_-]+$"),
     conn: AsyncConnection = Depends(get_async_conn),
@@ -40,7 +43,7 @@ async def get_profile_by_username(
 )
 async def update_own_profile(
     profile_update: ProfileUpdate = Body(..., embed=True),
-    current_user: GetUserRow = Depends(get_current_active_user),
+    current_user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
     conn: AsyncConnection = Depends(get_async_conn),
 ):
     profiles_service = ProfilesService(conn)
@@ -6,15 +6,15 @@ from typing import AsyncGenerator
 from fastapi import Depends, Query, Request
 from fastapi.routing import APIRouter
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncConnection
 from sse_starlette import EventSourceResponse
 
 from app.api.dependencies.auth import get_user_from_token
-from app.api.dependencies.database import get_new_async_conn
+from app.api.dependencies.stream import get_notifications_checker
 from app.api.routes.utils.errors import exception_handler
-from app.core.config import is_testing
-from app.services.global_notifications import GlobalNotificationsService
-from app.services.personal_notifications import PersonalNotificationsService
+from app.core.config import UNIQUE_KEY
+from app.services import auth_service
+from app.stream import registry
+from app.stream.checker import NotificationsChecker
 
 router = APIRouter()
 
@@ -30,60 +30,68 @@ async def event_publisher(
     max_messages,
     token,
     request: Request,
-    global_notif_service: GlobalNotificationsService,
-    personal_notif_service: PersonalNotificationsService,
-    conn: AsyncConnection,
+    checker: NotificationsChecker,
     send_stream=None,
 ) -> AsyncGenerator:
     i = 0
     try:
-        while True and (not max_messages or i < max_messages):
-            try:
+        try:
+            async with checker.connect() as conn:
                 user = await get_user_from_token(request, token=token, conn=conn)  # dont use  request.app.state._conn
-                if not user:
-                    raise Exception
-            except Exception as e:
-                yield json.dumps(
-                    dict(
-                        message="Unauthenticated.",
-                    )
-                )
-                return
-            logger.debug(f"user: {user}")
-            disconnected = await request.is_disconnected()
-            if not user or disconnected:
-                logger.info(f"Disconnecting client {request.client}.")
-                break
-            has_new_global_notifications = await global_notif_service.has_new_global_notifications(
-                user_id=user.user_id, role=user.role
-            )
-            has_new_personal_notifications = await personal_notif_service.has_new_personal_notifications(
-                last_personal_notification_at=user.last_personal_notification_at, user=user
-            )
+            if not user:
+                raise Exception
+        except Exception as e:
             yield json.dumps(
                 dict(
-                    id=f"{user.email}-{datetime.utcnow().isoformat()}",
-                    has_new_global_notifications=f"{'true' if has_new_global_notifications else 'false'}",
-                    has_new_personal_notifications=f"{'true' if has_new_personal_notifications else 'false'}",
+                    message="Unauthenticated.",
                 )
             )
-            i += 1
-            await conn.commit()
-            await asyncio.sleep(MESSAGE_STREAM_DELAY)  # seconds
+            return
+        with registry.subscription(email=user.email, role=user.role) as subscriber:
+            # only query when notified of a change, unless change events aren't being received
+            stale = True
+            while True and (not max_messages or i < max_messages):
+                try:
+                    if i and (stale or not registry.listening):
+                        async with checker.connect() as conn:
+                            user = await get_user_from_token(request, token=token, conn=conn)
+                    else:
+                        # token may have expired in the meantime
+                        auth_service.get_username_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+                    if not user:
+                        raise Exception
+                except Exception as e:
+                    yield json.dumps(
+                        dict(
+                            message="Unauthenticated.",
+                        )
+                    )
+                    return
+                logger.debug(f"user: {user}")
+                disconnected = await request.is_disconnected()
+                if not user or disconnected:
+                    logger.info(f"Disconnecting client {request.client}.")
+                    break
+                if stale or not registry.listening:
+                    state = await checker.check(user=user)
+                yield json.dumps(
+                    dict(
+                        id=f"{user.email}-{datetime.utcnow().isoformat()}",
+                        has_new_global_notifications=f"{'true' if state.has_new_global_notifications else 'false'}",
+                        has_new_personal_notifications=f"{'true' if state.has_new_personal_notifications else 'false'}",
+                        unread_global_count=state.unread_global_count,
+                        unread_personal_count=state.unread_personal_count,
+                    )
+                )
+                i += 1
+                stale = await subscriber.wait_for_change(timeout=MESSAGE_STREAM_DELAY)
         logger.info(f"Disconnected from client {request.client}")
     except asyncio.CancelledError as e:
         logger.info(f"Disconnected from client (via refresh/close) {request.client}")
-        # Do any other cleanup, if any
-        await conn.rollback()
         raise e from e
     except Exception as e:
         logger.info(f"{request.client} - Exception: {e}")
-        await conn.rollback()
         raise e from e
-    finally:
-        if conn and not is_testing():
-            logger.critical(f"Closing conn in event_publisher: {id(conn)}")
-            await conn.close()
 
 
 # DEPRECATED
@@ -100,19 +108,15 @@ async def global_notifications_see(
     request: Request,
     token: str = Query("", description="token"),
     max_messages: int = Query(0, description="Max number of messages to return"),
-    conn: AsyncConnection = Depends(get_new_async_conn),
+    checker: NotificationsChecker = Depends(get_notifications_checker),
 ):
-    global_notif_service = GlobalNotificationsService(conn)
-    personal_notif_service = PersonalNotificationsService(conn)
     async with exception_handler():
         return EventSourceResponse(
             event_publisher(
                 max_messages=max_messages,
                 token=token,
                 request=request,
-                global_notif_service=global_notif_service,
-                personal_notif_service=personal_notif_service,
-                conn=conn,
+                checker=checker,
             ),
             media_type="text/event-stream",
         )
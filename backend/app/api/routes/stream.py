@@ -8,15 +8,17 @@ from fastapi import Depends, Query, Request
 from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncConnection
 
-from app.api.dependencies.auth import get_current_active_user
-from app.api.dependencies.database import get_new_async_conn
+from app.api.dependencies.auth import (
+    get_current_active_user,
+    get_user_from_token,
+    oauth2_scheme,
+)
+from app.api.dependencies.stream import get_notifications_checker
 from app.api.routes.utils.errors import exception_handler
-from app.core.config import is_testing
-from app.db.gen.queries.users import GetUserRow
-from app.services.global_notifications import GlobalNotificationsService
-from app.services.personal_notifications import PersonalNotificationsService
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
+from app.stream import registry
+from app.stream.checker import NotificationsChecker
 
 router = APIRouter()
 
@@ -27,51 +29,42 @@ MESSAGE_STREAM_RETRY_TIMEOUT = 15000  # milisecond
 
 async def event_publisher(
     *,
-    user: GetUserRow,
+    user: GetAuthUserByUsernameRow,
     max_messages,
     request: Request,
-    global_notif_service: GlobalNotificationsService,
-    personal_notif_service: PersonalNotificationsService,
-    conn: AsyncConnection,
+    checker: NotificationsChecker,
     send_stream=None,
 ) -> AsyncGenerator:
     i = 0
     try:
-        while True and (not max_messages or i < max_messages):
-            disconnected = await request.is_disconnected()
-            if not user or disconnected:
-                logger.info(f"Disconnecting client {request.client}.")
-                break
-            has_new_global_notifications = await global_notif_service.has_new_global_notifications(
-                user_id=user.user_id, role=user.role
-            )
-            has_new_personal_notifications = await personal_notif_service.has_new_personal_notifications(
-                last_personal_notification_at=user.last_personal_notification_at, user=user
-            )
-            yield json.dumps(
-                dict(
-                    id=f"{user.email}-{datetime.utcnow().isoformat()}",
-                    has_new_global_notifications=f"{'true' if has_new_global_notifications else 'false'}",
-                    has_new_personal_notifications=f"{'true' if has_new_personal_notifications else 'false'}",
+        with registry.subscription(email=user.email, role=user.role) as subscriber:
+            # only query when notified of a change, unless change events aren't being received
+            stale = True
+            while True and (not max_messages or i < max_messages):
+                disconnected = await request.is_disconnected()
+                if not user or disconnected:
+                    logger.info(f"Disconnecting client {request.client}.")
+                    break
+                if stale or not registry.listening:
+                    state = await checker.check(user=user)
+                yield json.dumps(
+                    dict(
+                        id=f"{user.email}-{datetime.utcnow().isoformat()}",
+                        has_new_global_notifications=f"{'true' if state.has_new_global_notifications else 'false'}",
+                        has_new_personal_notifications=f"{'true' if state.has_new_personal_notifications else 'false'}",
+                        unread_global_count=state.unread_global_count,
+                        unread_personal_count=state.unread_personal_count,
+                    )
                 )
-            )
-            i += 1
-            await conn.commit()
-            await asyncio.sleep(MESSAGE_STREAM_DELAY)  # seconds
+                i += 1
+                stale = await subscriber.wait_for_change(timeout=MESSAGE_STREAM_DELAY)
         logger.info(f"Disconnected from client {request.client}")
     except asyncio.CancelledError as e:
         logger.info(f"Disconnected from client (via refresh/close) {request.client}")
-        # Do any other cleanup, if any
-        await conn.rollback()
         raise e from e
     except Exception as e:
         logger.info(f"{request.client} - Exception: {e}")
-        await conn.rollback()
         raise e from e
-    finally:
-        if conn and not is_testing():
-            logger.critical(f"Closing conn in event_publisher: {id(conn)}")
-            await conn.close()
 
 
 @router.get(
@@ -81,21 +74,22 @@ async def event_publisher(
 )
 async def global_notifications_stream(
     request: Request,
-    current_user: GetUserRow = Depends(get_current_active_user),
+    token: str = Depends(oauth2_scheme),
     max_messages: int = Query(0, description="Max number of messages to return"),
-    conn: AsyncConnection = Depends(get_new_async_conn),
+    checker: NotificationsChecker = Depends(get_notifications_checker),
 ):
-    global_notif_service = GlobalNotificationsService(conn)
-    personal_notif_service = PersonalNotificationsService(conn)
+    # the connection is only borrowed to authenticate, streams must not hold one for their whole lifetime
+    async with checker.connect() as conn:
+        current_user = await get_current_active_user(
+            request, current_user=await get_user_from_token(request, token=token, conn=conn)
+        )
     async with exception_handler():
         return StreamingResponse(
             event_publisher(
                 user=current_user,
                 max_messages=max_messages,
                 request=request,
-                global_notif_service=global_notif_service,
-                personal_notif_service=personal_notif_service,
-                conn=conn,
+                checker=checker,
             ),
             media_type="text/event-stream",
             headers={
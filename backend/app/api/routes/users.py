@@ -1,5 +1,6 @@
 import pathlib
 from datetime import datetime, timedelta
+from typing import Optional
 
 from fastapi import (
     APIRouter,
@@ -30,6 +31,7 @@ from app.api.dependencies.auth import (
     get_current_active_user,
 )
 from app.api.dependencies.database import get_new_async_conn
+from app.api.routes.utils.caching import cached_response
 from app.api.routes.utils.errors import exception_handler
 from app.core.config import ADMIN_EMAIL
 from app.db.gen.queries.global_notifications import (
@@ -43,10 +45,15 @@ from app.db.gen.queries.personal_notifications import (
     CreatePersonalNotificationParams,
     GetPersonalNotificationsByStartingDateParams,
 )
-from app.db.gen.queries.users import GetUserRow
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
 from app.models.global_notifications import (
     GlobalNotificationFeedItem,
+    GlobalNotificationsFeedPage,
+    GlobalNotificationsSearchResults,
     PersonalNotificationFeedItem,
+    PersonalNotificationsFeedPage,
+    PersonalNotificationsSearchResults,
+    UnreadNotificationCounts,
 )
 from app.models.token import AccessToken
 from app.models.user import UserCreate, UserPublic, UserUpdate
@@ -121,11 +128,14 @@ async def register_new_user(
     dependencies=[Depends(email_is_verified)],
 )
 async def get_currently_authenticated_user(
-    current_user: GetUserRow = Depends(get_current_active_user),
+    current_user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
 ) -> UserPublic:
-    async with exception_handler():
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
         logger.info(f"User logged in: {current_user.email}")
-        return jsonable_encoder(current_user)
+        # the authenticated user is resolved without its profile
+        return jsonable_encoder(await users_service.get_user_by_id(user_id=current_user.user_id))
 
 
 @router.put(
@@ -136,7 +146,7 @@ async def get_currently_authenticated_user(
     dependencies=[Depends(email_is_verified)],
 )
 async def update_user_by_id(
-    current_user: GetUserRow = Depends(get_current_active_user),
+    current_user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
     user_update: UserUpdate = Body(..., embed=True),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
@@ -187,7 +197,7 @@ async def request_password_reset(
     users_service = UsersService(conn)
     password_reset_requests_service = PwdResetReqService(conn)
     async with exception_handler(conn):
-        user = await users_service.get_user_by_email(email=reset_request.email, get_db_data=True)
+        user = await users_service.get_user_by_email(email=reset_request.email)
         if not user:
             raise HTTPException(
                 status_code=HTTP_404_NOT_FOUND,
@@ -212,7 +222,7 @@ async def get_notification_feed_for_user_by_date(
         datetime.utcnow() + timedelta(minutes=1),
         description="Used to determine the timestamp at which to begin querying for notification feed items.",
     ),
-    user: GetUserRow = Depends(get_current_active_user),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
     users_service = UsersService(conn)
@@ -229,6 +239,60 @@ async def get_notification_feed_for_user_by_date(
         )
 
 
+@router.get(
+    "/global-notifications/feed/",
+    response_model=GlobalNotificationsFeedPage,
+    name="users:get-global-notifications-feed",
+)
+@cached_response(
+    response_model=GlobalNotificationsFeedPage,
+    tags=lambda _: [GlobalNotificationsService.cache_tag],
+    vary=lambda kwargs: kwargs["user"].role,
+    # the first page marks notifications as seen
+    skip=lambda kwargs: kwargs["cursor"] is None,
+)
+async def get_global_notifications_feed(
+    page_chunk_size: int = Query(
+        GlobalNotificationsService.page_chunk_size,
+        ge=1,
+        le=50,
+        description="Number of notifications to retrieve",
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="next_cursor of the previous page. Omit it to get the latest notifications.",
+    ),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
+        return await users_service.fetch_global_notifications_feed(
+            user=user, cursor=cursor, page_chunk_size=page_chunk_size
+        )
+
+
+@router.get(
+    "/global-notifications/search/",
+    response_model=GlobalNotificationsSearchResults,
+    name="users:search-global-notifications",
+)
+async def search_global_notifications(
+    q: str = Query(..., min_length=1, max_length=200, description='Web search style query, e.g. "security -update"'),
+    page_chunk_size: int = Query(
+        GlobalNotificationsService.page_chunk_size,
+        ge=1,
+        le=50,
+        description="Number of notifications to retrieve",
+    ),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
+        return await users_service.search_global_notifications(user=user, query=q, page_chunk_size=page_chunk_size)
+
+
 @router.get(
     "/personal-notifications/",
     response_model=list[PersonalNotificationFeedItem],
@@ -245,7 +309,7 @@ async def get_personal_notification_feed_for_user_by_date(
         datetime.utcnow() + timedelta(minutes=1),
         description="Used to determine the timestamp at which to begin querying for notification feed items.",
     ),
-    user: GetUserRow = Depends(get_current_active_user),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
     conn: AsyncConnection = Depends(get_new_async_conn),
 ):
     users_service = UsersService(conn)
@@ -262,6 +326,74 @@ async def get_personal_notification_feed_for_user_by_date(
         )
 
 
+@router.get(
+    "/personal-notifications/feed/",
+    response_model=PersonalNotificationsFeedPage,
+    name="users:get-personal-notifications-feed",
+)
+@cached_response(
+    response_model=PersonalNotificationsFeedPage,
+    tags=lambda _: [PersonalNotificationsService.cache_tag],
+    vary=lambda kwargs: kwargs["user"].email,
+    # the first page marks notifications as seen
+    skip=lambda kwargs: kwargs["cursor"] is None,
+)
+async def get_personal_notifications_feed(
+    page_chunk_size: int = Query(
+        PersonalNotificationsService.page_chunk_size,
+        ge=1,
+        le=50,
+        description="Number of notifications to retrieve",
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="next_cursor of the previous page. Omit it to get the latest notifications.",
+    ),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
+        return await users_service.fetch_personal_notifications_feed(
+            user=user, cursor=cursor, page_chunk_size=page_chunk_size
+        )
+
+
+@router.get(
+    "/personal-notifications/search/",
+    response_model=PersonalNotificationsSearchResults,
+    name="users:search-personal-notifications",
+)
+async def search_personal_notifications(
+    q: str = Query(..., min_length=1, max_length=200, description='Web search style query, e.g. "security -update"'),
+    page_chunk_size: int = Query(
+        PersonalNotificationsService.page_chunk_size,
+        ge=1,
+        le=50,
+        description="Number of notifications to retrieve",
+    ),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
+        return await users_service.search_personal_notifications(user=user, query=q, page_chunk_size=page_chunk_size)
+
+
+@router.get(
+    "/notifications/unread-counts/",
+    response_model=UnreadNotificationCounts,
+    name="users:get-unread-notification-counts",
+)
+async def get_unread_notification_counts(
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
+    conn: AsyncConnection = Depends(get_new_async_conn),
+):
+    users_service = UsersService(conn)
+    async with exception_handler(conn):
+        return await users_service.get_unread_notification_counts(user_id=user.user_id)
+
+
 @router.post(
     "/create-personal-notification/",
     name="users:create-personal-notification",
@@ -271,7 +403,7 @@ async def get_personal_notification_feed_for_user_by_date(
 async def create_personal_notification(
     notification: CreatePersonalNotificationParams = Body(..., embed=True),
     conn: AsyncConnection = Depends(get_new_async_conn),
-    user: GetUserRow = Depends(get_current_active_user),
+    user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
 ):
     if user.email != notification.sender:
         raise HTTPException(
@@ -292,7 +424,7 @@ async def create_personal_notification(
 async def delete_personal_notification(
     id: int = Path(..., ge=1),
     conn: AsyncConnection = Depends(get_new_async_conn),
-    current_user: GetUserRow = Depends(get_current_active_user),
+    current_user: GetAuthUserByUsernameRow = Depends(get_current_active_user),
 ):
     pn_service = PersonalNotificationsService(conn)
     async with exception_handler(conn):
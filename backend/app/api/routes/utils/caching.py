@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import inspect
+import json
+from typing import Any, Callable, Iterable, Optional, Type
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.status import HTTP_304_NOT_MODIFIED
+
+from app.core.cache import TwoTierCache, response_cache
+
+
+def get_etag(body: str) -> str:
+    return f'"{hashlib.blake2b(body.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def get_cache_key(request: Request, vary: str = "") -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}|{vary}"
+
+
+def cached_response(
+    *,
+    response_model: Type[BaseModel],
+    tags: Callable[[Any], Iterable[str]],
+    vary: Optional[Callable[[dict[str, Any]], Any]] = None,
+    skip: Optional[Callable[[dict[str, Any]], bool]] = None,
+    cache: TwoTierCache = response_cache,
+):
+    """
+    Serve the JSON response of a route from ``cache``, keyed by its path, query and ``vary``,
+    which is called with the route's arguments, e.g. to cache a response per user role.
+
+    The response is tagged with ``tags(result)`` so that writes can invalidate it, and is not cached
+    if they were invalidated while the route was running.
+    Routes with side effects must ``skip`` caching for those requests.
+
+    Responses carry an ETag, so that clients revalidating with ``If-None-Match`` get a 304
+    without a body. Responses are returned directly, so the route result is filtered through
+    ``response_model`` here instead of by FastAPI.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        pass_request = "request" in signature.parameters
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"] if pass_request else kwargs.pop("request")
+            if skip is not None and skip(kwargs):
+                return await func(*args, **kwargs)
+
+            key = get_cache_key(request, str(vary(kwargs)) if vary is not None else "")
+            body = await cache.get(key)
+            if body is None:
+                generation = await cache.get_generation()
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                content = jsonable_encoder(response_model.parse_obj(jsonable_encoder(result)))
+                body = json.dumps(content, separators=(",", ":"))
+                await cache.set(key, body, tags=tags(result), generation=generation)
+
+            etag = get_etag(body)
+            if etag_matches(request, etag):
+                return Response(status_code=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+        if not pass_request:
+            wrapper.__signature__ = signature.replace(  # type: ignore
+                parameters=[
+                    *signature.parameters.values(),
+                    inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+                ]
+            )
+        return wrapper
+
+    return decorator
@@ -12,6 +12,7 @@ from starlette.status import (
     HTTP_503_SERVICE_UNAVAILABLE,
 )
 
+from app.core.cache import response_cache
 from app.core.config import is_creating_initial_data, is_testing
 from app.core.errors import BaseAppException
 
@@ -23,10 +24,16 @@ UNHANDLED_EXCEPTION = HTTPException(
 
 @asynccontextmanager
 async def exception_handler(conn: Optional[AsyncConnection] = None, close_conn: bool = True):
+    """
+    Commit the transaction of ``conn``, or roll it back on errors, which are converted to ``HTTPException``.
+    Cached responses are invalidated once the changes made on ``conn`` are committed.
+    """
     try:
         logger.warning(f"Using connection {id(conn)}")
         yield
     except Exception as e:
+        if conn:
+            response_cache.discard_uncommitted_tags(conn)
         if conn and not is_testing():
             logger.critical(f"Rolling back transaction for connection {id(conn)}")
             await conn.rollback()
@@ -37,6 +44,8 @@ async def exception_handler(conn: Optional[AsyncConnection] = None, close_conn:
             await conn.commit()
             if close_conn:
                 await conn.close()
+        if conn:
+            await response_cache.invalidate_committed_tags(conn)
 
 
 @contextmanager
@@ -0,0 +1,77 @@
+import json
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.routes.utils.errors import exception_handler
+
+JSON_ARRAY_CHUNK_SIZE = 100
+"""
+Number of items encoded per chunk written to the response.
+"""
+
+
+class StreamAbortedError(Exception):
+    """
+    Reading the content of a response failed after it had started, so it can only be aborted.
+    """
+
+
+async def encode_json_array(
+    items: AsyncIterator[Any], *, chunk_size: int = JSON_ARRAY_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """
+    Encode items as a JSON array as they are received, so that only one chunk is held in memory.
+    The opening bracket is part of the first chunk.
+    """
+    prefix = "["
+    chunk: list[str] = []
+    separator = ""
+    async for item in items:
+        chunk.append(separator + json.dumps(jsonable_encoder(item), separators=(",", ":")))
+        separator = ","
+        if len(chunk) == chunk_size:
+            yield prefix + "".join(chunk)
+            prefix = ""
+            chunk.clear()
+    yield prefix + "".join(chunk) + "]"
+
+
+async def json_array_response(
+    items: AsyncIterator[Any], *, conn: Optional[AsyncConnection] = None
+) -> StreamingResponse:
+    """
+    Stream items from a query result as a JSON array.
+
+    The first chunk is read before the response starts, so that the query failing is reported
+    with the status code of the error as usual. Once the response has started, an error while reading
+    the rest of the result aborts it with ``StreamAbortedError``: the array is left unterminated and
+    the server closes the connection before the end of the body, so that clients never take
+    a truncated array for a complete one.
+
+    The connection is handled by ``exception_handler`` once the whole response has been sent,
+    since the query result is read while streaming. The ``response_model`` of the route
+    is only used for documentation.
+    """
+    chunks = encode_json_array(items)
+    stack = AsyncExitStack()
+    await stack.enter_async_context(exception_handler(conn))
+    async with stack:
+        first_chunk = await chunks.__anext__()
+        stack = stack.pop_all()
+
+    async def content() -> AsyncIterator[str]:
+        try:
+            async with stack:
+                yield first_chunk
+                async for chunk in chunks:
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Aborting JSON array response: {e}")
+            raise StreamAbortedError("JSON array response could not be completed") from e
+
+    return StreamingResponse(content(), media_type="application/json")
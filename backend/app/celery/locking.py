@@ -1,53 +1,21 @@
 import base64
+import functools
 import json
-import pickle as pkl
-import uuid
-from contextlib import contextmanager
+from typing import Optional
 
 import redis_lock
-from redis import StrictRedis
-from redis_cache import RedisCache
+from loguru import logger
 
-rds = StrictRedis(host="redis_myapp", port=6379, db=0)
-rds_cache = StrictRedis(host="redis_myapp", port=6379, db=1)
-redis_cache = RedisCache(redis_client=rds_cache, prefix="rc", serializer=pkl.dumps, deserializer=pkl.loads)
+from app.core.locks import DEFAULT_LOCK_LEASE, DistributedLock
+from app.core.redis import redis_pool
+
+rds = redis_pool.sync.client
 lock = redis_lock.Lock(rds, "lock")
 
 
-TASK_LOCK_MSG = "Task execution skipped -- another task already has the lock"
 DEFAULT_ASSET_EXPIRATION = 8 * 24 * 60 * 60  # by default keep cached values around for 8 days
 DEFAULT_CACHE_EXPIRATION = 1 * 24 * 60 * 60  # we can keep cached values around for a shorter period of time
 
-REMOVE_ONLY_IF_OWNER_SCRIPT = """
-if redis.call("get",KEYS[1]) == ARGV[1] then
-    return redis.call("del",KEYS[1])
-else
-    return 0
-end
-"""
-
-
-# TODO use python-redis-lock instead: https://github.com/ionelmc/python-redis-lock
-# which can be used as ctx manager:
-# conn = StrictRedis()
-# with redis_lock.Lock(conn, "name-of-the-lock"):
-
-
-@contextmanager
-def redis_locker(lock_name, expires=60):
-    # https://breadcrumbscollector.tech/what-is-celery-beat-and-how-to-use-it-part-2-patterns-and-caveats/
-    random_value = str(uuid.uuid4())
-    lock_acquired = bool(rds.set(lock_name, random_value, ex=expires, nx=True))
-    print(f"Lock acquired? {lock_name} for {expires} - {lock_acquired}")
-
-    yield lock_acquired
-
-    if lock_acquired:
-        # if lock was acquired, then try to release it BUT ONLY if we are the owner
-        # (i.e. value inside is identical to what we put there originally)
-        rds.eval(REMOVE_ONLY_IF_OWNER_SCRIPT, 1, lock_name, random_value)
-        print(f"Lock {lock_name} released!")
-
 
 def argument_signature(*args, **kwargs):
     arg_list = [str(x) for x in args]
@@ -55,13 +23,19 @@ def argument_signature(*args, **kwargs):
     return base64.b64encode(f"{'_'.join(arg_list)}-{'_'.join(kwarg_list)}".encode()).decode()
 
 
-def task_lock(func=None, main_key="", timeout=None):
+def task_lock(func=None, main_key="", lease=DEFAULT_LOCK_LEASE, blocking_timeout=None):
+    """
+    Run an async task while holding a ``DistributedLock`` on ``main_key`` and its arguments.
+    Raises ``LockNotAcquiredError`` if another task holds it, so that the task fails.
+    """
+
     def _dec(run_func):
-        def _caller(*args, **kwargs):
-            with redis_locker(f"{main_key}_{argument_signature(*args, **kwargs)}", timeout) as acquired:
-                if not acquired:
-                    return TASK_LOCK_MSG
-                return run_func(*args, **kwargs)
+        @functools.wraps(run_func)
+        async def _caller(*args, **kwargs):
+            name = f"{main_key}_{argument_signature(*args, **kwargs)}"
+            async with DistributedLock(name, lease=lease, blocking_timeout=blocking_timeout) as held:
+                logger.info(f"Running {run_func.__name__} with fencing token {held.token}")
+                return await run_func(*args, **kwargs)
 
         return _caller
 
@@ -72,3 +46,39 @@ def unpack_redis_json(key: str):
     result = rds.get(key)
     if result is not None:
         return json.loads(result)
+
+
+TASK_PROGRESS_EXPIRATION = 8 * 60 * 60  # same as task results
+
+
+def _task_progress_key(task_id: str) -> str:
+    return f"task_progress_{task_id}"
+
+
+def set_task_progress_total(task_id: str, total: int) -> None:
+    key = _task_progress_key(task_id)
+    rds.hset(key, "total", total)
+    rds.expire(key, TASK_PROGRESS_EXPIRATION)
+
+
+def advance_task_progress(task_id: str, *, delivered: int = 0) -> None:
+    """
+    Record a finished unit of work of ``task_id``, which may be done by a different task.
+    """
+    key = _task_progress_key(task_id)
+    pipeline = rds.pipeline()
+    pipeline.hincrby(key, "done", 1)
+    pipeline.hincrby(key, "delivered", delivered)
+    pipeline.expire(key, TASK_PROGRESS_EXPIRATION)
+    pipeline.execute()
+
+
+def get_task_progress(task_id: str) -> Optional[dict[str, Optional[int]]]:
+    progress = rds.hgetall(_task_progress_key(task_id))
+    if not progress:
+        return None
+    return {
+        "done": int(progress.get(b"done", 0)),
+        "total": int(progress[b"total"]) if b"total" in progress else None,
+        "delivered": int(progress.get(b"delivered", 0)),
+    }
@@ -6,12 +6,25 @@ from app.models.core import CoreModel
 
 class TaskType(str, Enum):
     VACUUM_ANALYZE = "vacuum_analyze"
+    FAN_OUT_PERSONAL_NOTIFICATION = "fan_out_personal_notification"
+    REBUILD_USER_NOTIFICATION_STATE = "rebuild_user_notification_state"
+    MANAGE_PERSONAL_NOTIFICATIONS_PARTITIONS = "manage_personal_notifications_partitions"
+
+
+class TaskProgress(CoreModel):
+    done: int
+    total: Optional[int]
+    """
+    Unknown until the task has split all of its work.
+    """
+    delivered: int
 
 
 class TaskStatus(CoreModel):
     task_id: str
     task_status: Optional[str]
     task_result: Optional[Any]
+    task_progress: Optional[TaskProgress]
 
 
 class TaskAccepted(CoreModel):
@@ -1,31 +1,56 @@
 import asyncio
-import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
 
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.utils.log import get_task_logger
 from celery_once import QueueOnce
 from sqlalchemy.pool import NullPool
 
-from app.celery.locking import task_lock
+from app.celery.locking import (
+    advance_task_progress,
+    set_task_progress_total,
+    task_lock,
+)
 from app.celery.models import TaskResult
 from app.celery.utils import async_to_sync as async_to_sync_util
+from app.celery.utils import (
+    close_worker_loop,
+    get_worker_loop,
+    init_worker_loop,
+)
 from app.celery.worker import celery_app
 from app.core import config
+from app.core.cache import response_cache
+from app.core.redis import cache_redis_pool, redis_pool
 from app.db.gen.queries.personal_notifications import (
     CreatePersonalNotificationParams,
+    CreatePersonalNotificationsParams,
 )
 from app.db.tasks import connect_to_db
+from app.models.global_notifications import PersonalNotificationFanOut
 from app.services.maintenance import MaintenanceService
 from app.services.personal_notifications import PersonalNotificationsService
 
 logger = get_task_logger(f"app.celery.worker.{config.APP_ENV}")
 TASK_LOCK_TEST_SLEEP = 1
+FAN_OUT_CHUNK_SIZE = 1000
+# the lock is held for as long as vacuum runs, the lease only bounds how long a dead worker keeps it
+VACUUM_ANALYZE_LOCK_LEASE = 60
+REBUILD_USER_NOTIFICATION_STATE_LOCK_LEASE = 60
+MANAGE_PERSONAL_NOTIFICATIONS_PARTITIONS_LOCK_LEASE = 60
+# failed chunks are retried with exponential backoff, for at most
+# FAN_OUT_CHUNK_MAX_RETRIES * FAN_OUT_CHUNK_RETRY_BACKOFF_MAX seconds, well within the retention of their claims
+FAN_OUT_CHUNK_MAX_RETRIES = 5
+FAN_OUT_CHUNK_RETRY_BACKOFF_MAX = 600
 
 
 @celery_app.task(name="async_test_task_lock")
-@task_lock(main_key="async_test_task_lock", timeout=5)
-def async_test_task_lock(game_id):
+@async_to_sync_util
+@task_lock(main_key="async_test_task_lock", lease=5)
+async def async_test_task_lock(game_id):
     print(f"processing game_id {game_id}")
-    time.sleep(TASK_LOCK_TEST_SLEEP)
+    await asyncio.sleep(TASK_LOCK_TEST_SLEEP)
 
 
 @celery_app.task(
@@ -39,6 +64,32 @@ async def sleep_task(value):
 
 
 engine = connect_to_db(poolclass=NullPool)
+"""
+Connections can't outlive the event loop of a task unless tasks share the worker process loop,
+so they are not pooled until ``init_worker_process``.
+"""
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    global engine
+    init_worker_loop()
+    engine = connect_to_db()
+    redis_pool.open()
+    cache_redis_pool.open()
+    logger.info("Initialized worker process event loop, database engine and redis pools")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    loop = get_worker_loop()
+    if loop is not None:
+        loop.run_until_complete(redis_pool.close())
+        loop.run_until_complete(cache_redis_pool.close())
+        if engine is not None:
+            loop.run_until_complete(engine.dispose())
+    close_worker_loop()
+
 
 # TODO task errors should have state.FAILURE, by default tasks always return with SUCCESS: https://stackoverflow.com/questions/7672327/how-to-make-a-celery-task-fail-from-within-the-task
 @celery_app.task(
@@ -47,9 +98,11 @@ engine = connect_to_db(poolclass=NullPool)
     queue=f"myapp_queue_{config.APP_ENV}",
 )
 @async_to_sync_util
+@task_lock(main_key="vacuum_analyze_task", lease=VACUUM_ANALYZE_LOCK_LEASE)
 async def vacuum_analyze_task(conn=None):
     return await vacuum_analyze(conn=conn)
 
+
 # TODO https://stackoverflow.com/questions/28441143/celery-i-want-only-one-instance-of-my-task-in-the-queue-at-a-time
 async def vacuum_analyze(conn=None):
     if engine is None:
@@ -71,9 +124,182 @@ async def vacuum_analyze(conn=None):
             )  # type: ignore
         )
         await conn.commit() if not config.is_testing() else None
+        await response_cache.invalidate_committed_tags(conn)
         return TaskResult(message=message).json()
+    except Exception as e:
+        await conn.rollback() if not config.is_testing() else None
+        response_cache.discard_uncommitted_tags(conn)
+        return TaskResult(message=f"Error: {e}").json()
+    finally:
+        await conn.close() if not config.is_testing() else None
+
+
+@celery_app.task(
+    name="rebuild_user_notification_state_task",
+    base=QueueOnce,
+    queue=f"myapp_queue_{config.APP_ENV}",
+)
+@async_to_sync_util
+@task_lock(main_key="rebuild_user_notification_state_task", lease=REBUILD_USER_NOTIFICATION_STATE_LOCK_LEASE)
+async def rebuild_user_notification_state_task(conn=None):
+    return await rebuild_user_notification_state(conn=conn)
+
+
+async def rebuild_user_notification_state(conn=None):
+    if engine is None:
+        return TaskResult(message="Engine was not initialized").json()
+    if conn is None:
+        conn = await engine.connect()
+    maintenance_service = MaintenanceService(conn)
+    try:
+        await maintenance_service.rebuild_user_notification_state()
+        await conn.commit() if not config.is_testing() else None
+        return TaskResult(message="Successfully rebuilt user notification state.").json()
+    except Exception as e:
+        await conn.rollback() if not config.is_testing() else None
+        return TaskResult(message=f"Error: {e}").json()
+    finally:
+        await conn.close() if not config.is_testing() else None
+
+
+@celery_app.task(
+    name="manage_personal_notifications_partitions_task",
+    base=QueueOnce,
+    queue=f"myapp_queue_{config.APP_ENV}",
+)
+@async_to_sync_util
+@task_lock(
+    main_key="manage_personal_notifications_partitions_task", lease=MANAGE_PERSONAL_NOTIFICATIONS_PARTITIONS_LOCK_LEASE
+)
+async def manage_personal_notifications_partitions_task(conn=None):
+    return await manage_personal_notifications_partitions(conn=conn)
+
+
+async def manage_personal_notifications_partitions(conn=None):
+    """
+    Scheduled daily by celery beat, see ``celery_app.conf.beat_schedule``.
+    Fan-out chunk claims past their retention are pruned along with the partitions.
+    """
+    if engine is None:
+        return TaskResult(message="Engine was not initialized").json()
+    if conn is None:
+        conn = await engine.connect()
+    maintenance_service = MaintenanceService(conn)
+    pn_service = PersonalNotificationsService(conn)
+    try:
+        partitions = await maintenance_service.manage_personal_notifications_partitions(
+            months_ahead=config.PERSONAL_NOTIFICATIONS_PARTITIONS_AHEAD,
+            retention_months=config.PERSONAL_NOTIFICATIONS_RETENTION_MONTHS,
+            drop_expired=config.PERSONAL_NOTIFICATIONS_DROP_EXPIRED,
+        )
+        pruned_claims = await pn_service.prune_fan_out_chunk_claims(
+            created_before=datetime.utcnow()
+            - timedelta(hours=config.PERSONAL_NOTIFICATION_FAN_OUT_CLAIMS_RETENTION_HOURS)
+        )
+        await conn.commit() if not config.is_testing() else None
+        return TaskResult(
+            message=f"Created partitions {partitions.created}, expired partitions {partitions.expired},"
+            f" pruned {pruned_claims} fan-out chunk claims."
+        ).json()
     except Exception as e:
         await conn.rollback() if not config.is_testing() else None
         return TaskResult(message=f"Error: {e}").json()
     finally:
         await conn.close() if not config.is_testing() else None
+
+
+@celery_app.task(
+    name="fan_out_personal_notification_task",
+    base=QueueOnce,
+    bind=True,
+    queue=f"myapp_queue_{config.APP_ENV}",
+)
+@async_to_sync_util
+async def fan_out_personal_notification_task(self, fan_out: dict):
+    return await fan_out_personal_notification(
+        fan_out_id=self.request.id, fan_out=PersonalNotificationFanOut(**fan_out)
+    )
+
+
+@celery_app.task(
+    name="deliver_personal_notification_chunk_task",
+    base=QueueOnce,
+    once={"keys": ["fan_out_id", "chunk"]},
+    autoretry_for=(Exception,),
+    max_retries=FAN_OUT_CHUNK_MAX_RETRIES,
+    retry_backoff=True,
+    retry_backoff_max=FAN_OUT_CHUNK_RETRY_BACKOFF_MAX,
+    queue=f"myapp_queue_{config.APP_ENV}",
+)
+@async_to_sync_util
+async def deliver_personal_notification_chunk_task(
+    *, fan_out_id: str, chunk: int, notifications: dict, receiver_emails: list[str]
+):
+    return await deliver_personal_notification_chunk(
+        fan_out_id=fan_out_id,
+        chunk=chunk,
+        notifications=CreatePersonalNotificationsParams(**notifications, receiver_emails=receiver_emails),
+    )
+
+
+async def dispatch_personal_notification_chunk(**kwargs) -> None:
+    deliver_personal_notification_chunk_task.apply_async(kwargs=kwargs)
+
+
+async def fan_out_personal_notification(
+    *,
+    fan_out_id: str,
+    fan_out: PersonalNotificationFanOut,
+    conn=None,
+    dispatch: Callable[..., Awaitable[Any]] = dispatch_personal_notification_chunk,
+    chunk_size: int = FAN_OUT_CHUNK_SIZE,
+):
+    """
+    Split the recipients of a fan-out into chunks delivered by their own task. Progress is
+    reported on ``fan_out_id`` as chunks are delivered.
+    """
+    if engine is None:
+        return TaskResult(message="Engine was not initialized").json()
+    if conn is None:
+        conn = await engine.connect()
+    pn_service = PersonalNotificationsService(conn)
+    notifications = fan_out.dict(exclude={"recipients"})
+    try:
+        chunks = 0
+        async for receiver_emails in pn_service.stream_recipient_chunks(
+            recipients=fan_out.recipients, chunk_size=chunk_size
+        ):
+            await dispatch(
+                fan_out_id=fan_out_id, chunk=chunks, notifications=notifications, receiver_emails=receiver_emails
+            )
+            chunks += 1
+        set_task_progress_total(fan_out_id, chunks)
+        return TaskResult(message=f"Fan-out split into {chunks} chunks.").json()
+    finally:
+        await conn.close() if not config.is_testing() else None
+
+
+async def deliver_personal_notification_chunk(
+    *, fan_out_id: str, chunk: int, notifications: CreatePersonalNotificationsParams, conn=None
+):
+    if engine is None:
+        return TaskResult(message="Engine was not initialized").json()
+    if conn is None:
+        conn = await engine.connect()
+    pn_service = PersonalNotificationsService(conn)
+    try:
+        created = await pn_service.deliver_fan_out_chunk(
+            fan_out_id=fan_out_id, chunk=chunk, notifications=notifications
+        )
+        await conn.commit() if not config.is_testing() else None
+        await response_cache.invalidate_committed_tags(conn)
+    except Exception:
+        await conn.rollback() if not config.is_testing() else None
+        response_cache.discard_uncommitted_tags(conn)
+        raise  # retried by the task, the claim was rolled back along with the notifications
+    finally:
+        await conn.close() if not config.is_testing() else None
+    if created is None:
+        return TaskResult(message=f"Chunk {chunk} was already delivered.").json()
+    advance_task_progress(fan_out_id, delivered=created.created)
+    return TaskResult(message=f"Delivered {created.created} notifications.").json()
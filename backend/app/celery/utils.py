@@ -2,9 +2,12 @@ import asyncio
 import functools
 from itertools import repeat
 from multiprocessing.pool import Pool
+from typing import Optional
 
 from loguru import logger
 
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
 
 def force_sync(fn):
     """
@@ -22,9 +25,39 @@ def force_sync(fn):
     return wrapper
 
 
+def init_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    Create the event loop every async task of the current worker process runs on,
+    so that tasks don't pay for a new loop and may share loop bound resources, e.g. pooled connections.
+    """
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
+def get_worker_loop() -> Optional[asyncio.AbstractEventLoop]:
+    return _worker_loop
+
+
+def close_worker_loop() -> None:
+    global _worker_loop
+    if _worker_loop is None:
+        return
+    try:
+        _worker_loop.run_until_complete(_worker_loop.shutdown_asyncgens())
+    finally:
+        _worker_loop.close()
+        _worker_loop = None
+        asyncio.set_event_loop(None)
+
+
 def async_to_sync(func):
     @functools.wraps(func)
     def wrapped(*args, **kwargs):
+        if _worker_loop is not None and not _worker_loop.is_running():
+            return _worker_loop.run_until_complete(func(*args, **kwargs))
+
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
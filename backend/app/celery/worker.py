@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 
 from app.core import config
 
@@ -20,4 +21,11 @@ celery_app.conf.ONCE = {
 # https://docs.celeryq.dev/en/latest/userguide/routing.html#manual-routing
 celery_app.conf.task_default_queue = f"myapp_queue_{config.APP_ENV}"
 
+celery_app.conf.beat_schedule = {
+    "manage-personal-notifications-partitions": {
+        "task": "manage_personal_notifications_partitions_task",
+        "schedule": crontab(minute=0, hour=3),
+    },
+}
+
 celery_app.autodiscover_tasks(["app.celery.tasks"])
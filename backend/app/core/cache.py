@@ -0,0 +1,296 @@
+import json
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import (
+    RESPONSE_CACHE_LOCAL_SIZE,
+    RESPONSE_CACHE_LOCAL_TTL,
+    RESPONSE_CACHE_TTL,
+)
+from app.core.redis import RedisPool, cache_redis_pool
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded in-process LRU cache whose entries expire after ``ttl`` seconds.
+    Not shared between worker processes, so values must be safe to serve stale for up to ``ttl``.
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, *, ttl: Optional[float] = None) -> None:
+        """
+        Store ``value`` for at most ``ttl`` seconds, defaulting to the cache's own ``ttl``.
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[K, V], bool]) -> None:
+        for key in [key for key, (_, value) in self._entries.items() if predicate(key, value)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+
+class CachedValue(NamedTuple):
+    value: str
+    tags: frozenset[str]
+
+
+class Generation(NamedTuple):
+    """
+    Invalidations seen by a cache before a value was computed, see ``TwoTierCache.get_generation``.
+    """
+
+    local: int
+    shared: Optional[int]
+
+
+class TwoTierCache:
+    """
+    Values shared between processes through redis for ``ttl`` seconds, in front of which
+    every process keeps the most recently used ones in a ``TTLCache`` for ``local_ttl`` seconds.
+
+    Values are invalidated by tag: in redis for every process and in memory only for the current one,
+    so other processes may serve stale values for up to ``local_ttl``.
+    Writes invalidate tags once committed, see ``invalidate_tags_on_commit``, and other caches
+    that depend on the same data can be invalidated along with them, see ``invalidate_on_commit``.
+    Values computed from reads that started before the commit could still be set after the invalidation,
+    so they are only set if none of their tags were invalidated since their ``get_generation``.
+    Redis errors are logged and treated as misses, since the cache is not required to serve requests.
+    """
+
+    def __init__(self, name: str, *, redis_pool: RedisPool, ttl: int, local_ttl: float, local_maxsize: int) -> None:
+        self.name = name
+        self.redis_pool = redis_pool
+        self.ttl = ttl
+        self.local: TTLCache[str, CachedValue] = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.redis_hits = 0
+        self.errors = 0
+        self.local_generation = 0
+        self.uncommitted_tags: WeakKeyDictionary[AsyncConnection, set[str]] = WeakKeyDictionary()
+        self.uncommitted_invalidations: WeakKeyDictionary[
+            AsyncConnection, list[Callable[[], None]]
+        ] = WeakKeyDictionary()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.name}:tag:{tag}"
+
+    def _generation_key(self) -> str:
+        return f"{self.name}:generation"
+
+    def _invalidated_key(self, tag: str) -> str:
+        return f"{self.name}:invalidated:{tag}"
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        cached = self.local.get(key)
+        if cached is not None:
+            return cached.value
+        local_generation = self.local_generation
+        try:
+            value, tags = await self.redis_pool.aio.client.hmget(self._key(key), "value", "tags")
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Could not get {key} from {self.name} cache: {e}")
+            return None
+        if value is None:
+            return None
+        self.redis_hits += 1
+        value = value.decode()
+        if local_generation == self.local_generation:
+            self.local.set(key, CachedValue(value, frozenset(json.loads(tags))))
+        return value
+
+    async def get_generation(self) -> Generation:
+        """
+        Read before computing a value to ``set``, so that it is not set if its tags are invalidated meanwhile.
+        Locally any invalidation counts, since invalidated tags are only remembered in redis, for ``ttl`` seconds.
+        """
+        local_generation = self.local_generation
+        if not self.enabled:
+            return Generation(local_generation, None)
+        try:
+            shared_generation = int(await self.redis_pool.aio.client.get(self._generation_key()) or 0)
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Could not get generation of {self.name} cache: {e}")
+            return Generation(local_generation, None)
+        return Generation(local_generation, shared_generation)
+
+    async def set(
+        self, key: str, value: str, *, tags: Iterable[str] = (), generation: Optional[Generation] = None
+    ) -> None:
+        """
+        Store ``value`` under ``key``, unless ``tags`` were invalidated since ``generation``.
+        Without a shared ``generation``, e.g. when redis could not be read, the value is only kept in memory.
+        """
+        if not self.enabled:
+            return
+        tags = frozenset(tags)
+        if generation is None or generation.shared is not None or not tags:
+            try:
+                if not await self._set_shared(key, value, tags=tags, generation=generation):
+                    return
+            except RedisError as e:
+                self.errors += 1
+                logger.warning(f"Could not set {key} in {self.name} cache: {e}")
+        if generation is None or generation.local == self.local_generation:
+            self.local.set(key, CachedValue(value, tags))
+
+    async def _set_shared(
+        self, key: str, value: str, *, tags: frozenset[str], generation: Optional[Generation]
+    ) -> bool:
+        invalidated_keys = [self._invalidated_key(tag) for tag in tags]
+        async with self.redis_pool.aio.client.pipeline(transaction=True) as pipeline:
+            if generation is not None and invalidated_keys:
+                # the transaction is aborted if the tags are invalidated before it executes
+                await pipeline.watch(*invalidated_keys)
+                invalidated_at = await pipeline.mget(invalidated_keys)
+                if any(int(i) > generation.shared for i in invalidated_at if i is not None):  # type: ignore
+                    return False
+                pipeline.multi()
+            pipeline.hset(self._key(key), mapping={"value": value, "tags": json.dumps(sorted(tags))})
+            pipeline.expire(self._key(key), self.ttl)
+            for tag in tags:
+                pipeline.sadd(self._tag_key(tag), key)
+                pipeline.expire(self._tag_key(tag), self.ttl)
+            try:
+                await pipeline.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        if not self.enabled or not tags:
+            return
+        self.local_generation += 1
+        self.local.invalidate_where(lambda _, cached: not cached.tags.isdisjoint(tags))
+        client = self.redis_pool.aio.client
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        try:
+            # marked before the values are deleted, so that values set meanwhile are either deleted or not set
+            generation = await client.incr(self._generation_key())
+            pipeline = client.pipeline(transaction=True)
+            for tag in tags:
+                pipeline.set(self._invalidated_key(tag), generation, ex=self.ttl)
+            await pipeline.execute()
+            keys = await client.sunion(tag_keys)
+            await client.delete(*tag_keys, *[self._key(key.decode()) for key in keys])
+        except RedisError as e:
+            self.errors += 1
+            logger.warning(f"Could not invalidate tags {tags} of {self.name} cache: {e}")
+
+    def invalidate_tags_on_commit(self, conn: AsyncConnection, *tags: str) -> None:
+        """
+        Invalidate ``tags`` once the changes made on ``conn`` are committed, with ``invalidate_committed_tags``.
+        Invalidating them before would let concurrent requests cache the previous values again.
+        """
+        self.uncommitted_tags.setdefault(conn, set()).update(tags)
+
+    def invalidate_on_commit(self, conn: AsyncConnection, invalidate: Callable[[], None]) -> None:
+        """
+        Call ``invalidate`` along with ``invalidate_committed_tags``, for in-process caches of the data changed on
+        ``conn``, which would otherwise be filled again with the previous values just the same.
+        """
+        self.uncommitted_invalidations.setdefault(conn, []).append(invalidate)
+
+    async def invalidate_committed_tags(self, conn: AsyncConnection) -> None:
+        for invalidate in self.uncommitted_invalidations.pop(conn, ()):
+            invalidate()
+        await self.invalidate_tags(*self.uncommitted_tags.pop(conn, ()))
+
+    def discard_uncommitted_tags(self, conn: AsyncConnection) -> None:
+        """
+        Forget the tags and invalidations of changes made on ``conn`` that were rolled back.
+        """
+        self.uncommitted_tags.pop(conn, None)
+        self.uncommitted_invalidations.pop(conn, None)
+
+    def stats(self) -> dict[str, Any]:
+        local = self.local.stats()
+        # local misses include lookups then served from redis
+        lookups = local["hits"] + local["misses"]
+        return {
+            "local_size": local["size"],
+            "local_hits": local["hits"],
+            "redis_hits": self.redis_hits,
+            "misses": local["misses"] - self.redis_hits,
+            "errors": self.errors,
+            "hit_ratio": round((local["hits"] + self.redis_hits) / lookups, 3) if lookups else None,
+        }
+
+
+response_cache = TwoTierCache(
+    "response_cache",
+    redis_pool=cache_redis_pool,
+    ttl=RESPONSE_CACHE_TTL,
+    local_ttl=RESPONSE_CACHE_LOCAL_TTL,
+    local_maxsize=RESPONSE_CACHE_LOCAL_SIZE,
+)
@@ -1,7 +1,7 @@
 import os
 
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 APP_ENV = os.environ.get("APP_ENV") or ""
 
@@ -49,6 +49,20 @@ ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, de
 JWT_ALGORITHM = config("JWT_ALGORITHM", cast=str, default="HS256")
 JWT_AUDIENCE = config("JWT_AUDIENCE", cast=str, default="myapp:auth")
 JWT_TOKEN_PREFIX = config("JWT_TOKEN_PREFIX", cast=str, default="Bearer")
+# seconds an authenticated user may be served from memory. 0 disables the cache
+AUTH_USER_CACHE_TTL = config("AUTH_USER_CACHE_TTL", cast=float, default=5)
+AUTH_USER_CACHE_SIZE = config("AUTH_USER_CACHE_SIZE", cast=int, default=10_000)
+# responses of read heavy routes are kept in redis for RESPONSE_CACHE_TTL seconds, 0 disables the cache,
+# and in memory for at most RESPONSE_CACHE_LOCAL_TTL seconds, which bounds staleness after invalidations in other processes
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", cast=int, default=60)
+RESPONSE_CACHE_LOCAL_TTL = config("RESPONSE_CACHE_LOCAL_TTL", cast=float, default=5)
+RESPONSE_CACHE_LOCAL_SIZE = config("RESPONSE_CACHE_LOCAL_SIZE", cast=int, default=1_000)
+# verified access token payloads kept in memory until they expire. 0 disables the cache
+AUTH_TOKEN_CACHE_SIZE = config("AUTH_TOKEN_CACHE_SIZE", cast=int, default=10_000)
+# bcrypt runs in a "thread" or "process" pool, or "inline" on the event loop
+AUTH_HASHING_EXECUTOR = config("AUTH_HASHING_EXECUTOR", cast=str, default="thread")
+AUTH_HASHING_WORKERS = config("AUTH_HASHING_WORKERS", cast=int, default=4)
+AUTH_HASHING_QUEUE_SIZE = config("AUTH_HASHING_QUEUE_SIZE", cast=int, default=64)
 
 POSTGRES_USER = config("POSTGRES_USER", cast=str, default="postgres")
 POSTGRES_PASSWORD = config("POSTGRES_PASSWORD", cast=Secret, default="postgres")
@@ -73,8 +87,28 @@ ADMIN_USERNAME = config("ADMIN_USERNAME", cast=str, default="admin")
 ADMIN_EMAIL = config("ADMIN_EMAIL", cast=str, default="admin@myapp.com")
 ADMIN_PASSWORD = config("ADMIN_PASSWORD", cast=str, default="admin")
 
+REDIS_URL = config("REDIS_URL", cast=str, default="redis://redis_myapp:6379/0")
+REDIS_CACHE_URL = config("REDIS_CACHE_URL", cast=str, default="redis://redis_myapp:6379/1")
+# per pool and process, for both the sync and async clients
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", cast=int, default=50)
+
 MAX_OVERFLOW = 10
 POOL_SIZE = 20
+# services whose queries run directly on asyncpg (see app.db.native), e.g. "UsersService,ProfilesService"
+NATIVE_QUERIES_SERVICES = config("NATIVE_QUERIES_SERVICES", cast=CommaSeparatedStrings, default="")
+
+# personal_notifications is partitioned by month of creation. Partitions are created this many months ahead,
+# and notifications can't be inserted for months without one, so the maintenance task must run within that time
+PERSONAL_NOTIFICATIONS_PARTITIONS_AHEAD = config("PERSONAL_NOTIFICATIONS_PARTITIONS_AHEAD", cast=int, default=3)
+# partitions whose notifications are all older than this many months are detached, 0 keeps every partition
+PERSONAL_NOTIFICATIONS_RETENTION_MONTHS = config("PERSONAL_NOTIFICATIONS_RETENTION_MONTHS", cast=int, default=12)
+# drop detached partitions instead of keeping them as standalone tables, e.g. to archive them
+PERSONAL_NOTIFICATIONS_DROP_EXPIRED = config("PERSONAL_NOTIFICATIONS_DROP_EXPIRED", cast=bool, default=True)
+# claims of delivered fan-out chunks, which keep retried chunk tasks from delivering twice, are pruned daily
+# once older than this. Must exceed how long a chunk task may be retried or redelivered
+PERSONAL_NOTIFICATION_FAN_OUT_CLAIMS_RETENTION_HOURS = config(
+    "PERSONAL_NOTIFICATION_FAN_OUT_CLAIMS_RETENTION_HOURS", cast=int, default=24
+)
 
 # TODO override in conftest and not pollute config
 PYTEST_WORKER = os.environ.get("PYTEST_XDIST_WORKER") or "0"
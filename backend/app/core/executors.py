@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, Optional, TypeVar
+
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from app.core.errors import BaseAppException
+
+T = TypeVar("T")
+
+
+class ExecutorBusyError(BaseAppException):
+    def __init__(self, msg, *, retry_after: int = 1):
+        super().__init__(msg, status_code=HTTP_503_SERVICE_UNAVAILABLE)
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls off the event loop, in a thread or process pool with at most ``max_queue``
+    calls waiting for a free worker. Further calls are rejected with ``ExecutorBusyError``
+    instead of piling up, so that callers can back off.
+
+    ``kind="inline"`` runs calls on the event loop itself.
+    """
+
+    def __init__(self, name: str, *, kind: str, max_workers: int, max_queue: int) -> None:
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Call ``fn(*args)`` in the pool. ``fn`` and its arguments must be picklable for process pools.
+        """
+        if self.kind == "inline":
+            self.completed += 1
+            return fn(*args)
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusyError("Server is busy, please try again later")
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Optional
+
+from loguru import logger
+from starlette.status import HTTP_409_CONFLICT
+
+from app.core.errors import BaseAppException
+from app.core.redis import AsyncRedisFacade, redis_pool
+
+DEFAULT_LOCK_LEASE = 60  # seconds
+LOCK_RETRY_INTERVAL = 0.1  # seconds
+
+# returns a new fencing token if the lock was acquired, else 0
+ACQUIRE_SCRIPT = """
+if redis.call("set", KEYS[1], ARGV[1], "nx", "px", ARGV[2]) then
+    return redis.call("incr", KEYS[2])
+end
+return 0
+"""
+EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LockNotAcquiredError(BaseAppException):
+    def __init__(self, msg, *, status_code=HTTP_409_CONFLICT):
+        super().__init__(msg, status_code=status_code)
+
+
+class LockMetrics:
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.contended = 0
+        """
+        Acquisitions that found the lock held, whether they eventually got it or not.
+        """
+        self.rejected = 0
+        self.lost = 0
+        """
+        Leases that expired or were taken over before being released.
+        """
+        self.wait_seconds = 0.0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "rejected": self.rejected,
+            "lost": self.lost,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+lock_metrics = LockMetrics()
+
+
+class DistributedLock:
+    """
+    Redis lock whose lease of ``lease`` seconds is extended in the background while it is held,
+    so that it can't expire under long running work but is freed if the holder dies.
+
+    Every acquisition gets a fencing token greater than any previous one for the same lock,
+    which writers may check to reject work from a holder that lost its lease.
+    Waits up to ``blocking_timeout`` seconds for the lock, or fails right away if it is None.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        lease: float = DEFAULT_LOCK_LEASE,
+        blocking_timeout: Optional[float] = None,
+        redis: Optional[AsyncRedisFacade] = None,
+    ) -> None:
+        self.name = name
+        self.lease = lease
+        self.blocking_timeout = blocking_timeout
+        self.token: Optional[int] = None
+        self.lost = False
+        self._redis = redis
+        self._owner = str(uuid.uuid4())
+        self._watchdog: Optional[asyncio.Task] = None
+
+    @property
+    def key(self) -> str:
+        return f"lock:{self.name}"
+
+    @property
+    def fencing_key(self) -> str:
+        return f"lock:{self.name}:fencing"
+
+    @property
+    def redis(self) -> AsyncRedisFacade:
+        return self._redis or redis_pool.aio
+
+    async def acquire(self) -> int:
+        start = time.monotonic()
+        deadline = start + (self.blocking_timeout or 0)
+        contended = False
+        while True:
+            token = await self.redis.client.eval(
+                ACQUIRE_SCRIPT, 2, self.key, self.fencing_key, self._owner, int(self.lease * 1000)
+            )
+            if token:
+                break
+            if not contended:
+                contended = True
+                lock_metrics.contended += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                lock_metrics.rejected += 1
+                raise LockNotAcquiredError(f"Lock {self.name} is held by another owner")
+            await asyncio.sleep(min(LOCK_RETRY_INTERVAL, remaining))
+
+        lock_metrics.acquired += 1
+        lock_metrics.wait_seconds += time.monotonic() - start
+        self.token = int(token)
+        self.lost = False
+        self._watchdog = asyncio.create_task(self._extend_lease())
+        return self.token
+
+    async def release(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            try:
+                await self._watchdog
+            except asyncio.CancelledError:
+                pass
+            self._watchdog = None
+        if self.token is None:
+            return
+        released = await self.redis.client.eval(RELEASE_SCRIPT, 1, self.key, self._owner)
+        if not released and not self.lost:
+            self._mark_lost()
+        self.token = None
+
+    async def _extend_lease(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                extended = await self.redis.client.eval(EXTEND_SCRIPT, 1, self.key, self._owner, int(self.lease * 1000))
+            except Exception as e:
+                # the lease may still be extended on the next try
+                logger.warning(f"Could not extend lock {self.name}: {e}")
+                continue
+            if not extended:
+                self._mark_lost()
+                return
+
+    def _mark_lost(self) -> None:
+        self.lost = True
+        lock_metrics.lost += 1
+        logger.error(f"Lock {self.name} with fencing token {self.token} was lost while held")
+
+    async def __aenter__(self) -> "DistributedLock":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.release()
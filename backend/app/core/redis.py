@@ -0,0 +1,135 @@
+import asyncio
+import json
+from typing import Any, Optional
+
+import redis
+import redis.asyncio
+from redis.asyncio.client import PubSub as AsyncPubSub
+from redis.asyncio.lock import Lock as AsyncLock
+from redis.client import PubSub
+from redis.lock import Lock
+
+from app.core import config
+
+
+class RedisFacade:
+    """
+    Locks, JSON caching and pub/sub on top of a blocking client.
+    Must not be used from the event loop, see ``AsyncRedisFacade``.
+    """
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.client = client
+
+    def lock(self, name: str, *, timeout: Optional[float] = None, blocking_timeout: Optional[float] = None) -> Lock:
+        return self.client.lock(name, timeout=timeout, blocking_timeout=blocking_timeout)
+
+    def get_json(self, key: str) -> Any:
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, value: Any, *, ex: Optional[int] = None) -> None:
+        self.client.set(key, json.dumps(value), ex=ex)
+
+    def delete(self, *keys: str) -> int:
+        return self.client.delete(*keys)
+
+    def publish(self, channel: str, message: Any) -> int:
+        return self.client.publish(channel, json.dumps(message))
+
+    def subscribe(self, *channels: str) -> PubSub:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*channels)
+        return pubsub
+
+
+class AsyncRedisFacade:
+    """
+    Same as ``RedisFacade`` for use from the event loop.
+    """
+
+    def __init__(self, client: redis.asyncio.Redis) -> None:
+        self.client = client
+
+    def lock(
+        self, name: str, *, timeout: Optional[float] = None, blocking_timeout: Optional[float] = None
+    ) -> AsyncLock:
+        return self.client.lock(name, timeout=timeout, blocking_timeout=blocking_timeout)
+
+    async def get_json(self, key: str) -> Any:
+        value = await self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set_json(self, key: str, value: Any, *, ex: Optional[int] = None) -> None:
+        await self.client.set(key, json.dumps(value), ex=ex)
+
+    async def delete(self, *keys: str) -> int:
+        return await self.client.delete(*keys)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        return await self.client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, *channels: str) -> AsyncPubSub:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(*channels)
+        return pubsub
+
+
+class RedisPool:
+    """
+    Sync and async connection pools to a single redis database, shared by the API and Celery helpers.
+
+    Connections are only opened on first use. Async connections are bound to the event loop that opened
+    them: the API opens and closes the async pool in its lifespan handlers and a new pool is opened
+    whenever the loop of the previous one was closed, e.g. for Celery tasks not running on the worker process loop.
+    """
+
+    def __init__(self, url: str, *, max_connections: int) -> None:
+        self.url = url
+        self.max_connections = max_connections
+        self._sync: Optional[RedisFacade] = None
+        self._async: Optional[AsyncRedisFacade] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def sync(self) -> RedisFacade:
+        if self._sync is None:
+            pool = redis.ConnectionPool.from_url(self.url, max_connections=self.max_connections)
+            self._sync = RedisFacade(redis.Redis(connection_pool=pool))
+        return self._sync
+
+    @property
+    def aio(self) -> AsyncRedisFacade:
+        if self._async is None or (self._loop is not None and self._loop.is_closed()):
+            self.open()
+        return self._async  # type: ignore
+
+    def open(self) -> None:
+        """
+        Create a new async pool, e.g. on startup, since connections of a previous one may belong to a closed loop.
+        """
+        pool = redis.asyncio.ConnectionPool.from_url(self.url, max_connections=self.max_connections)
+        self._async = AsyncRedisFacade(redis.asyncio.Redis(connection_pool=pool))
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+    def use(self, *, sync: Optional[redis.Redis] = None, aio: Optional[redis.asyncio.Redis] = None) -> None:
+        """
+        Replace the clients, e.g. with fakeredis in tests.
+        """
+        self._sync = RedisFacade(sync) if sync is not None else None
+        self._async = AsyncRedisFacade(aio) if aio is not None else None
+        self._loop = None
+
+    async def close(self) -> None:
+        if self._async is not None:
+            await self._async.client.close()
+            await self._async.client.connection_pool.disconnect()
+        self._async = None
+        self._loop = None
+
+
+redis_pool = RedisPool(config.REDIS_URL, max_connections=config.REDIS_MAX_CONNECTIONS)
+cache_redis_pool = RedisPool(config.REDIS_CACHE_URL, max_connections=config.REDIS_MAX_CONNECTIONS)
@@ -4,21 +4,38 @@ from fastapi import FastAPI
 
 from app.core.config import is_cicd, is_testing
 from app.core.loguru_setup import setup_logger_from_settings
+from app.core.redis import cache_redis_pool, redis_pool
 from app.db.tasks import close_db_connection, connect_to_db
+from app.services.authentication import password_hashing_executor
+from app.stream import registry
+from app.stream.checker import NotificationsChecker
+from app.stream.listener import NotificationsListener
 
 
 def create_startup_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
-        connect_to_db(app=app)
+        engine = connect_to_db(app=app)
+        redis_pool.open()
+        cache_redis_pool.open()
+        app.state._notifications_checker = NotificationsChecker(engine.connect)
         if not is_cicd() and not is_testing():
             app.state._logger = setup_logger_from_settings()
+        if not is_testing():
+            # test data is never committed, so change events would never be published
+            app.state._notifications_listener = NotificationsListener(registry)
+            await app.state._notifications_listener.start()
 
     return start_app
 
 
 def create_shutdown_handler(app: FastAPI) -> Callable:
     async def stop_app() -> None:
+        if getattr(app.state, "_notifications_listener", None) is not None:
+            await app.state._notifications_listener.stop()
         await close_db_connection(app)
+        await redis_pool.close()
+        await cache_redis_pool.close()
+        password_hashing_executor.shutdown()
         # TODO stop all running tasks in celery
 
     return stop_app
@@ -18,29 +18,46 @@ select
     select
       1
     from
-      global_notifications
+      unnest(:p1\\:\\:role[]) as roles (receiver_role)
+      cross join lateral (
+        select
+          global_notifications.updated_at
+        from
+          global_notifications
+        where
+          global_notifications.receiver_role = roles.receiver_role
+        order by
+          global_notifications.updated_at desc
+        limit 1) as latest
     where
-      updated_at > (
+      latest.updated_at > (
         select
           last_global_notification_at
         from
           users
         where
-          user_id = :p1)
-        and receiver_role = any (:p2\\:\\:role[])) as has_new_global_notifications
+          user_id = :p2)) as has_new_global_notifications
 """
 
 
 class CheckHasNewGlobalNotificationsParams(pydantic.BaseModel):
-    user_id: int
     roles: List[models.Role]
+    user_id: int
 
 
 CREATE_GLOBAL_NOTIFICATION = """-- name: create_global_notification \\:one
 insert into global_notifications (sender, receiver_role, title, body, LABEL, link)
   values (:p1, :p2, :p3, :p4, :p5, :p6)
 returning
-  global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at
 """
 
 
@@ -53,11 +70,43 @@ class CreateGlobalNotificationParams(pydantic.BaseModel):
     link: Optional[str]
 
 
+class CreateGlobalNotificationRow(pydantic.BaseModel):
+    global_notification_id: int
+    sender: Optional[str]
+    receiver_role: models.Role
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+CREATE_GLOBAL_NOTIFICATIONS = """-- name: create_global_notifications \\:many
+insert into global_notifications (sender, receiver_role, title, body, LABEL, link)
+select
+  *
+from
+  unnest(:p1\\:\\:text[], :p2\\:\\:role[], :p3\\:\\:text[], :p4\\:\\:text[], :p5\\:\\:text[], :p6\\:\\:text[])
+returning
+  global_notification_id
+"""
+
+
+class CreateGlobalNotificationsParams(pydantic.BaseModel):
+    senders: List[Optional[str]]
+    receiver_roles: List[models.Role]
+    titles: List[str]
+    bodies: List[str]
+    labels: List[str]
+    links: List[Optional[str]]
+
+
 DELETE_GLOBAL_NOTIFICATION = """-- name: delete_global_notification \\:exec
 delete from global_notifications
 where global_notification_id = :p1
 returning
-  global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at
+  global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at, search_vector
 """
 
 
@@ -78,7 +127,7 @@ select
 from ((
     -- Rows where the notification has been updated at some point.
     select
-      global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at,
+      global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at, search_vector,
       updated_at as event_timestamp,
       -- define a new column event_type and set its value
       'is_update' as event_type
@@ -94,7 +143,7 @@ from ((
 union (
   -- All rows.
   select
-    global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at,
+    global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at, search_vector,
     created_at as event_timestamp,
     -- define a new column event_type and set its value
     'is_create' as event_type
@@ -133,17 +182,189 @@ class GetGlobalNotificationsByStartingDateRow(pydantic.BaseModel):
     row_number: int
 
 
+GET_GLOBAL_NOTIFICATIONS_FEED = """-- name: get_global_notifications_feed \\:many
+select
+  notifications.global_notification_id,
+  notifications.sender,
+  notifications.receiver_role,
+  notifications.title,
+  notifications.label,
+  notifications.link,
+  notifications.body,
+  notifications.created_at,
+  notifications.updated_at,
+  notifications.updated_at as event_timestamp,
+  (
+    case when notifications.updated_at != notifications.created_at then
+      'is_update'
+    else
+      'is_create'
+    end)\\:\\:event_type as event_type
+from
+  unnest(:p1\\:\\:role[]) as roles (receiver_role)
+  cross join lateral (
+    select
+      global_notification_id, sender, receiver_role, title, body, label, link, created_at, updated_at, search_vector
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role = roles.receiver_role
+      and (global_notifications.updated_at, global_notifications.global_notification_id) < (:p2\\:\\:timestamp, :p3\\:\\:int)
+    order by
+      global_notifications.updated_at desc,
+      global_notifications.global_notification_id desc
+    limit :p4\\:\\:int) as notifications
+order by
+  notifications.updated_at desc,
+  notifications.global_notification_id desc
+limit :p4\\:\\:int
+"""
+
+
+class GetGlobalNotificationsFeedParams(pydantic.BaseModel):
+    roles: List[models.Role]
+    cursor_timestamp: datetime.datetime
+    cursor_id: int
+    page_chunk_size: int
+
+
+class GetGlobalNotificationsFeedRow(pydantic.BaseModel):
+    global_notification_id: int
+    sender: Optional[str]
+    receiver_role: models.Role
+    title: str
+    label: str
+    link: Optional[str]
+    body: str
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    event_timestamp: datetime.datetime
+    event_type: models.EventType
+
+
+GET_GLOBAL_NOTIFICATIONS_LATEST_UPDATED_AT = """-- name: get_global_notifications_latest_updated_at \\:many
+select
+  roles.receiver_role\\:\\:role as receiver_role,
+  latest.updated_at\\:\\:timestamp as latest_updated_at
+from
+  unnest(ENUM_RANGE(null\\:\\:role)) as roles (receiver_role)
+  cross join lateral (
+    select
+      global_notifications.updated_at
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role = roles.receiver_role
+    order by
+      global_notifications.updated_at desc
+    limit 1) as latest
+"""
+
+
+class GetGlobalNotificationsLatestUpdatedAtRow(pydantic.BaseModel):
+    receiver_role: models.Role
+    latest_updated_at: datetime.datetime
+
+
+SEARCH_GLOBAL_NOTIFICATIONS = """-- name: search_global_notifications \\:many
+-- Matches of a web search style query, most recent first, read in order from the RUM index.
+select
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  ts_rank(search_vector, websearch_to_tsquery('english', :p1)) as rank
+from
+  global_notifications
+where
+  search_vector @@ websearch_to_tsquery('english', :p1)
+  and receiver_role = any (:p2\\:\\:role[])
+order by
+  updated_at <=| :p3\\:\\:timestamp
+limit :p4\\:\\:int
+"""
+
+
+class SearchGlobalNotificationsParams(pydantic.BaseModel):
+    query: str
+    roles: List[models.Role]
+    before: datetime.datetime
+    page_chunk_size: int
+
+
+class SearchGlobalNotificationsRow(pydantic.BaseModel):
+    global_notification_id: int
+    sender: Optional[str]
+    receiver_role: models.Role
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    rank: float
+
+
+SEARCH_GLOBAL_NOTIFICATIONS_BY_LABEL = """-- name: search_global_notifications_by_label \\:many
+-- Labels similar to the query, for queries without full text matches, e.g. misspelled labels.
+select
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  similarity(label, :p1) as rank
+from
+  global_notifications
+where
+  receiver_role = any (:p2\\:\\:role[])
+  and label % :p1
+order by
+  rank desc,
+  updated_at desc
+limit :p3\\:\\:int
+"""
+
+
+class SearchGlobalNotificationsByLabelParams(pydantic.BaseModel):
+    query: str
+    roles: List[models.Role]
+    page_chunk_size: int
+
+
+class SearchGlobalNotificationsByLabelRow(pydantic.BaseModel):
+    global_notification_id: int
+    sender: Optional[str]
+    receiver_role: models.Role
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    rank: float
+
+
 class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
 
     async def check_has_new_global_notifications(self, arg: CheckHasNewGlobalNotificationsParams) -> Optional[bool]:
-        row = (await self._conn.execute(sqlalchemy.text(CHECK_HAS_NEW_GLOBAL_NOTIFICATIONS), {"p1": arg.user_id, "p2": arg.roles})).first()
+        row = (await self._conn.execute(sqlalchemy.text(CHECK_HAS_NEW_GLOBAL_NOTIFICATIONS), {"p1": arg.roles, "p2": arg.user_id})).first()
         if row is None:
             return None
         return row[0]
 
-    async def create_global_notification(self, arg: CreateGlobalNotificationParams) -> Optional[models.GlobalNotification]:
+    async def create_global_notification(self, arg: CreateGlobalNotificationParams) -> Optional[CreateGlobalNotificationRow]:
         row = (await self._conn.execute(sqlalchemy.text(CREATE_GLOBAL_NOTIFICATION), {
             "p1": arg.sender,
             "p2": arg.receiver_role,
@@ -154,7 +375,7 @@ class AsyncQuerier:
         })).first()
         if row is None:
             return None
-        return models.GlobalNotification(
+        return CreateGlobalNotificationRow(
             global_notification_id=row[0],
             sender=row[1],
             receiver_role=row[2],
@@ -166,6 +387,18 @@ class AsyncQuerier:
             updated_at=row[8],
         )
 
+    async def create_global_notifications(self, arg: CreateGlobalNotificationsParams) -> AsyncIterator[int]:
+        result = await self._conn.stream(sqlalchemy.text(CREATE_GLOBAL_NOTIFICATIONS), {
+            "p1": arg.senders,
+            "p2": arg.receiver_roles,
+            "p3": arg.titles,
+            "p4": arg.bodies,
+            "p5": arg.labels,
+            "p6": arg.links,
+        })
+        async for row in result:
+            yield row[0]
+
     async def delete_global_notification(self, *, global_notification_id: int) -> None:
         await self._conn.execute(sqlalchemy.text(DELETE_GLOBAL_NOTIFICATION), {"p1": global_notification_id})
 
@@ -186,3 +419,60 @@ class AsyncQuerier:
                 event_type=row[10],
                 row_number=row[11],
             )
+
+    async def get_global_notifications_feed(self, arg: GetGlobalNotificationsFeedParams) -> AsyncIterator[GetGlobalNotificationsFeedRow]:
+        result = await self._conn.stream(sqlalchemy.text(GET_GLOBAL_NOTIFICATIONS_FEED), {"p1": arg.roles, "p2": arg.cursor_timestamp, "p3": arg.cursor_id, "p4": arg.page_chunk_size})
+        async for row in result:
+            yield GetGlobalNotificationsFeedRow(
+                global_notification_id=row[0],
+                sender=row[1],
+                receiver_role=row[2],
+                title=row[3],
+                label=row[4],
+                link=row[5],
+                body=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                event_timestamp=row[9],
+                event_type=row[10],
+            )
+
+    async def get_global_notifications_latest_updated_at(self) -> AsyncIterator[GetGlobalNotificationsLatestUpdatedAtRow]:
+        result = await self._conn.stream(sqlalchemy.text(GET_GLOBAL_NOTIFICATIONS_LATEST_UPDATED_AT))
+        async for row in result:
+            yield GetGlobalNotificationsLatestUpdatedAtRow(
+                receiver_role=row[0],
+                latest_updated_at=row[1],
+            )
+
+    async def search_global_notifications(self, arg: SearchGlobalNotificationsParams) -> AsyncIterator[SearchGlobalNotificationsRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_GLOBAL_NOTIFICATIONS), {"p1": arg.query, "p2": arg.roles, "p3": arg.before, "p4": arg.page_chunk_size})
+        async for row in result:
+            yield SearchGlobalNotificationsRow(
+                global_notification_id=row[0],
+                sender=row[1],
+                receiver_role=row[2],
+                title=row[3],
+                body=row[4],
+                label=row[5],
+                link=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                rank=row[9],
+            )
+
+    async def search_global_notifications_by_label(self, arg: SearchGlobalNotificationsByLabelParams) -> AsyncIterator[SearchGlobalNotificationsByLabelRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_GLOBAL_NOTIFICATIONS_BY_LABEL), {"p1": arg.query, "p2": arg.roles, "p3": arg.page_chunk_size})
+        async for row in result:
+            yield SearchGlobalNotificationsByLabelRow(
+                global_notification_id=row[0],
+                sender=row[1],
+                receiver_role=row[2],
+                title=row[3],
+                body=row[4],
+                label=row[5],
+                link=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                rank=row[9],
+            )
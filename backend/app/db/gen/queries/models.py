@@ -4,7 +4,7 @@
 import datetime
 import enum
 import pydantic
-from typing import Optional
+from typing import Any, Optional
 
 
 class EventType(str, enum.Enum):
@@ -32,6 +32,7 @@ class GlobalNotification(pydantic.BaseModel):
     link: Optional[str]
     created_at: datetime.datetime
     updated_at: datetime.datetime
+    search_vector: Optional[Any]
 
 
 class PasswordResetRequest(pydantic.BaseModel):
@@ -52,6 +53,13 @@ class PersonalNotification(pydantic.BaseModel):
     link: Optional[str]
     created_at: datetime.datetime
     updated_at: datetime.datetime
+    search_vector: Optional[Any]
+
+
+class PersonalNotificationFanOutChunk(pydantic.BaseModel):
+    fan_out_id: str
+    chunk: int
+    created_at: datetime.datetime
 
 
 class Profile(pydantic.BaseModel):
@@ -77,3 +85,12 @@ class User(pydantic.BaseModel):
     last_personal_notification_at: datetime.datetime
     created_at: datetime.datetime
     updated_at: datetime.datetime
+
+
+class CacheUserNotificationState(pydantic.BaseModel):
+    user_id: int
+    unread_global_count: int
+    unread_personal_count: int
+    latest_global_notification_at: Optional[datetime.datetime]
+    latest_personal_notification_at: Optional[datetime.datetime]
+    updated_at: datetime.datetime
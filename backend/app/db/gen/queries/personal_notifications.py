@@ -4,7 +4,7 @@
 # source: personal_notifications.sql
 import datetime
 import pydantic
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, List, Optional
 
 import sqlalchemy
 import sqlalchemy.ext.asyncio
@@ -31,11 +31,34 @@ select
 """
 
 
+CLAIM_FAN_OUT_CHUNK = """-- name: claim_fan_out_chunk \\:one
+insert into personal_notification_fan_out_chunks (fan_out_id, chunk)
+  values (:p1, :p2)
+on conflict
+  do nothing
+returning
+  chunk
+"""
+
+
+class ClaimFanOutChunkParams(pydantic.BaseModel):
+    fan_out_id: str
+    chunk: int
+
+
 CREATE_PERSONAL_NOTIFICATION = """-- name: create_personal_notification \\:one
 insert into personal_notifications (sender, receiver_email, title, body, LABEL, link)
   values (:p1, :p2, :p3, :p4, :p5, :p6)
 returning
-  personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at
 """
 
 
@@ -48,17 +71,77 @@ class CreatePersonalNotificationParams(pydantic.BaseModel):
     link: Optional[str]
 
 
+class CreatePersonalNotificationRow(pydantic.BaseModel):
+    personal_notification_id: int
+    sender: Optional[str]
+    receiver_email: str
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+CREATE_PERSONAL_NOTIFICATIONS = """-- name: create_personal_notifications \\:many
+insert into personal_notifications (sender, receiver_email, title, body, LABEL, link)
+select
+  :p1\\:\\:text,
+  email,
+  :p2\\:\\:text,
+  :p3\\:\\:text,
+  :p4\\:\\:text,
+  :p5\\:\\:text
+from
+  users
+where
+  email = any (:p6\\:\\:text[])
+returning
+  receiver_email
+"""
+
+
+class CreatePersonalNotificationsParams(pydantic.BaseModel):
+    sender: Optional[str]
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    receiver_emails: List[str]
+
+
+DELETE_FAN_OUT_CHUNK_CLAIMS = """-- name: delete_fan_out_chunk_claims \\:one
+with deleted_claim as (
+  delete from personal_notification_fan_out_chunks
+  where created_at < :p1
+  returning
+    1)
+select
+  count(*)
+from
+  deleted_claim
+"""
+
+
 DELETE_PERSONAL_NOTIFICATION = """-- name: delete_personal_notification \\:exec
 delete from personal_notifications
 where personal_notification_id = :p1
 returning
-  personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at
+  personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at, search_vector
 """
 
 
 GET_PERSONAL_NOTIFICATION_BY_ID = """-- name: get_personal_notification_by_id \\:one
 select
-  personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at
 from
   personal_notifications
 where
@@ -66,6 +149,18 @@ where
 """
 
 
+class GetPersonalNotificationByIdRow(pydantic.BaseModel):
+    personal_notification_id: int
+    sender: Optional[str]
+    receiver_email: str
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
 GET_PERSONAL_NOTIFICATIONS_BY_STARTING_DATE = """-- name: get_personal_notifications_by_starting_date \\:many
 select
   notifications.personal_notification_id,
@@ -83,7 +178,7 @@ select
 from ((
     -- Rows where the notification has been updated at some point.
     select
-      personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at,
+      personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at, search_vector,
       updated_at as event_timestamp,
       -- define a new column event_type and set its value
       'is_update' as event_type
@@ -99,7 +194,7 @@ from ((
 union (
   -- All rows.
   select
-    personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at,
+    personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at, search_vector,
     created_at as event_timestamp,
     -- define a new column event_type and set its value
     'is_create' as event_type
@@ -138,6 +233,146 @@ class GetPersonalNotificationsByStartingDateRow(pydantic.BaseModel):
     row_number: int
 
 
+GET_PERSONAL_NOTIFICATIONS_FEED = """-- name: get_personal_notifications_feed \\:many
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  label,
+  link,
+  body,
+  created_at,
+  updated_at,
+  created_at as event_timestamp,
+  (
+    case when updated_at != created_at then
+      'is_update'
+    else
+      'is_create'
+    end)\\:\\:event_type as event_type
+from
+  personal_notifications
+where
+  receiver_email = :p1
+  and created_at <= :p2\\:\\:timestamp
+  and (created_at, personal_notification_id) < (:p2\\:\\:timestamp, :p3\\:\\:int)
+order by
+  created_at desc,
+  personal_notification_id desc
+limit :p4\\:\\:int
+"""
+
+
+class GetPersonalNotificationsFeedParams(pydantic.BaseModel):
+    receiver_email: str
+    cursor_timestamp: datetime.datetime
+    cursor_id: int
+    page_chunk_size: int
+
+
+class GetPersonalNotificationsFeedRow(pydantic.BaseModel):
+    personal_notification_id: int
+    sender: Optional[str]
+    receiver_email: str
+    title: str
+    label: str
+    link: Optional[str]
+    body: str
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    event_timestamp: datetime.datetime
+    event_type: models.EventType
+
+
+SEARCH_PERSONAL_NOTIFICATIONS = """-- name: search_personal_notifications \\:many
+-- Matches of a web search style query, most recent first, read in order from the receiver's entries in the RUM index.
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  ts_rank(search_vector, websearch_to_tsquery('english', :p1)) as rank
+from
+  personal_notifications
+where
+  search_vector @@ websearch_to_tsquery('english', :p1)
+  and receiver_email = :p2
+order by
+  updated_at <=| :p3\\:\\:timestamp
+limit :p4\\:\\:int
+"""
+
+
+class SearchPersonalNotificationsParams(pydantic.BaseModel):
+    query: str
+    receiver_email: str
+    before: datetime.datetime
+    page_chunk_size: int
+
+
+class SearchPersonalNotificationsRow(pydantic.BaseModel):
+    personal_notification_id: int
+    sender: Optional[str]
+    receiver_email: str
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    rank: float
+
+
+SEARCH_PERSONAL_NOTIFICATIONS_BY_LABEL = """-- name: search_personal_notifications_by_label \\:many
+-- Labels similar to the query, for queries without full text matches, e.g. misspelled labels.
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  similarity(label, :p1) as rank
+from
+  personal_notifications
+where
+  receiver_email = :p2
+  and label % :p1
+order by
+  rank desc,
+  updated_at desc
+limit :p3\\:\\:int
+"""
+
+
+class SearchPersonalNotificationsByLabelParams(pydantic.BaseModel):
+    query: str
+    receiver_email: str
+    page_chunk_size: int
+
+
+class SearchPersonalNotificationsByLabelRow(pydantic.BaseModel):
+    personal_notification_id: int
+    sender: Optional[str]
+    receiver_email: str
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    rank: float
+
+
 class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
@@ -148,7 +383,13 @@ class AsyncQuerier:
             return None
         return row[0]
 
-    async def create_personal_notification(self, arg: CreatePersonalNotificationParams) -> Optional[models.PersonalNotification]:
+    async def claim_fan_out_chunk(self, arg: ClaimFanOutChunkParams) -> Optional[int]:
+        row = (await self._conn.execute(sqlalchemy.text(CLAIM_FAN_OUT_CHUNK), {"p1": arg.fan_out_id, "p2": arg.chunk})).first()
+        if row is None:
+            return None
+        return row[0]
+
+    async def create_personal_notification(self, arg: CreatePersonalNotificationParams) -> Optional[CreatePersonalNotificationRow]:
         row = (await self._conn.execute(sqlalchemy.text(CREATE_PERSONAL_NOTIFICATION), {
             "p1": arg.sender,
             "p2": arg.receiver_email,
@@ -159,7 +400,7 @@ class AsyncQuerier:
         })).first()
         if row is None:
             return None
-        return models.PersonalNotification(
+        return CreatePersonalNotificationRow(
             personal_notification_id=row[0],
             sender=row[1],
             receiver_email=row[2],
@@ -171,14 +412,32 @@ class AsyncQuerier:
             updated_at=row[8],
         )
 
+    async def create_personal_notifications(self, arg: CreatePersonalNotificationsParams) -> AsyncIterator[str]:
+        result = await self._conn.stream(sqlalchemy.text(CREATE_PERSONAL_NOTIFICATIONS), {
+            "p1": arg.sender,
+            "p2": arg.title,
+            "p3": arg.body,
+            "p4": arg.label,
+            "p5": arg.link,
+            "p6": arg.receiver_emails,
+        })
+        async for row in result:
+            yield row[0]
+
+    async def delete_fan_out_chunk_claims(self, *, created_before: datetime.datetime) -> Optional[int]:
+        row = (await self._conn.execute(sqlalchemy.text(DELETE_FAN_OUT_CHUNK_CLAIMS), {"p1": created_before})).first()
+        if row is None:
+            return None
+        return row[0]
+
     async def delete_personal_notification(self, *, personal_notification_id: int) -> None:
         await self._conn.execute(sqlalchemy.text(DELETE_PERSONAL_NOTIFICATION), {"p1": personal_notification_id})
 
-    async def get_personal_notification_by_id(self, *, personal_notification_id: int) -> Optional[models.PersonalNotification]:
+    async def get_personal_notification_by_id(self, *, personal_notification_id: int) -> Optional[GetPersonalNotificationByIdRow]:
         row = (await self._conn.execute(sqlalchemy.text(GET_PERSONAL_NOTIFICATION_BY_ID), {"p1": personal_notification_id})).first()
         if row is None:
             return None
-        return models.PersonalNotification(
+        return GetPersonalNotificationByIdRow(
             personal_notification_id=row[0],
             sender=row[1],
             receiver_email=row[2],
@@ -207,3 +466,52 @@ class AsyncQuerier:
                 event_type=row[10],
                 row_number=row[11],
             )
+
+    async def get_personal_notifications_feed(self, arg: GetPersonalNotificationsFeedParams) -> AsyncIterator[GetPersonalNotificationsFeedRow]:
+        result = await self._conn.stream(sqlalchemy.text(GET_PERSONAL_NOTIFICATIONS_FEED), {"p1": arg.receiver_email, "p2": arg.cursor_timestamp, "p3": arg.cursor_id, "p4": arg.page_chunk_size})
+        async for row in result:
+            yield GetPersonalNotificationsFeedRow(
+                personal_notification_id=row[0],
+                sender=row[1],
+                receiver_email=row[2],
+                title=row[3],
+                label=row[4],
+                link=row[5],
+                body=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                event_timestamp=row[9],
+                event_type=row[10],
+            )
+
+    async def search_personal_notifications(self, arg: SearchPersonalNotificationsParams) -> AsyncIterator[SearchPersonalNotificationsRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_PERSONAL_NOTIFICATIONS), {"p1": arg.query, "p2": arg.receiver_email, "p3": arg.before, "p4": arg.page_chunk_size})
+        async for row in result:
+            yield SearchPersonalNotificationsRow(
+                personal_notification_id=row[0],
+                sender=row[1],
+                receiver_email=row[2],
+                title=row[3],
+                body=row[4],
+                label=row[5],
+                link=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                rank=row[9],
+            )
+
+    async def search_personal_notifications_by_label(self, arg: SearchPersonalNotificationsByLabelParams) -> AsyncIterator[SearchPersonalNotificationsByLabelRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_PERSONAL_NOTIFICATIONS_BY_LABEL), {"p1": arg.query, "p2": arg.receiver_email, "p3": arg.page_chunk_size})
+        async for row in result:
+            yield SearchPersonalNotificationsByLabelRow(
+                personal_notification_id=row[0],
+                sender=row[1],
+                receiver_email=row[2],
+                title=row[3],
+                body=row[4],
+                label=row[5],
+                link=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                rank=row[9],
+            )
@@ -4,7 +4,7 @@
 # source: users.sql
 import datetime
 import pydantic
-from typing import Any, AsyncIterator, List, Optional
+from typing import AsyncIterator, List, Optional
 
 import sqlalchemy
 import sqlalchemy.ext.asyncio
@@ -12,14 +12,31 @@ import sqlalchemy.ext.asyncio
 from app.db.gen.queries import models
 
 
-GET_ROLES = """-- name: get_roles \\:many
+CHECK_HAS_NEW_NOTIFICATIONS = """-- name: check_has_new_notifications \\:many
 select
-  ENUM_RANGE(null\\:\\:users.role)\\:\\:text[]
+  user_id,
+  unread_global_count > 0 as has_new_global_notifications,
+  unread_personal_count > 0 as has_new_personal_notifications,
+  unread_global_count,
+  unread_personal_count
+from
+  cache.user_notification_state
+where
+  user_id = any (:p1\\:\\:int[])
 """
 
 
-GET_USER = """-- name: get_user \\:one
+class CheckHasNewNotificationsRow(pydantic.BaseModel):
+    user_id: int
+    has_new_global_notifications: bool
+    has_new_personal_notifications: bool
+    unread_global_count: int
+    unread_personal_count: int
+
+
+GET_AUTH_USER_BY_USERNAME = """-- name: get_auth_user_by_username \\:one
 select
+  user_id,
   username,
   email,
   role,
@@ -29,46 +46,132 @@ select
   last_global_notification_at,
   last_personal_notification_at,
   created_at,
-  updated_at,
-  full_name,
-  phone_number,
-  bio,
-  image,
-  COALESCE(
-    case when :p1\\:\\:boolean then
-      (user_id)
-    end, -1)\\:\\:int as user_id,
-  case when :p1\\:\\:boolean then
-    (salt)
-  end as salt,
-  case when :p1\\:\\:boolean then
-    (password)
-  end as password
+  updated_at
+from
+  users
+where
+  username = :p1
+"""
+
+
+class GetAuthUserByUsernameRow(pydantic.BaseModel):
+    user_id: int
+    username: str
+    email: str
+    role: models.Role
+    is_verified: bool
+    is_active: bool
+    is_superuser: bool
+    last_global_notification_at: datetime.datetime
+    last_personal_notification_at: datetime.datetime
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+GET_ROLES = """-- name: get_roles \\:many
+select
+  ENUM_RANGE(null\\:\\:role)\\:\\:text[]
+"""
+
+
+GET_UNREAD_NOTIFICATION_COUNTS = """-- name: get_unread_notification_counts \\:one
+select
+  unread_global_count,
+  unread_personal_count
+from
+  cache.user_notification_state
+where
+  user_id = :p1
+"""
+
+
+class GetUnreadNotificationCountsRow(pydantic.BaseModel):
+    unread_global_count: int
+    unread_personal_count: int
+
+
+GET_USER_BY_EMAIL = """-- name: get_user_by_email \\:one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
 from
   users
   left join profiles using (user_id)
-where (email = LOWER(:p2)\\:\\:text
-  or :p2\\:\\:text is null)
-and (username = :p3\\:\\:text
-  or :p3\\:\\:text is null)
-and (users.user_id = :p4\\:\\:int
-  or :p4\\:\\:int is null)
-limit 1
+where
+  users.email = LOWER(:p1)
 """
 
 
-class GetUserParams(pydantic.BaseModel):
-    get_db_data: bool
-    email: Optional[str]
-    username: Optional[str]
-    user_id: Optional[int]
+class GetUserByEmailRow(pydantic.BaseModel):
+    user_id: int
+    username: str
+    email: str
+    role: models.Role
+    is_verified: bool
+    salt: str
+    password: str
+    is_active: bool
+    is_superuser: bool
+    last_global_notification_at: datetime.datetime
+    last_personal_notification_at: datetime.datetime
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    full_name: Optional[str]
+    phone_number: Optional[str]
+    bio: Optional[str]
+    image: Optional[str]
+
+
+GET_USER_BY_ID = """-- name: get_user_by_id \\:one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
+from
+  users
+  left join profiles using (user_id)
+where
+  users.user_id = :p1
+"""
 
 
-class GetUserRow(pydantic.BaseModel):
+class GetUserByIdRow(pydantic.BaseModel):
+    user_id: int
     username: str
     email: str
     role: models.Role
     is_verified: bool
+    salt: str
+    password: str
     is_active: bool
     is_superuser: bool
     last_global_notification_at: datetime.datetime
@@ -79,20 +182,62 @@ class GetUserRow(pydantic.BaseModel):
     phone_number: Optional[str]
     bio: Optional[str]
     image: Optional[str]
+
+
+GET_USER_BY_USERNAME = """-- name: get_user_by_username \\:one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
+from
+  users
+  left join profiles using (user_id)
+where
+  users.username = :p1
+"""
+
+
+class GetUserByUsernameRow(pydantic.BaseModel):
     user_id: int
-    salt: Optional[Any]
-    password: Optional[Any]
+    username: str
+    email: str
+    role: models.Role
+    is_verified: bool
+    salt: str
+    password: str
+    is_active: bool
+    is_superuser: bool
+    last_global_notification_at: datetime.datetime
+    last_personal_notification_at: datetime.datetime
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    full_name: Optional[str]
+    phone_number: Optional[str]
+    bio: Optional[str]
+    image: Optional[str]
 
 
 LIST_ALL_USERS = """-- name: list_all_users \\:many
 select
-  users.user_id,
+  user_id,
   username,
   email,
   role,
   is_verified,
-  salt,
-  password,
   is_active,
   is_superuser,
   last_global_notification_at,
@@ -101,10 +246,111 @@ select
   updated_at
 from
   users
-  left join profiles using (user_id)
-where
-  is_verified = :p1\\:\\:boolean
-  or :p1\\:\\:boolean is null
+where (is_verified = :p1\\:\\:boolean
+  or :p1\\:\\:boolean is null)
+and user_id > :p2\\:\\:int
+order by
+  user_id
+limit :p3\\:\\:int
+"""
+
+
+class ListAllUsersParams(pydantic.BaseModel):
+    is_verified: Optional[bool]
+    after_user_id: int
+    page_size: Optional[int]
+
+
+class ListAllUsersRow(pydantic.BaseModel):
+    user_id: int
+    username: str
+    email: str
+    role: models.Role
+    is_verified: bool
+    is_active: bool
+    is_superuser: bool
+    last_global_notification_at: datetime.datetime
+    last_personal_notification_at: datetime.datetime
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+LIST_NOTIFICATION_RECIPIENTS = """-- name: list_notification_recipients \\:many
+select
+  user_id,
+  email
+from
+  users
+where (role = :p1\\:\\:role
+  or :p1\\:\\:role is null)
+and (is_verified = :p2\\:\\:boolean
+  or :p2\\:\\:boolean is null)
+and (email = any (:p3\\:\\:text[])
+  or :p3\\:\\:text[] is null)
+and user_id > :p4\\:\\:int
+order by
+  user_id
+limit :p5\\:\\:int
+"""
+
+
+class ListNotificationRecipientsParams(pydantic.BaseModel):
+    role: Optional[models.Role]
+    is_verified: Optional[bool]
+    emails: Optional[List[str]]
+    after_user_id: int
+    page_size: int
+
+
+class ListNotificationRecipientsRow(pydantic.BaseModel):
+    user_id: int
+    email: str
+
+
+REBUILD_USER_NOTIFICATION_STATE = """-- name: rebuild_user_notification_state \\:exec
+insert into cache.user_notification_state (user_id, unread_global_count, unread_personal_count,
+  latest_global_notification_at, latest_personal_notification_at)
+select
+  users.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= users.role
+      and global_notifications.updated_at > users.last_global_notification_at),
+  (
+    select
+      count(*)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = users.email
+      and personal_notifications.updated_at > users.last_personal_notification_at),
+  (
+    select
+      max(global_notifications.updated_at)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= users.role),
+  (
+    select
+      max(personal_notifications.updated_at)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = users.email)
+from
+  users
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    unread_personal_count = excluded.unread_personal_count,
+    latest_global_notification_at = excluded.latest_global_notification_at,
+    latest_personal_notification_at = excluded.latest_personal_notification_at,
+    updated_at = timezone('utc', current_timestamp)
 """
 
 
@@ -157,13 +403,122 @@ class ResetUserPasswordParams(pydantic.BaseModel):
     email: str
 
 
+SEARCH_USERS = """-- name: search_users \\:many
+with matches as (
+  select
+    user_id
+  from
+    users
+  where
+    username % :p1
+  union
+  select
+    user_id
+  from
+    users
+  where
+    email % :p1
+  union
+  select
+    user_id
+  from
+    profiles
+  where
+    full_name % :p1
+),
+ranked as (
+  select
+    users.user_id,
+    users.username,
+    users.email,
+    users.role,
+    users.is_verified,
+    users.is_active,
+    users.is_superuser,
+    users.created_at,
+    users.updated_at,
+    profiles.full_name,
+    greatest(similarity(users.username, :p1), similarity(users.email, :p1), coalesce(similarity(profiles.full_name, :p1), 0)) as rank
+  from
+    matches
+    inner join users using (user_id)
+    left join profiles using (user_id)
+)
+select
+  user_id,
+  username,
+  email,
+  role,
+  is_verified,
+  is_active,
+  is_superuser,
+  created_at,
+  updated_at,
+  full_name,
+  rank
+from
+  ranked
+where (rank < :p2\\:\\:real
+  or (rank = :p2\\:\\:real
+    and user_id > :p3\\:\\:int)
+  or :p2\\:\\:real is null)
+order by
+  rank desc,
+  user_id
+limit :p4\\:\\:int
+"""
+
+
+class SearchUsersParams(pydantic.BaseModel):
+    query: str
+    after_rank: Optional[float]
+    after_user_id: int
+    page_size: int
+
+
+class SearchUsersRow(pydantic.BaseModel):
+    user_id: int
+    username: str
+    email: str
+    role: models.Role
+    is_verified: bool
+    is_active: bool
+    is_superuser: bool
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+    full_name: Optional[str]
+    rank: float
+
+
 UPDATE_GLOBAL_LAST_NOTIFICATION_AT = """-- name: update_global_last_notification_at \\:exec
-update
-  users
-set
-  last_global_notification_at = :p1
-where
-  user_id = :p2
+with updated_user as (
+  update
+    users
+  set
+    last_global_notification_at = :p1
+  where
+    user_id = :p2
+  returning
+    user_id,
+    role,
+    last_global_notification_at)
+insert into cache.user_notification_state (user_id, unread_global_count)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role
+      and global_notifications.updated_at > updated_user.last_global_notification_at)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    updated_at = timezone('utc', current_timestamp)
 """
 
 
@@ -173,12 +528,34 @@ class UpdateGlobalLastNotificationAtParams(pydantic.BaseModel):
 
 
 UPDATE_PERSONAL_LAST_NOTIFICATION_AT = """-- name: update_personal_last_notification_at \\:exec
-update
-  users
-set
-  last_personal_notification_at = :p1
-where
-  user_id = :p2
+with updated_user as (
+  update
+    users
+  set
+    last_personal_notification_at = :p1
+  where
+    user_id = :p2
+  returning
+    user_id,
+    email,
+    last_personal_notification_at)
+insert into cache.user_notification_state (user_id, unread_personal_count)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = updated_user.email
+      and personal_notifications.updated_at > updated_user.last_personal_notification_at)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_personal_count = excluded.unread_personal_count,
+    updated_at = timezone('utc', current_timestamp)
 """
 
 
@@ -223,12 +600,42 @@ class UpdateUserByIdParams(pydantic.BaseModel):
 
 
 UPDATE_USER_ROLE = """-- name: update_user_role \\:exec
-update
-  users
-set
-  role = :p1
-where
-  user_id = :p2
+with updated_user as (
+  update
+    users
+  set
+    role = :p1
+  where
+    user_id = :p2
+  returning
+    user_id,
+    role,
+    last_global_notification_at)
+insert into cache.user_notification_state (user_id, unread_global_count, latest_global_notification_at)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role
+      and global_notifications.updated_at > updated_user.last_global_notification_at),
+  (
+    select
+      max(global_notifications.updated_at)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    latest_global_notification_at = excluded.latest_global_notification_at,
+    updated_at = timezone('utc', current_timestamp)
 """
 
 
@@ -237,13 +644,13 @@ class UpdateUserRoleParams(pydantic.BaseModel):
     user_id: int
 
 
-VERIFY_USER_BY_EMAIL = """-- name: verify_user_by_email \\:one
+VERIFY_USERS_BY_EMAILS = """-- name: verify_users_by_emails \\:many
 update
   users
 set
   is_verified = 'true'
 where
-  email = LOWER(:p1)
+  email = any (:p1\\:\\:text[])
 returning
   email
 """
@@ -253,59 +660,155 @@ class AsyncQuerier:
     def __init__(self, conn: sqlalchemy.ext.asyncio.AsyncConnection):
         self._conn = conn
 
+    async def check_has_new_notifications(self, *, user_ids: List[int]) -> AsyncIterator[CheckHasNewNotificationsRow]:
+        result = await self._conn.stream(sqlalchemy.text(CHECK_HAS_NEW_NOTIFICATIONS), {"p1": user_ids})
+        async for row in result:
+            yield CheckHasNewNotificationsRow(
+                user_id=row[0],
+                has_new_global_notifications=row[1],
+                has_new_personal_notifications=row[2],
+                unread_global_count=row[3],
+                unread_personal_count=row[4],
+            )
+
+    async def get_auth_user_by_username(self, *, username: str) -> Optional[GetAuthUserByUsernameRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_AUTH_USER_BY_USERNAME), {"p1": username})).first()
+        if row is None:
+            return None
+        return GetAuthUserByUsernameRow(
+            user_id=row[0],
+            username=row[1],
+            email=row[2],
+            role=row[3],
+            is_verified=row[4],
+            is_active=row[5],
+            is_superuser=row[6],
+            last_global_notification_at=row[7],
+            last_personal_notification_at=row[8],
+            created_at=row[9],
+            updated_at=row[10],
+        )
+
     async def get_roles(self) -> AsyncIterator[List[str]]:
         result = await self._conn.stream(sqlalchemy.text(GET_ROLES))
         async for row in result:
             yield row[0]
 
-    async def get_user(self, arg: GetUserParams) -> Optional[GetUserRow]:
-        row = (await self._conn.execute(sqlalchemy.text(GET_USER), {
-            "p1": arg.get_db_data,
-            "p2": arg.email,
-            "p3": arg.username,
-            "p4": arg.user_id,
-        })).first()
+    async def get_unread_notification_counts(self, *, user_id: int) -> Optional[GetUnreadNotificationCountsRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_UNREAD_NOTIFICATION_COUNTS), {"p1": user_id})).first()
+        if row is None:
+            return None
+        return GetUnreadNotificationCountsRow(
+            unread_global_count=row[0],
+            unread_personal_count=row[1],
+        )
+
+    async def get_user_by_email(self, *, email: str) -> Optional[GetUserByEmailRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_USER_BY_EMAIL), {"p1": email})).first()
+        if row is None:
+            return None
+        return GetUserByEmailRow(
+            user_id=row[0],
+            username=row[1],
+            email=row[2],
+            role=row[3],
+            is_verified=row[4],
+            salt=row[5],
+            password=row[6],
+            is_active=row[7],
+            is_superuser=row[8],
+            last_global_notification_at=row[9],
+            last_personal_notification_at=row[10],
+            created_at=row[11],
+            updated_at=row[12],
+            full_name=row[13],
+            phone_number=row[14],
+            bio=row[15],
+            image=row[16],
+        )
+
+    async def get_user_by_id(self, *, user_id: int) -> Optional[GetUserByIdRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_USER_BY_ID), {"p1": user_id})).first()
+        if row is None:
+            return None
+        return GetUserByIdRow(
+            user_id=row[0],
+            username=row[1],
+            email=row[2],
+            role=row[3],
+            is_verified=row[4],
+            salt=row[5],
+            password=row[6],
+            is_active=row[7],
+            is_superuser=row[8],
+            last_global_notification_at=row[9],
+            last_personal_notification_at=row[10],
+            created_at=row[11],
+            updated_at=row[12],
+            full_name=row[13],
+            phone_number=row[14],
+            bio=row[15],
+            image=row[16],
+        )
+
+    async def get_user_by_username(self, *, username: str) -> Optional[GetUserByUsernameRow]:
+        row = (await self._conn.execute(sqlalchemy.text(GET_USER_BY_USERNAME), {"p1": username})).first()
         if row is None:
             return None
-        return GetUserRow(
-            username=row[0],
-            email=row[1],
-            role=row[2],
-            is_verified=row[3],
-            is_active=row[4],
-            is_superuser=row[5],
-            last_global_notification_at=row[6],
-            last_personal_notification_at=row[7],
-            created_at=row[8],
-            updated_at=row[9],
-            full_name=row[10],
-            phone_number=row[11],
-            bio=row[12],
-            image=row[13],
-            user_id=row[14],
-            salt=row[15],
-            password=row[16],
+        return GetUserByUsernameRow(
+            user_id=row[0],
+            username=row[1],
+            email=row[2],
+            role=row[3],
+            is_verified=row[4],
+            salt=row[5],
+            password=row[6],
+            is_active=row[7],
+            is_superuser=row[8],
+            last_global_notification_at=row[9],
+            last_personal_notification_at=row[10],
+            created_at=row[11],
+            updated_at=row[12],
+            full_name=row[13],
+            phone_number=row[14],
+            bio=row[15],
+            image=row[16],
         )
 
-    async def list_all_users(self, *, is_verified: Optional[bool]) -> AsyncIterator[models.User]:
-        result = await self._conn.stream(sqlalchemy.text(LIST_ALL_USERS), {"p1": is_verified})
+    async def list_all_users(self, arg: ListAllUsersParams) -> AsyncIterator[ListAllUsersRow]:
+        result = await self._conn.stream(sqlalchemy.text(LIST_ALL_USERS), {"p1": arg.is_verified, "p2": arg.after_user_id, "p3": arg.page_size})
         async for row in result:
-            yield models.User(
+            yield ListAllUsersRow(
                 user_id=row[0],
                 username=row[1],
                 email=row[2],
                 role=row[3],
                 is_verified=row[4],
-                salt=row[5],
-                password=row[6],
-                is_active=row[7],
-                is_superuser=row[8],
-                last_global_notification_at=row[9],
-                last_personal_notification_at=row[10],
-                created_at=row[11],
-                updated_at=row[12],
+                is_active=row[5],
+                is_superuser=row[6],
+                last_global_notification_at=row[7],
+                last_personal_notification_at=row[8],
+                created_at=row[9],
+                updated_at=row[10],
             )
 
+    async def list_notification_recipients(self, arg: ListNotificationRecipientsParams) -> AsyncIterator[ListNotificationRecipientsRow]:
+        result = await self._conn.stream(sqlalchemy.text(LIST_NOTIFICATION_RECIPIENTS), {
+            "p1": arg.role,
+            "p2": arg.is_verified,
+            "p3": arg.emails,
+            "p4": arg.after_user_id,
+            "p5": arg.page_size,
+        })
+        async for row in result:
+            yield ListNotificationRecipientsRow(
+                user_id=row[0],
+                email=row[1],
+            )
+
+    async def rebuild_user_notification_state(self) -> None:
+        await self._conn.execute(sqlalchemy.text(REBUILD_USER_NOTIFICATION_STATE))
+
     async def register_new_user(self, arg: RegisterNewUserParams) -> Optional[RegisterNewUserRow]:
         row = (await self._conn.execute(sqlalchemy.text(REGISTER_NEW_USER), {
             "p1": arg.username,
@@ -334,6 +837,28 @@ class AsyncQuerier:
     async def reset_user_password(self, arg: ResetUserPasswordParams) -> None:
         await self._conn.execute(sqlalchemy.text(RESET_USER_PASSWORD), {"p1": arg.password, "p2": arg.salt, "p3": arg.email})
 
+    async def search_users(self, arg: SearchUsersParams) -> AsyncIterator[SearchUsersRow]:
+        result = await self._conn.stream(sqlalchemy.text(SEARCH_USERS), {
+            "p1": arg.query,
+            "p2": arg.after_rank,
+            "p3": arg.after_user_id,
+            "p4": arg.page_size,
+        })
+        async for row in result:
+            yield SearchUsersRow(
+                user_id=row[0],
+                username=row[1],
+                email=row[2],
+                role=row[3],
+                is_verified=row[4],
+                is_active=row[5],
+                is_superuser=row[6],
+                created_at=row[7],
+                updated_at=row[8],
+                full_name=row[9],
+                rank=row[10],
+            )
+
     async def update_global_last_notification_at(self, arg: UpdateGlobalLastNotificationAtParams) -> None:
         await self._conn.execute(sqlalchemy.text(UPDATE_GLOBAL_LAST_NOTIFICATION_AT), {"p1": arg.last_global_notification_at, "p2": arg.user_id})
 
@@ -369,8 +894,7 @@ class AsyncQuerier:
     async def update_user_role(self, arg: UpdateUserRoleParams) -> None:
         await self._conn.execute(sqlalchemy.text(UPDATE_USER_ROLE), {"p1": arg.role, "p2": arg.user_id})
 
-    async def verify_user_by_email(self, *, email: str) -> Optional[str]:
-        row = (await self._conn.execute(sqlalchemy.text(VERIFY_USER_BY_EMAIL), {"p1": email})).first()
-        if row is None:
-            return None
-        return row[0]
+    async def verify_users_by_emails(self, *, emails: List[str]) -> AsyncIterator[str]:
+        result = await self._conn.stream(sqlalchemy.text(VERIFY_USERS_BY_EMAILS), {"p1": emails})
+        async for row in result:
+            yield row[0]
@@ -1,5 +1,212 @@
 BEGIN;
 
+-- Running downgrade 00000010 -> 00000009
+
+CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+            USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');;
+
+DROP INDEX ix_personal_notifications_receiver_email_search_vector;
+
+UPDATE alembic_version SET version_num='00000009' WHERE alembic_version.version_num = '00000010';
+
+-- Running downgrade 00000009 -> 00000008
+
+LOCK TABLE personal_notifications IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE personal_notifications RENAME TO personal_notifications_partitioned;
+
+ALTER TABLE personal_notifications_partitioned RENAME CONSTRAINT personal_notifications_pkey TO personal_notifications_partitioned_pkey;
+
+CREATE TABLE personal_notifications (
+    personal_notification_id INTEGER DEFAULT nextval('personal_notifications_personal_notification_id_seq') NOT NULL, 
+    sender TEXT, 
+    receiver_email TEXT NOT NULL, 
+    title TEXT NOT NULL, 
+    body TEXT NOT NULL, 
+    label TEXT NOT NULL, 
+    link TEXT, 
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP) NOT NULL, 
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP) NOT NULL, 
+    search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', label), 'B') || setweight(to_tsvector('english', body), 'C')) STORED, 
+    PRIMARY KEY (personal_notification_id), 
+    CONSTRAINT personal_notifications_sender_fkey FOREIGN KEY(sender) REFERENCES users (email) ON DELETE CASCADE, 
+    CONSTRAINT personal_notifications_receiver_email_fkey FOREIGN KEY(receiver_email) REFERENCES users (email) ON DELETE CASCADE
+);
+
+INSERT INTO personal_notifications (personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at) SELECT personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at FROM personal_notifications_partitioned;
+
+ALTER SEQUENCE personal_notifications_personal_notification_id_seq OWNED BY personal_notifications.personal_notification_id;
+
+DROP TABLE personal_notifications_partitioned;
+
+CREATE INDEX ix_personal_notifications_created_at ON personal_notifications (created_at);
+
+CREATE INDEX ix_personal_notifications_updated_at ON personal_notifications (updated_at);
+
+CREATE INDEX ix_personal_notifications_receiver_email_created_at_id ON personal_notifications (receiver_email, created_at, personal_notification_id);
+
+CREATE INDEX ix_personal_notifications_receiver_email_updated_at ON personal_notifications (receiver_email, updated_at);
+
+CREATE INDEX ix_personal_notifications_sender ON personal_notifications (sender) WHERE sender IS NOT NULL;
+
+CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+            USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');;
+
+CREATE INDEX ix_personal_notifications_receiver_email_label_trgm ON personal_notifications
+            USING gin (receiver_email, label gin_trgm_ops);;
+
+CREATE TRIGGER personal_notifications_notify_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_notify_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_notify_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+UPDATE alembic_version SET version_num='00000008' WHERE alembic_version.version_num = '00000009';
+
+-- Running downgrade 00000008 -> 00000007
+
+DROP INDEX ix_profiles_full_name_trgm;
+
+DROP INDEX ix_users_email_trgm;
+
+DROP INDEX ix_users_username_trgm;
+
+UPDATE alembic_version SET version_num='00000007' WHERE alembic_version.version_num = '00000008';
+
+-- Running downgrade 00000007 -> 00000006
+
+DROP INDEX ix_personal_notifications_receiver_email_label_trgm;
+
+DROP INDEX ix_global_notifications_receiver_role_label_trgm;
+
+DROP INDEX ix_global_notifications_search_vector;
+
+ALTER TABLE global_notifications DROP COLUMN search_vector;
+
+DROP INDEX ix_personal_notifications_search_vector;
+
+ALTER TABLE personal_notifications DROP COLUMN search_vector;
+
+UPDATE alembic_version SET version_num='00000006' WHERE alembic_version.version_num = '00000007';
+
+-- Running downgrade 00000006 -> 00000005
+
+DROP TRIGGER IF EXISTS global_notifications_state_insert ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_state_insert ON personal_notifications;
+
+DROP TRIGGER IF EXISTS global_notifications_state_update ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_state_update ON personal_notifications;
+
+DROP TRIGGER IF EXISTS global_notifications_state_delete ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_state_delete ON personal_notifications;
+
+DROP FUNCTION IF EXISTS cache.update_global_notifications_state;
+
+DROP FUNCTION IF EXISTS cache.update_personal_notifications_state;
+
+DROP FUNCTION IF EXISTS cache.add_unread_global_notifications;
+
+DROP FUNCTION IF EXISTS cache.add_unread_personal_notifications;
+
+DROP TABLE cache.user_notification_state;
+
+UPDATE alembic_version SET version_num='00000005' WHERE alembic_version.version_num = '00000006';
+
+-- Running downgrade 00000005 -> 00000004
+
+DROP TABLE personal_notification_fan_out_chunks;
+
+UPDATE alembic_version SET version_num='00000004' WHERE alembic_version.version_num = '00000005';
+
+-- Running downgrade 00000004 -> 00000003
+
+DROP INDEX ix_users_unverified;
+
+DROP INDEX ix_profiles_user_id;
+
+CREATE INDEX ix_global_notifications_receiver_role ON global_notifications (receiver_role);
+
+DROP INDEX ix_global_notifications_sender;
+
+DROP INDEX ix_personal_notifications_sender;
+
+DROP INDEX ix_personal_notifications_receiver_email_updated_at;
+
+UPDATE alembic_version SET version_num='00000003' WHERE alembic_version.version_num = '00000004';
+
+-- Running downgrade 00000003 -> 00000002
+
+DROP INDEX ix_personal_notifications_receiver_email_created_at_id;
+
+DROP INDEX ix_global_notifications_receiver_role_updated_at_id;
+
+UPDATE alembic_version SET version_num='00000002' WHERE alembic_version.version_num = '00000003';
+
+-- Running downgrade 00000002 -> 00000001
+
+DROP TRIGGER IF EXISTS global_notifications_notify_insert ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_notify_insert ON personal_notifications;
+
+DROP TRIGGER IF EXISTS global_notifications_notify_update ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_notify_update ON personal_notifications;
+
+DROP TRIGGER IF EXISTS global_notifications_notify_delete ON global_notifications;
+
+DROP TRIGGER IF EXISTS personal_notifications_notify_delete ON personal_notifications;
+
+DROP TRIGGER IF EXISTS users_notifications_seen ON users;
+
+DROP FUNCTION IF EXISTS notify_global_notifications_change;
+
+DROP FUNCTION IF EXISTS notify_personal_notifications_change;
+
+DROP FUNCTION IF EXISTS notify_notifications_seen;
+
+UPDATE alembic_version SET version_num='00000001' WHERE alembic_version.version_num = '00000002';
+
 -- Running downgrade 00000001 -> 
 
 DROP TYPE IF EXISTS role CASCADE;
@@ -20,7 +227,5 @@ DROP FUNCTION IF EXISTS update_updated_at_column;
 
 DELETE FROM alembic_version WHERE alembic_version.version_num = '00000001';
 
-DROP TABLE alembic_version;
-
 COMMIT;
 
@@ -134,5 +134,454 @@ CREATE INDEX ix_personal_notifications_updated_at ON personal_notifications (upd
 
 INSERT INTO alembic_version (version_num) VALUES ('00000001') RETURNING alembic_version.version_num;
 
+-- Running upgrade 00000001 -> 00000002
+
+CREATE OR REPLACE FUNCTION notify_global_notifications_change()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM
+                pg_notify('global_notifications', changed.receiver_role::text)
+            FROM (
+                SELECT DISTINCT receiver_role FROM changed_rows) AS changed;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';;
+
+CREATE TRIGGER global_notifications_notify_insert
+                AFTER INSERT
+                ON global_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_global_notifications_change();;
+
+CREATE TRIGGER global_notifications_notify_update
+                AFTER UPDATE
+                ON global_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_global_notifications_change();;
+
+CREATE TRIGGER global_notifications_notify_delete
+                AFTER DELETE
+                ON global_notifications
+                REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_global_notifications_change();;
+
+CREATE OR REPLACE FUNCTION notify_personal_notifications_change()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM
+                pg_notify('personal_notifications', changed.receiver_email)
+            FROM (
+                SELECT DISTINCT receiver_email FROM changed_rows) AS changed;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';;
+
+CREATE TRIGGER personal_notifications_notify_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_notify_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_notify_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE OR REPLACE FUNCTION notify_notifications_seen()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM pg_notify('notifications_seen', NEW.email);
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';;
+
+CREATE TRIGGER users_notifications_seen
+            AFTER UPDATE OF last_global_notification_at, last_personal_notification_at
+            ON users
+            FOR EACH ROW
+            WHEN (OLD.last_global_notification_at IS DISTINCT FROM NEW.last_global_notification_at
+                OR OLD.last_personal_notification_at IS DISTINCT FROM NEW.last_personal_notification_at)
+        EXECUTE PROCEDURE notify_notifications_seen();;
+
+UPDATE alembic_version SET version_num='00000002' WHERE alembic_version.version_num = '00000001';
+
+-- Running upgrade 00000002 -> 00000003
+
+CREATE INDEX ix_global_notifications_receiver_role_updated_at_id ON global_notifications (receiver_role, updated_at, global_notification_id);
+
+CREATE INDEX ix_personal_notifications_receiver_email_created_at_id ON personal_notifications (receiver_email, created_at, personal_notification_id);
+
+UPDATE alembic_version SET version_num='00000003' WHERE alembic_version.version_num = '00000002';
+
+-- Running upgrade 00000003 -> 00000004
+
+CREATE INDEX ix_personal_notifications_receiver_email_updated_at ON personal_notifications (receiver_email, updated_at);
+
+CREATE INDEX ix_personal_notifications_sender ON personal_notifications (sender) WHERE sender IS NOT NULL;
+
+CREATE INDEX ix_global_notifications_sender ON global_notifications (sender) WHERE sender IS NOT NULL;
+
+DROP INDEX ix_global_notifications_receiver_role;
+
+CREATE INDEX ix_profiles_user_id ON profiles (user_id);
+
+CREATE INDEX ix_users_unverified ON users (user_id) WHERE NOT is_verified;
+
+UPDATE alembic_version SET version_num='00000004' WHERE alembic_version.version_num = '00000003';
+
+-- Running upgrade 00000004 -> 00000005
+
+CREATE TABLE personal_notification_fan_out_chunks (
+    fan_out_id TEXT NOT NULL, 
+    chunk INTEGER NOT NULL, 
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now() NOT NULL, 
+    PRIMARY KEY (fan_out_id, chunk)
+);
+
+UPDATE alembic_version SET version_num='00000005' WHERE alembic_version.version_num = '00000004';
+
+-- Running upgrade 00000005 -> 00000006
+
+CREATE TABLE cache.user_notification_state (
+    user_id INTEGER NOT NULL, 
+    unread_global_count INTEGER DEFAULT '0' NOT NULL, 
+    unread_personal_count INTEGER DEFAULT '0' NOT NULL, 
+    latest_global_notification_at TIMESTAMP WITHOUT TIME ZONE, 
+    latest_personal_notification_at TIMESTAMP WITHOUT TIME ZONE, 
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP) NOT NULL, 
+    PRIMARY KEY (user_id), 
+    FOREIGN KEY(user_id) REFERENCES users (user_id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION cache.add_unread_global_notifications(
+            receiver_roles role[], notification_timestamps timestamp[], deltas bigint[])
+            RETURNS VOID AS
+        $$
+            INSERT INTO cache.user_notification_state AS state (
+                user_id, unread_global_count, latest_global_notification_at)
+            SELECT
+                users.user_id, sum(changes.delta), max(changes.updated_at) FILTER (WHERE changes.delta > 0)
+            FROM
+                unnest(receiver_roles, notification_timestamps, deltas) AS changes (receiver_role, updated_at, delta)
+                INNER JOIN users ON users.role >= changes.receiver_role
+                    AND changes.updated_at > users.last_global_notification_at
+            GROUP BY
+                users.user_id
+            ON CONFLICT (user_id)
+                DO UPDATE SET
+                    unread_global_count = GREATEST(state.unread_global_count + EXCLUDED.unread_global_count, 0),
+                    latest_global_notification_at = GREATEST(
+                        state.latest_global_notification_at, EXCLUDED.latest_global_notification_at),
+                    updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);
+        $$ language 'sql';;
+
+CREATE OR REPLACE FUNCTION cache.update_global_notifications_state()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM cache.add_unread_global_notifications(
+                    array_agg(receiver_role), array_agg(updated_at), array_agg(-n))
+                FROM (SELECT receiver_role, updated_at, count(*) AS n FROM old_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM cache.add_unread_global_notifications(
+                    array_agg(receiver_role), array_agg(updated_at), array_agg(n))
+                FROM (SELECT receiver_role, updated_at, count(*) AS n FROM new_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';;
+
+CREATE TRIGGER global_notifications_state_insert
+                AFTER INSERT
+                ON global_notifications
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_global_notifications_state();;
+
+CREATE TRIGGER global_notifications_state_update
+                AFTER UPDATE
+                ON global_notifications
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_global_notifications_state();;
+
+CREATE TRIGGER global_notifications_state_delete
+                AFTER DELETE
+                ON global_notifications
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_global_notifications_state();;
+
+CREATE OR REPLACE FUNCTION cache.add_unread_personal_notifications(
+            receiver_emails text[], notification_timestamps timestamp[], deltas bigint[])
+            RETURNS VOID AS
+        $$
+            INSERT INTO cache.user_notification_state AS state (
+                user_id, unread_personal_count, latest_personal_notification_at)
+            SELECT
+                users.user_id, sum(changes.delta), max(changes.updated_at) FILTER (WHERE changes.delta > 0)
+            FROM
+                unnest(receiver_emails, notification_timestamps, deltas) AS changes (receiver_email, updated_at, delta)
+                INNER JOIN users ON users.email = changes.receiver_email
+                    AND changes.updated_at > users.last_personal_notification_at
+            GROUP BY
+                users.user_id
+            ON CONFLICT (user_id)
+                DO UPDATE SET
+                    unread_personal_count = GREATEST(state.unread_personal_count + EXCLUDED.unread_personal_count, 0),
+                    latest_personal_notification_at = GREATEST(
+                        state.latest_personal_notification_at, EXCLUDED.latest_personal_notification_at),
+                    updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);
+        $$ language 'sql';;
+
+CREATE OR REPLACE FUNCTION cache.update_personal_notifications_state()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM cache.add_unread_personal_notifications(
+                    array_agg(receiver_email), array_agg(updated_at), array_agg(-n))
+                FROM (SELECT receiver_email, updated_at, count(*) AS n FROM old_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM cache.add_unread_personal_notifications(
+                    array_agg(receiver_email), array_agg(updated_at), array_agg(n))
+                FROM (SELECT receiver_email, updated_at, count(*) AS n FROM new_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';;
+
+CREATE TRIGGER personal_notifications_state_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_state_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_state_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+INSERT INTO cache.user_notification_state (user_id, unread_global_count, unread_personal_count,
+            latest_global_notification_at, latest_personal_notification_at)
+        SELECT
+            users.user_id,
+            (
+                SELECT count(*)
+                FROM global_notifications
+                WHERE global_notifications.receiver_role <= users.role
+                    AND global_notifications.updated_at > users.last_global_notification_at),
+            (
+                SELECT count(*)
+                FROM personal_notifications
+                WHERE personal_notifications.receiver_email = users.email
+                    AND personal_notifications.updated_at > users.last_personal_notification_at),
+            (
+                SELECT max(global_notifications.updated_at)
+                FROM global_notifications
+                WHERE global_notifications.receiver_role <= users.role),
+            (
+                SELECT max(personal_notifications.updated_at)
+                FROM personal_notifications
+                WHERE personal_notifications.receiver_email = users.email)
+        FROM
+            users
+        ON CONFLICT (user_id)
+            DO UPDATE SET
+                unread_global_count = EXCLUDED.unread_global_count,
+                unread_personal_count = EXCLUDED.unread_personal_count,
+                latest_global_notification_at = EXCLUDED.latest_global_notification_at,
+                latest_personal_notification_at = EXCLUDED.latest_personal_notification_at,
+                updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);;
+
+UPDATE alembic_version SET version_num='00000006' WHERE alembic_version.version_num = '00000005';
+
+-- Running upgrade 00000006 -> 00000007
+
+ALTER TABLE global_notifications ADD COLUMN search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', label), 'B') || setweight(to_tsvector('english', body), 'C')) STORED;
+
+ALTER TABLE personal_notifications ADD COLUMN search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', label), 'B') || setweight(to_tsvector('english', body), 'C')) STORED;
+
+CREATE INDEX ix_global_notifications_search_vector ON global_notifications
+                USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+                WITH (attach = 'updated_at', to = 'search_vector');;
+
+CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+                USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+                WITH (attach = 'updated_at', to = 'search_vector');;
+
+CREATE INDEX ix_global_notifications_receiver_role_label_trgm ON global_notifications
+            USING gin (receiver_role, label gin_trgm_ops);;
+
+CREATE INDEX ix_personal_notifications_receiver_email_label_trgm ON personal_notifications
+            USING gin (receiver_email, label gin_trgm_ops);;
+
+UPDATE alembic_version SET version_num='00000007' WHERE alembic_version.version_num = '00000006';
+
+-- Running upgrade 00000007 -> 00000008
+
+CREATE INDEX ix_users_username_trgm ON users USING gin (username gin_trgm_ops);;
+
+CREATE INDEX ix_users_email_trgm ON users USING gin (email gin_trgm_ops);;
+
+CREATE INDEX ix_profiles_full_name_trgm ON profiles USING gin (full_name gin_trgm_ops);;
+
+UPDATE alembic_version SET version_num='00000008' WHERE alembic_version.version_num = '00000007';
+
+-- Running upgrade 00000008 -> 00000009
+
+LOCK TABLE personal_notifications IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE personal_notifications RENAME TO personal_notifications_unpartitioned;
+
+ALTER TABLE personal_notifications_unpartitioned RENAME CONSTRAINT personal_notifications_pkey TO personal_notifications_unpartitioned_pkey;
+
+CREATE TABLE personal_notifications (
+    personal_notification_id INTEGER DEFAULT nextval('personal_notifications_personal_notification_id_seq') NOT NULL, 
+    sender TEXT, 
+    receiver_email TEXT NOT NULL, 
+    title TEXT NOT NULL, 
+    body TEXT NOT NULL, 
+    label TEXT NOT NULL, 
+    link TEXT, 
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP) NOT NULL, 
+    updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP) NOT NULL, 
+    search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', label), 'B') || setweight(to_tsvector('english', body), 'C')) STORED, 
+    PRIMARY KEY (personal_notification_id, created_at), 
+    CONSTRAINT personal_notifications_sender_fkey FOREIGN KEY(sender) REFERENCES users (email) ON DELETE CASCADE, 
+    CONSTRAINT personal_notifications_receiver_email_fkey FOREIGN KEY(receiver_email) REFERENCES users (email) ON DELETE CASCADE
+)
+ PARTITION BY RANGE (created_at);
+
+DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    least(
+                        date_trunc('month', min(created_at)),
+                        date_trunc('month', TIMEZONE('utc', CURRENT_TIMESTAMP))
+                            - interval '12 months'),
+                    date_trunc('month', TIMEZONE('utc', CURRENT_TIMESTAMP))
+                        + interval '3 months',
+                    interval '1 month')::date
+                FROM personal_notifications_unpartitioned
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF personal_notifications FOR VALUES FROM (%L) TO (%L)',
+                    'personal_notifications_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    (month + interval '1 month')::date);
+            END LOOP;
+        END;
+        $$;;
+
+INSERT INTO personal_notifications (personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at) SELECT personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at FROM personal_notifications_unpartitioned;
+
+ALTER SEQUENCE personal_notifications_personal_notification_id_seq OWNED BY personal_notifications.personal_notification_id;
+
+DROP TABLE personal_notifications_unpartitioned;
+
+CREATE INDEX ix_personal_notifications_created_at ON personal_notifications (created_at);
+
+CREATE INDEX ix_personal_notifications_updated_at ON personal_notifications (updated_at);
+
+CREATE INDEX ix_personal_notifications_receiver_email_created_at_id ON personal_notifications (receiver_email, created_at, personal_notification_id);
+
+CREATE INDEX ix_personal_notifications_receiver_email_updated_at ON personal_notifications (receiver_email, updated_at);
+
+CREATE INDEX ix_personal_notifications_sender ON personal_notifications (sender) WHERE sender IS NOT NULL;
+
+CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+            USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');;
+
+CREATE INDEX ix_personal_notifications_receiver_email_label_trgm ON personal_notifications
+            USING gin (receiver_email, label gin_trgm_ops);;
+
+CREATE TRIGGER personal_notifications_notify_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_insert
+                AFTER INSERT
+                ON personal_notifications
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_notify_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_update
+                AFTER UPDATE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+CREATE TRIGGER personal_notifications_notify_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();;
+
+CREATE TRIGGER personal_notifications_state_delete
+                AFTER DELETE
+                ON personal_notifications
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();;
+
+UPDATE alembic_version SET version_num='00000009' WHERE alembic_version.version_num = '00000008';
+
+-- Running upgrade 00000009 -> 00000010
+
+CREATE INDEX ix_personal_notifications_receiver_email_search_vector ON personal_notifications
+            USING rum (receiver_email rum_text_ops, search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');;
+
+DROP INDEX ix_personal_notifications_search_vector;
+
+UPDATE alembic_version SET version_num='00000010' WHERE alembic_version.version_num = '00000009';
+
 COMMIT;
 
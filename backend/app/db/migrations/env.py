@@ -66,9 +66,6 @@ async def run_migrations_online() -> None:
                 config.get_section(config.config_ini_section),
                 prefix="sqlalchemy.",
                 poolclass=pool.NullPool,
-                execution_options={
-                    "isolation_level": "AUTOCOMMIT",
-                },
                 future=True,
                 connect_args={"server_settings": {"jit": "off"}},
             )
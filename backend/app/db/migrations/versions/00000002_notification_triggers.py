@@ -0,0 +1,137 @@
+"""notification_triggers
+
+Revision ID: 00000002
+Revises: 00000001
+Create Date: 2022-06-12 10:21:47.112093
+
+"""
+import pathlib
+import sys
+
+from alembic import op
+
+import app.db.migrations.sql as sql
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+SQL_DIR = pathlib.Path(sql.__file__).parent
+
+# revision identifiers, used by Alembic
+revision = "00000002"
+down_revision = "00000001"
+branch_labels = None
+depends_on = None
+
+
+def create_global_notifications_notify_trigger() -> None:
+    """
+    Publish the receiver role of every changed global notification on the ``global_notifications`` channel.
+    Statement level triggers with transition tables, so that bulk writes send a single event per role.
+    """
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_global_notifications_change()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM
+                pg_notify('global_notifications', changed.receiver_role::text)
+            FROM (
+                SELECT DISTINCT receiver_role FROM changed_rows) AS changed;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        transition_table = "OLD" if event == "DELETE" else "NEW"
+        op.execute(
+            f"""
+            CREATE TRIGGER global_notifications_notify_{event.lower()}
+                AFTER {event}
+                ON global_notifications
+                REFERENCING {transition_table} TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_global_notifications_change();
+            """
+        )
+
+
+def create_personal_notifications_notify_trigger() -> None:
+    """
+    Publish the receiver email of every changed personal notification on the ``personal_notifications`` channel.
+    """
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_personal_notifications_change()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM
+                pg_notify('personal_notifications', changed.receiver_email)
+            FROM (
+                SELECT DISTINCT receiver_email FROM changed_rows) AS changed;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        transition_table = "OLD" if event == "DELETE" else "NEW"
+        op.execute(
+            f"""
+            CREATE TRIGGER personal_notifications_notify_{event.lower()}
+                AFTER {event}
+                ON personal_notifications
+                REFERENCING {transition_table} TABLE AS changed_rows
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();
+            """
+        )
+
+
+def create_users_notifications_seen_trigger() -> None:
+    """
+    Publish the email of users that have just read their notification feeds on the ``notifications_seen`` channel,
+    so that open streams stop reporting new notifications.
+    """
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_notifications_seen()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            PERFORM pg_notify('notifications_seen', NEW.email);
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_notifications_seen
+            AFTER UPDATE OF last_global_notification_at, last_personal_notification_at
+            ON users
+            FOR EACH ROW
+            WHEN (OLD.last_global_notification_at IS DISTINCT FROM NEW.last_global_notification_at
+                OR OLD.last_personal_notification_at IS DISTINCT FROM NEW.last_personal_notification_at)
+        EXECUTE PROCEDURE notify_notifications_seen();
+        """
+    )
+
+
+def upgrade() -> None:
+    create_global_notifications_notify_trigger()
+    create_personal_notifications_notify_trigger()
+    create_users_notifications_seen_trigger()
+
+
+def downgrade() -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS global_notifications_notify_{event} ON global_notifications")
+        op.execute(f"DROP TRIGGER IF EXISTS personal_notifications_notify_{event} ON personal_notifications")
+    op.execute("DROP TRIGGER IF EXISTS users_notifications_seen ON users")
+
+    op.execute("DROP FUNCTION IF EXISTS notify_global_notifications_change")
+    op.execute("DROP FUNCTION IF EXISTS notify_personal_notifications_change")
+    op.execute("DROP FUNCTION IF EXISTS notify_notifications_seen")
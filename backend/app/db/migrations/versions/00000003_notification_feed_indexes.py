@@ -0,0 +1,44 @@
+"""notification_feed_indexes
+
+Revision ID: 00000003
+Revises: 00000002
+Create Date: 2022-06-19 17:02:31.540117
+
+"""
+import pathlib
+import sys
+
+from alembic import op
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000003"
+down_revision = "00000002"
+branch_labels = None
+depends_on = None
+
+
+def create_notification_feed_indexes() -> None:
+    """
+    Match the keyset order of the notification feeds, so that any page is an ordered index range scan.
+    """
+    op.create_index(
+        "ix_global_notifications_receiver_role_updated_at_id",
+        "global_notifications",
+        ["receiver_role", "updated_at", "global_notification_id"],
+    )
+    op.create_index(
+        "ix_personal_notifications_receiver_email_created_at_id",
+        "personal_notifications",
+        ["receiver_email", "created_at", "personal_notification_id"],
+    )
+
+
+def upgrade() -> None:
+    create_notification_feed_indexes()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_personal_notifications_receiver_email_created_at_id", table_name="personal_notifications")
+    op.drop_index("ix_global_notifications_receiver_role_updated_at_id", table_name="global_notifications")
@@ -0,0 +1,75 @@
+"""query_plan_indexes
+
+Revision ID: 00000004
+Revises: 00000003
+Create Date: 2022-06-26 11:45:09.318206
+
+"""
+import pathlib
+import sys
+
+import sqlalchemy as sa
+from alembic import op
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000004"
+down_revision = "00000003"
+branch_labels = None
+depends_on = None
+
+
+def create_notifications_indexes() -> None:
+    """
+    New notification checks filter by receiver and ``updated_at``.
+    Senders are rarely set, but deleting a user cascades through them.
+    """
+    op.create_index(
+        "ix_personal_notifications_receiver_email_updated_at",
+        "personal_notifications",
+        ["receiver_email", "updated_at"],
+    )
+    op.create_index(
+        "ix_personal_notifications_sender",
+        "personal_notifications",
+        ["sender"],
+        postgresql_where=sa.text("sender IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_global_notifications_sender",
+        "global_notifications",
+        ["sender"],
+        postgresql_where=sa.text("sender IS NOT NULL"),
+    )
+    # superseded by ix_global_notifications_receiver_role_updated_at_id
+    op.drop_index("ix_global_notifications_receiver_role", table_name="global_notifications")
+
+
+def create_users_indexes() -> None:
+    """
+    Profiles are joined to users on every user lookup.
+    Unverified users are a small subset that admins list often.
+    """
+    op.create_index("ix_profiles_user_id", "profiles", ["user_id"])
+    op.create_index(
+        "ix_users_unverified",
+        "users",
+        ["user_id"],
+        postgresql_where=sa.text("NOT is_verified"),
+    )
+
+
+def upgrade() -> None:
+    create_notifications_indexes()
+    create_users_indexes()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_unverified", table_name="users")
+    op.drop_index("ix_profiles_user_id", table_name="profiles")
+
+    op.create_index("ix_global_notifications_receiver_role", "global_notifications", ["receiver_role"])
+    op.drop_index("ix_global_notifications_sender", table_name="global_notifications")
+    op.drop_index("ix_personal_notifications_sender", table_name="personal_notifications")
+    op.drop_index("ix_personal_notifications_receiver_email_updated_at", table_name="personal_notifications")
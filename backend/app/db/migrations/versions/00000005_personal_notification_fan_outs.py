@@ -0,0 +1,41 @@
+"""personal_notification_fan_outs
+
+Revision ID: 00000005
+Revises: 00000004
+Create Date: 2022-07-02 18:21:40.105392
+
+"""
+import pathlib
+import sys
+
+import sqlalchemy as sa
+from alembic import op
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000005"
+down_revision = "00000004"
+branch_labels = None
+depends_on = None
+
+
+def create_personal_notification_fan_out_chunks_table() -> None:
+    """
+    Chunks of personal notification fan-outs already delivered, claimed in the same transaction
+    that inserts their notifications so that a retried chunk is never delivered twice.
+    """
+    op.create_table(
+        "personal_notification_fan_out_chunks",
+        sa.Column("fan_out_id", sa.Text, primary_key=True),
+        sa.Column("chunk", sa.Integer, primary_key=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=False), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def upgrade() -> None:
+    create_personal_notification_fan_out_chunks_table()
+
+
+def downgrade() -> None:
+    op.drop_table("personal_notification_fan_out_chunks")
@@ -0,0 +1,236 @@
+"""user_notification_state
+
+Revision ID: 00000006
+Revises: 00000005
+Create Date: 2022-07-09 11:02:15.481913
+
+"""
+import pathlib
+import sys
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.types import DateTime
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+from app.db.migrations.utils import utcnow  # noqa: E402
+
+# revision identifiers, used by Alembic
+revision = "00000006"
+down_revision = "00000005"
+branch_labels = None
+depends_on = None
+
+
+def create_user_notification_state_table() -> None:
+    """
+    Unread notification counts and latest notification timestamps per user, so that they are read
+    from a single row. Users without a row have no unread notifications.
+    """
+    op.create_table(
+        "user_notification_state",
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("unread_global_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("unread_personal_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("latest_global_notification_at", DateTime),
+        sa.Column("latest_personal_notification_at", DateTime),
+        sa.Column("updated_at", DateTime, server_default=utcnow(), nullable=False),
+        schema="cache",
+    )
+
+
+def create_global_notifications_state_trigger() -> None:
+    """
+    Count changed global notifications as unread for every user whose role can see them and hasn't read past them.
+    Changes are grouped by role and timestamp first, since bulk inserts share their timestamp.
+    """
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION cache.add_unread_global_notifications(
+            receiver_roles role[], notification_timestamps timestamp[], deltas bigint[])
+            RETURNS VOID AS
+        $$
+            INSERT INTO cache.user_notification_state AS state (
+                user_id, unread_global_count, latest_global_notification_at)
+            SELECT
+                users.user_id, sum(changes.delta), max(changes.updated_at) FILTER (WHERE changes.delta > 0)
+            FROM
+                unnest(receiver_roles, notification_timestamps, deltas) AS changes (receiver_role, updated_at, delta)
+                INNER JOIN users ON users.role >= changes.receiver_role
+                    AND changes.updated_at > users.last_global_notification_at
+            GROUP BY
+                users.user_id
+            ON CONFLICT (user_id)
+                DO UPDATE SET
+                    unread_global_count = GREATEST(state.unread_global_count + EXCLUDED.unread_global_count, 0),
+                    latest_global_notification_at = GREATEST(
+                        state.latest_global_notification_at, EXCLUDED.latest_global_notification_at),
+                    updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);
+        $$ language 'sql';
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION cache.update_global_notifications_state()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM cache.add_unread_global_notifications(
+                    array_agg(receiver_role), array_agg(updated_at), array_agg(-n))
+                FROM (SELECT receiver_role, updated_at, count(*) AS n FROM old_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM cache.add_unread_global_notifications(
+                    array_agg(receiver_role), array_agg(updated_at), array_agg(n))
+                FROM (SELECT receiver_role, updated_at, count(*) AS n FROM new_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    for event, transition_tables in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"""
+            CREATE TRIGGER global_notifications_state_{event.lower()}
+                AFTER {event}
+                ON global_notifications
+                REFERENCING {transition_tables}
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_global_notifications_state();
+            """
+        )
+
+
+def create_personal_notifications_state_trigger() -> None:
+    """
+    Count changed personal notifications as unread for their receiver, unless it has read past them.
+    """
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION cache.add_unread_personal_notifications(
+            receiver_emails text[], notification_timestamps timestamp[], deltas bigint[])
+            RETURNS VOID AS
+        $$
+            INSERT INTO cache.user_notification_state AS state (
+                user_id, unread_personal_count, latest_personal_notification_at)
+            SELECT
+                users.user_id, sum(changes.delta), max(changes.updated_at) FILTER (WHERE changes.delta > 0)
+            FROM
+                unnest(receiver_emails, notification_timestamps, deltas) AS changes (receiver_email, updated_at, delta)
+                INNER JOIN users ON users.email = changes.receiver_email
+                    AND changes.updated_at > users.last_personal_notification_at
+            GROUP BY
+                users.user_id
+            ON CONFLICT (user_id)
+                DO UPDATE SET
+                    unread_personal_count = GREATEST(state.unread_personal_count + EXCLUDED.unread_personal_count, 0),
+                    latest_personal_notification_at = GREATEST(
+                        state.latest_personal_notification_at, EXCLUDED.latest_personal_notification_at),
+                    updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);
+        $$ language 'sql';
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION cache.update_personal_notifications_state()
+            RETURNS TRIGGER AS
+        $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM cache.add_unread_personal_notifications(
+                    array_agg(receiver_email), array_agg(updated_at), array_agg(-n))
+                FROM (SELECT receiver_email, updated_at, count(*) AS n FROM old_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM cache.add_unread_personal_notifications(
+                    array_agg(receiver_email), array_agg(updated_at), array_agg(n))
+                FROM (SELECT receiver_email, updated_at, count(*) AS n FROM new_rows GROUP BY 1, 2) AS changes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql';
+        """
+    )
+    for event, transition_tables in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"""
+            CREATE TRIGGER personal_notifications_state_{event.lower()}
+                AFTER {event}
+                ON personal_notifications
+                REFERENCING {transition_tables}
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();
+            """
+        )
+
+
+def backfill_user_notification_state() -> None:
+    """
+    Count the notifications that were unread before the triggers existed, as ``RebuildUserNotificationState`` does.
+    The triggers lock both notification tables until the migration commits, so no write is counted twice or missed.
+    """
+    op.execute(
+        """
+        INSERT INTO cache.user_notification_state (user_id, unread_global_count, unread_personal_count,
+            latest_global_notification_at, latest_personal_notification_at)
+        SELECT
+            users.user_id,
+            (
+                SELECT count(*)
+                FROM global_notifications
+                WHERE global_notifications.receiver_role <= users.role
+                    AND global_notifications.updated_at > users.last_global_notification_at),
+            (
+                SELECT count(*)
+                FROM personal_notifications
+                WHERE personal_notifications.receiver_email = users.email
+                    AND personal_notifications.updated_at > users.last_personal_notification_at),
+            (
+                SELECT max(global_notifications.updated_at)
+                FROM global_notifications
+                WHERE global_notifications.receiver_role <= users.role),
+            (
+                SELECT max(personal_notifications.updated_at)
+                FROM personal_notifications
+                WHERE personal_notifications.receiver_email = users.email)
+        FROM
+            users
+        ON CONFLICT (user_id)
+            DO UPDATE SET
+                unread_global_count = EXCLUDED.unread_global_count,
+                unread_personal_count = EXCLUDED.unread_personal_count,
+                latest_global_notification_at = EXCLUDED.latest_global_notification_at,
+                latest_personal_notification_at = EXCLUDED.latest_personal_notification_at,
+                updated_at = TIMEZONE('utc', CURRENT_TIMESTAMP);
+        """
+    )
+
+
+def upgrade() -> None:
+    create_user_notification_state_table()
+    create_global_notifications_state_trigger()
+    create_personal_notifications_state_trigger()
+    backfill_user_notification_state()
+
+
+def downgrade() -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS global_notifications_state_{event} ON global_notifications")
+        op.execute(f"DROP TRIGGER IF EXISTS personal_notifications_state_{event} ON personal_notifications")
+
+    op.execute("DROP FUNCTION IF EXISTS cache.update_global_notifications_state")
+    op.execute("DROP FUNCTION IF EXISTS cache.update_personal_notifications_state")
+    op.execute("DROP FUNCTION IF EXISTS cache.add_unread_global_notifications")
+    op.execute("DROP FUNCTION IF EXISTS cache.add_unread_personal_notifications")
+    op.drop_table("user_notification_state", schema="cache")
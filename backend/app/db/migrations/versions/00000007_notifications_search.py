@@ -0,0 +1,76 @@
+"""notifications_search
+
+Revision ID: 00000007
+Revises: 00000006
+Create Date: 2022-07-16 17:45:02.118236
+
+"""
+import pathlib
+import sys
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000007"
+down_revision = "00000006"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A')"
+    " || setweight(to_tsvector('english', label), 'B')"
+    " || setweight(to_tsvector('english', body), 'C')"
+)
+
+
+def create_search_vector_columns() -> None:
+    """
+    Weighted title, label and body lexemes, computed on write so that searches never parse documents.
+    """
+    for table in ("global_notifications", "personal_notifications"):
+        op.add_column(table, sa.Column("search_vector", TSVECTOR, sa.Computed(SEARCH_VECTOR, persisted=True)))
+
+
+def create_search_indexes() -> None:
+    """
+    RUM indexes with ``updated_at`` attached, so that matches are returned most recent first
+    by the index scan itself instead of being fetched and sorted.
+    Trigram indexes on labels, prefixed by the receiver with ``btree_gin``, for fuzzy matching within scope.
+    """
+    for table in ("global_notifications", "personal_notifications"):
+        op.execute(
+            f"""
+            CREATE INDEX ix_{table}_search_vector ON {table}
+                USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+                WITH (attach = 'updated_at', to = 'search_vector');
+            """
+        )
+    op.execute(
+        """
+        CREATE INDEX ix_global_notifications_receiver_role_label_trgm ON global_notifications
+            USING gin (receiver_role, label gin_trgm_ops);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_personal_notifications_receiver_email_label_trgm ON personal_notifications
+            USING gin (receiver_email, label gin_trgm_ops);
+        """
+    )
+
+
+def upgrade() -> None:
+    create_search_vector_columns()
+    create_search_indexes()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_personal_notifications_receiver_email_label_trgm", table_name="personal_notifications")
+    op.drop_index("ix_global_notifications_receiver_role_label_trgm", table_name="global_notifications")
+    for table in ("global_notifications", "personal_notifications"):
+        op.drop_index(f"ix_{table}_search_vector", table_name=table)
+        op.drop_column(table, "search_vector")
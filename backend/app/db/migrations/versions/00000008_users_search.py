@@ -0,0 +1,42 @@
+"""users_search
+
+Revision ID: 00000008
+Revises: 00000007
+Create Date: 2022-07-23 10:12:40.530917
+
+"""
+import pathlib
+import sys
+
+from alembic import op
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000008"
+down_revision = "00000007"
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = (
+    ("ix_users_username_trgm", "users", "username"),
+    ("ix_users_email_trgm", "users", "email"),
+    ("ix_profiles_full_name_trgm", "profiles", "full_name"),
+)
+
+
+def create_trigram_indexes() -> None:
+    """
+    Trigram indexes for similarity searches of users by username, email or full name.
+    """
+    for index, table, column in TRIGRAM_INDEXES:
+        op.execute(f"CREATE INDEX {index} ON {table} USING gin ({column} gin_trgm_ops);")
+
+
+def upgrade() -> None:
+    create_trigram_indexes()
+
+
+def downgrade() -> None:
+    for index, table, _ in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index, table_name=table)
@@ -0,0 +1,198 @@
+"""partition_personal_notifications
+
+Revision ID: 00000009
+Revises: 00000008
+Create Date: 2022-07-30 09:31:18.204673
+
+"""
+import pathlib
+import sys
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+from app.core import config  # noqa: E402
+from app.db.migrations.utils import timestamps  # noqa: E402
+
+# revision identifiers, used by Alembic
+revision = "00000009"
+down_revision = "00000008"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at"
+SEQUENCE = "personal_notifications_personal_notification_id_seq"
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', title), 'A')"
+    " || setweight(to_tsvector('english', label), 'B')"
+    " || setweight(to_tsvector('english', body), 'C')"
+)
+
+
+def create_personal_notifications_table(*, partitioned: bool) -> None:
+    """
+    Partitions are keyed on ``created_at``, which must then be part of the primary key.
+    Ids are still unique, since every partition draws them from the same sequence.
+    """
+    op.create_table(
+        "personal_notifications",
+        sa.Column("personal_notification_id", sa.Integer, server_default=sa.text(f"nextval('{SEQUENCE}')")),
+        sa.Column(
+            "sender",
+            sa.Text,
+            sa.ForeignKey("users.email", ondelete="CASCADE", name="personal_notifications_sender_fkey"),
+        ),
+        sa.Column(
+            "receiver_email",
+            sa.Text,
+            sa.ForeignKey("users.email", ondelete="CASCADE", name="personal_notifications_receiver_email_fkey"),
+            nullable=False,
+        ),
+        sa.Column("title", sa.Text, nullable=False),
+        sa.Column("body", sa.Text, nullable=False),
+        sa.Column("label", sa.Text, nullable=False),
+        sa.Column("link", sa.Text),
+        *timestamps(),
+        sa.Column("search_vector", TSVECTOR, sa.Computed(SEARCH_VECTOR, persisted=True)),
+        sa.PrimaryKeyConstraint("personal_notification_id", *(("created_at",) if partitioned else ())),
+        **({"postgresql_partition_by": "RANGE (created_at)"} if partitioned else {}),
+    )
+
+
+def create_monthly_partitions(*, source: str) -> None:
+    """
+    One partition per month, from the oldest notification in ``source`` or the start of the retention period,
+    whichever is earlier, up to the months ahead that the maintenance task keeps.
+    """
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    least(
+                        date_trunc('month', min(created_at)),
+                        date_trunc('month', TIMEZONE('utc', CURRENT_TIMESTAMP))
+                            - interval '{config.PERSONAL_NOTIFICATIONS_RETENTION_MONTHS} months'),
+                    date_trunc('month', TIMEZONE('utc', CURRENT_TIMESTAMP))
+                        + interval '{config.PERSONAL_NOTIFICATIONS_PARTITIONS_AHEAD} months',
+                    interval '1 month')::date
+                FROM {source}
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF personal_notifications FOR VALUES FROM (%L) TO (%L)',
+                    'personal_notifications_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    (month + interval '1 month')::date);
+            END LOOP;
+        END;
+        $$;
+        """
+    )
+
+
+def move_personal_notifications(*, source: str) -> None:
+    """
+    Copy every notification from ``source`` before dropping it, keeping the id sequence.
+    """
+    op.execute(f"INSERT INTO personal_notifications ({COLUMNS}) SELECT {COLUMNS} FROM {source}")
+    op.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY personal_notifications.personal_notification_id")
+    op.drop_table(source)
+
+
+def create_personal_notifications_indexes() -> None:
+    """
+    Indexes of the partitioned table are created on every partition, including future ones.
+    """
+    op.create_index("ix_personal_notifications_created_at", "personal_notifications", ["created_at"])
+    op.create_index("ix_personal_notifications_updated_at", "personal_notifications", ["updated_at"])
+    op.create_index(
+        "ix_personal_notifications_receiver_email_created_at_id",
+        "personal_notifications",
+        ["receiver_email", "created_at", "personal_notification_id"],
+    )
+    op.create_index(
+        "ix_personal_notifications_receiver_email_updated_at",
+        "personal_notifications",
+        ["receiver_email", "updated_at"],
+    )
+    op.create_index(
+        "ix_personal_notifications_sender",
+        "personal_notifications",
+        ["sender"],
+        postgresql_where=sa.text("sender IS NOT NULL"),
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+            USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_personal_notifications_receiver_email_label_trgm ON personal_notifications
+            USING gin (receiver_email, label gin_trgm_ops);
+        """
+    )
+
+
+def create_personal_notifications_triggers() -> None:
+    """
+    Statement level triggers of the partitioned table see the changed rows of every partition.
+    """
+    for event, transition_tables, changed_rows in (
+        ("INSERT", "NEW TABLE AS new_rows", "NEW TABLE AS changed_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows", "NEW TABLE AS changed_rows"),
+        ("DELETE", "OLD TABLE AS old_rows", "OLD TABLE AS changed_rows"),
+    ):
+        op.execute(
+            f"""
+            CREATE TRIGGER personal_notifications_notify_{event.lower()}
+                AFTER {event}
+                ON personal_notifications
+                REFERENCING {changed_rows}
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE notify_personal_notifications_change();
+            """
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER personal_notifications_state_{event.lower()}
+                AFTER {event}
+                ON personal_notifications
+                REFERENCING {transition_tables}
+                FOR EACH STATEMENT
+            EXECUTE PROCEDURE cache.update_personal_notifications_state();
+            """
+        )
+
+
+def replace_personal_notifications_table(*, partitioned: bool) -> None:
+    """
+    Rebuild ``personal_notifications`` with the same rows, indexes and triggers. Writes wait for it to finish.
+    """
+    previous = "personal_notifications_unpartitioned" if partitioned else "personal_notifications_partitioned"
+    op.execute("LOCK TABLE personal_notifications IN ACCESS EXCLUSIVE MODE")
+    op.rename_table("personal_notifications", previous)
+    op.execute(f"ALTER TABLE {previous} RENAME CONSTRAINT personal_notifications_pkey TO {previous}_pkey")
+
+    create_personal_notifications_table(partitioned=partitioned)
+    if partitioned:
+        create_monthly_partitions(source=previous)
+    move_personal_notifications(source=previous)
+    create_personal_notifications_indexes()
+    create_personal_notifications_triggers()
+
+
+def upgrade() -> None:
+    replace_personal_notifications_table(partitioned=True)
+
+
+def downgrade() -> None:
+    replace_personal_notifications_table(partitioned=False)
@@ -0,0 +1,49 @@
+"""personal_notifications_search_by_receiver
+
+Revision ID: 00000010
+Revises: 00000009
+Create Date: 2022-08-06 12:31:08.204716
+
+"""
+import pathlib
+import sys
+
+from alembic import op
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[4]))
+
+# revision identifiers, used by Alembic
+revision = "00000010"
+down_revision = "00000009"
+branch_labels = None
+depends_on = None
+
+
+def create_receiver_search_index() -> None:
+    """
+    RUM index on the receiver and the search vector, with ``updated_at`` attached. The receiver is an index
+    condition, so a page of a receiver's matches doesn't walk every other receiver's matches of the same terms.
+    """
+    op.execute(
+        """
+        CREATE INDEX ix_personal_notifications_receiver_email_search_vector ON personal_notifications
+            USING rum (receiver_email rum_text_ops, search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');
+        """
+    )
+
+
+def upgrade() -> None:
+    create_receiver_search_index()
+    op.drop_index("ix_personal_notifications_search_vector", table_name="personal_notifications")
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX ix_personal_notifications_search_vector ON personal_notifications
+            USING rum (search_vector rum_tsvector_addon_ops, updated_at)
+            WITH (attach = 'updated_at', to = 'search_vector');
+        """
+    )
+    op.drop_index("ix_personal_notifications_receiver_email_search_vector", table_name="personal_notifications")
@@ -0,0 +1,217 @@
+"""
+asyncpg-native counterparts of the sqlc generated queriers in ``app.db.gen.queries``.
+
+Each query is prepared once per database connection and executed directly on the asyncpg
+connection, within the transaction of the SQLAlchemy connection it was given, skipping SQLAlchemy
+statement compilation and bind parameter processing. Rows are built with precompiled factories
+as lightweight ``app.db.rows`` objects instead of validated pydantic models.
+
+Differences with the generated queriers:
+    - ``:many`` queries fetch the whole result set instead of streaming it.
+    - asyncpg exceptions are raised as is, not wrapped by SQLAlchemy.
+"""
+import enum
+import inspect
+import re
+import sys
+from contextlib import asynccontextmanager
+from functools import lru_cache, wraps
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Optional,
+    TypeVar,
+    Union,
+    get_args,
+    get_type_hints,
+)
+
+import asyncpg
+import pydantic
+from pydantic.fields import SHAPE_SINGLETON, ModelField
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.rows import Row, row_class
+
+Q = TypeVar("Q")
+
+QUERY_HEADER = re.compile(r"^-- name: (?P<name>\w+) \\:(?P<kind>\w+)\n")
+BIND_PARAM = re.compile(r"(?<![:\\]):p(?P<index>\d+)\b")
+
+STATEMENTS_INFO_KEY = "native_statements"
+"""
+Prepared statements are kept in the pooled connection's ``info``, which lives as long as the
+underlying connection.
+"""
+
+RowFactory = Callable[[asyncpg.Record], Any]
+
+
+def to_asyncpg_query(query: str) -> str:
+    """
+    Replace ``text()`` bind parameters and escaped colons with asyncpg's ``$n`` placeholders.
+    """
+    return BIND_PARAM.sub(r"$\g<index>", query).replace("\\:", ":")
+
+
+def _enum_converter(field: ModelField) -> Optional[Callable[[Any], Any]]:
+    # asyncpg returns postgres enums as plain strings
+    if not (inspect.isclass(field.type_) and issubclass(field.type_, enum.Enum)):
+        return None
+    enum_type = field.type_
+    if field.shape == SHAPE_SINGLETON:
+        return enum_type
+    return lambda values: [enum_type(value) for value in values]
+
+
+@lru_cache(maxsize=None)
+def row_factory(model: type[pydantic.BaseModel], columns: tuple[str, ...]) -> RowFactory:
+    """
+    Build lightweight rows standing in for ``model`` from records with ``columns``, without validation.
+    """
+    if set(columns) != set(model.__fields__):
+        raise TypeError(f"Columns {columns} do not match {model.__name__} fields")
+    row = row_class(model)
+    order = [columns.index(field) for field in row._fields]
+    converters = [
+        (index, converter)
+        for index, field in enumerate(model.__fields__.values())
+        if (converter := _enum_converter(field)) is not None
+    ]
+    if not converters and order == sorted(order):
+        return lambda record: row(*record)
+
+    def factory(record: asyncpg.Record) -> Row:
+        values = [record[index] for index in order]
+        for index, converter in converters:
+            if values[index] is not None:
+                values[index] = converter(values[index])
+        return row(*values)
+
+    return factory
+
+
+def scalar_factory(record: asyncpg.Record) -> Any:
+    return record[0]
+
+
+@asynccontextmanager
+async def driver_connection(conn: AsyncConnection) -> AsyncIterator[tuple[asyncpg.Connection, dict[str, Any]]]:
+    """
+    The asyncpg connection behind ``conn`` and its prepared statements, with the SQLAlchemy
+    transaction started so that native queries are committed or rolled back along with it.
+    Like ``conn`` itself, it must not be used by concurrent tasks.
+    """
+    pooled = await conn.get_raw_connection()
+    driver: asyncpg.Connection = pooled.driver_connection
+    if not driver.is_in_transaction():
+        # SQLAlchemy only begins its transaction along with the first statement, and must own it to end it
+        await conn.exec_driver_sql("SELECT 1")
+    yield driver, pooled.info.setdefault(STATEMENTS_INFO_KEY, {})
+
+
+async def prepare(
+    driver: asyncpg.Connection, statements: dict[str, Any], query: str, returns: Any
+) -> tuple[asyncpg.prepared_stmt.PreparedStatement, RowFactory]:
+    if (prepared := statements.get(query)) is None:
+        statement = await driver.prepare(query)
+        factory = scalar_factory
+        if inspect.isclass(returns) and issubclass(returns, pydantic.BaseModel):
+            factory = row_factory(returns, tuple(attribute.name for attribute in statement.get_attributes()))
+        prepared = statements[query] = (statement, factory)
+    return prepared
+
+
+def _params_getter(method: Callable, count: int) -> Callable[[tuple, dict], list[Any]]:
+    """
+    Map a generated method's arguments to positional query parameters. sqlc numbers the ``pN`` parameters
+    in the order of the method's keyword arguments, or of the fields of its ``*Params`` argument.
+    """
+    names = [name for name in inspect.signature(method).parameters if name != "self"]
+    if names == ["arg"]:
+        fields = list(get_type_hints(method)["arg"].__fields__)
+        if len(fields) != count:
+            raise ValueError(f"{method.__qualname__} takes {len(fields)} parameters, its query {count}")
+
+        def get_arg_params(args: tuple, kwargs: dict) -> list[Any]:
+            arg = args[0] if args else kwargs["arg"]
+            return [getattr(arg, field) for field in fields]
+
+        return get_arg_params
+
+    if len(names) != count:
+        raise ValueError(f"{method.__qualname__} takes {len(names)} parameters, its query {count}")
+    return lambda args, kwargs: [kwargs[name] for name in names]
+
+
+def _unwrap_returns(method: Callable) -> Any:
+    """
+    The row type of ``Optional[Row]`` and ``AsyncIterator[Row]`` return annotations.
+    """
+    returns = get_type_hints(method)["return"]
+    if returns is type(None):
+        return None
+    args = [arg for arg in get_args(returns) if arg is not type(None)]
+    return args[0] if args else returns
+
+
+def _native_method(method: Callable, query: str) -> Callable:
+    header = QUERY_HEADER.match(query)
+    if header is None:
+        raise ValueError(f"Not a sqlc query: {query}")
+    kind = header["kind"]
+    get_params = _params_getter(method, len(set(BIND_PARAM.findall(query))))
+    query = to_asyncpg_query(query)
+    returns = _unwrap_returns(method)
+
+    if kind == "many":
+
+        @wraps(method)
+        async def many(self, *args, **kwargs):
+            async with driver_connection(self._conn) as (driver, statements):
+                statement, factory = await prepare(driver, statements, query, returns)
+                records = await statement.fetch(*get_params(args, kwargs))
+            for record in records:
+                yield factory(record)
+
+        return many
+
+    if kind == "one":
+
+        @wraps(method)
+        async def one(self, *args, **kwargs):
+            async with driver_connection(self._conn) as (driver, statements):
+                statement, factory = await prepare(driver, statements, query, returns)
+                record = await statement.fetchrow(*get_params(args, kwargs))
+            if record is None:
+                return None
+            return factory(record)
+
+        return one
+
+    if kind == "exec":
+
+        @wraps(method)
+        async def execute(self, *args, **kwargs) -> None:
+            async with driver_connection(self._conn) as (driver, statements):
+                statement, _ = await prepare(driver, statements, query, returns)
+                await statement.fetch(*get_params(args, kwargs))
+
+        return execute
+
+    raise ValueError(f"Unsupported query kind: {kind}")
+
+
+@lru_cache(maxsize=None)
+def native_querier(querier: type[Q]) -> type[Q]:
+    """
+    Subclass of a generated ``AsyncQuerier`` whose methods run on asyncpg directly.
+    """
+    module = sys.modules[querier.__module__]
+    methods: dict[str, Union[Callable, str]] = {"__module__": __name__}
+    for name, method in inspect.getmembers(querier, inspect.isfunction):
+        query = getattr(module, name.upper(), None)
+        if isinstance(query, str):
+            methods[name] = _native_method(method, query)
+    return type(f"Native{querier.__name__}", (querier,), methods)
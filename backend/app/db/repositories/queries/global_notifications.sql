@@ -3,7 +3,25 @@
 insert into global_notifications (sender, receiver_role, title, body, LABEL, link)
   values (@sender, @receiver_role, @title, @body, @label, @link)
 returning
-  *;
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at;
+
+-- name: CreateGlobalNotifications :many
+-- Bulk insert, one array element per notification.
+insert into global_notifications (sender, receiver_role, title, body, LABEL, link)
+select
+  *
+from
+  unnest(@senders::text[], @receiver_roles::role[], @titles::text[], @bodies::text[], @labels::text[], @links::text[])
+returning
+  global_notification_id;
 
 -- name: DeleteGlobalNotification :exec
 delete from global_notifications
@@ -17,16 +35,25 @@ select
     select
       1
     from
-      global_notifications
+      unnest(@roles::role[]) as roles (receiver_role)
+      cross join lateral (
+        select
+          global_notifications.updated_at
+        from
+          global_notifications
+        where
+          global_notifications.receiver_role = roles.receiver_role
+        order by
+          global_notifications.updated_at desc
+        limit 1) as latest
     where
-      updated_at > (
+      latest.updated_at > (
         select
           last_global_notification_at
         from
           users
         where
-          user_id = @user_id)
-        and receiver_role = any (@roles::role[])) as has_new_global_notifications;
+          user_id = @user_id)) as has_new_global_notifications;
 
 -- name: GetGlobalNotificationsByStartingDate :many
 select
@@ -76,3 +103,105 @@ union (
 order by
   event_timestamp desc
 limit sqlc.arg('page_chunk_size?')::int;
+
+-- name: GetGlobalNotificationsFeed :many
+-- Keyset paginated feed, newest event first. A notification's event is its latest update, or its creation.
+-- Each role is read with its own ordered range scan, so deep pages cost the same as the first one.
+select
+  notifications.global_notification_id,
+  notifications.sender,
+  notifications.receiver_role,
+  notifications.title,
+  notifications.label,
+  notifications.link,
+  notifications.body,
+  notifications.created_at,
+  notifications.updated_at,
+  notifications.updated_at as event_timestamp,
+  (
+    case when notifications.updated_at != notifications.created_at then
+      'is_update'
+    else
+      'is_create'
+    end)::event_type as event_type
+from
+  unnest(@roles::role[]) as roles (receiver_role)
+  cross join lateral (
+    select
+      *
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role = roles.receiver_role
+      and (global_notifications.updated_at, global_notifications.global_notification_id) < (@cursor_timestamp::timestamp, @cursor_id::int)
+    order by
+      global_notifications.updated_at desc,
+      global_notifications.global_notification_id desc
+    limit @page_chunk_size::int) as notifications
+order by
+  notifications.updated_at desc,
+  notifications.global_notification_id desc
+limit @page_chunk_size::int;
+
+-- name: GetGlobalNotificationsLatestUpdatedAt :many
+-- One index lookup per role instead of aggregating the whole table.
+select
+  roles.receiver_role::role as receiver_role,
+  latest.updated_at::timestamp as latest_updated_at
+from
+  unnest(ENUM_RANGE(null::role)) as roles (receiver_role)
+  cross join lateral (
+    select
+      global_notifications.updated_at
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role = roles.receiver_role
+    order by
+      global_notifications.updated_at desc
+    limit 1) as latest;
+
+-- name: SearchGlobalNotifications :many
+-- Matches of a web search style query, most recent first, read in order from the RUM index.
+select
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  ts_rank(search_vector, websearch_to_tsquery('english', @query)) as rank
+from
+  global_notifications
+where
+  search_vector @@ websearch_to_tsquery('english', @query)
+  and receiver_role = any (@roles::role[])
+order by
+  updated_at <=| @before::timestamp
+limit @page_chunk_size::int;
+
+-- name: SearchGlobalNotificationsByLabel :many
+-- Labels similar to the query, for queries without full text matches, e.g. misspelled labels.
+select
+  global_notification_id,
+  sender,
+  receiver_role,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  similarity(label, @query) as rank
+from
+  global_notifications
+where
+  receiver_role = any (@roles::role[])
+  and label % @query
+order by
+  rank desc,
+  updated_at desc
+limit @page_chunk_size::int;
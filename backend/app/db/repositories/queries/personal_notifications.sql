@@ -1,9 +1,55 @@
 /* plpgsql-language-server:use-keyword-query-parameter */
+-- name: ClaimFanOutChunk :one
+-- Returns nothing if the chunk was already claimed.
+insert into personal_notification_fan_out_chunks (fan_out_id, chunk)
+  values (@fan_out_id, @chunk)
+on conflict
+  do nothing
+returning
+  chunk;
+
 -- name: CreatePersonalNotification :one
 insert into personal_notifications (sender, receiver_email, title, body, LABEL, link)
   values (@sender, @receiver_email, @title, @body, @label, @link)
 returning
-  *;
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at;
+
+-- name: CreatePersonalNotifications :many
+-- Same notification for every receiver. Emails that are not returned don't exist.
+insert into personal_notifications (sender, receiver_email, title, body, LABEL, link)
+select
+  sqlc.arg('sender?')::text,
+  email,
+  @title::text,
+  @body::text,
+  @label::text,
+  sqlc.arg('link?')::text
+from
+  users
+where
+  email = any (@receiver_emails::text[])
+returning
+  receiver_email;
+
+-- name: DeleteFanOutChunkClaims :one
+-- Claims of chunks delivered before the given time, which can no longer be retried.
+with deleted_claim as (
+  delete from personal_notification_fan_out_chunks
+  where created_at < @created_before
+  returning
+    1)
+select
+  count(*)
+from
+  deleted_claim;
 
 -- name: DeletePersonalNotification :exec
 delete from personal_notifications
@@ -13,7 +59,15 @@ returning
 
 -- name: GetPersonalNotificationById :one
 select
-  *
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at
 from
   personal_notifications
 where
@@ -84,3 +138,78 @@ union (
 order by
   event_timestamp desc
 limit sqlc.arg('page_chunk_size?')::int;
+
+-- name: GetPersonalNotificationsFeed :many
+-- Keyset paginated feed, newest notification first. The bound on created_at alone prunes partitions.
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  label,
+  link,
+  body,
+  created_at,
+  updated_at,
+  created_at as event_timestamp,
+  (
+    case when updated_at != created_at then
+      'is_update'
+    else
+      'is_create'
+    end)::event_type as event_type
+from
+  personal_notifications
+where
+  receiver_email = @receiver_email
+  and created_at <= @cursor_timestamp::timestamp
+  and (created_at, personal_notification_id) < (@cursor_timestamp::timestamp, @cursor_id::int)
+order by
+  created_at desc,
+  personal_notification_id desc
+limit @page_chunk_size::int;
+
+-- name: SearchPersonalNotifications :many
+-- Matches of a web search style query, most recent first, read in order from the receiver's entries in the RUM index.
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  ts_rank(search_vector, websearch_to_tsquery('english', @query)) as rank
+from
+  personal_notifications
+where
+  search_vector @@ websearch_to_tsquery('english', @query)
+  and receiver_email = @receiver_email
+order by
+  updated_at <=| @before::timestamp
+limit @page_chunk_size::int;
+
+-- name: SearchPersonalNotificationsByLabel :many
+-- Labels similar to the query, for queries without full text matches, e.g. misspelled labels.
+select
+  personal_notification_id,
+  sender,
+  receiver_email,
+  title,
+  body,
+  label,
+  link,
+  created_at,
+  updated_at,
+  similarity(label, @query) as rank
+from
+  personal_notifications
+where
+  receiver_email = @receiver_email
+  and label % @query
+order by
+  rank desc,
+  updated_at desc
+limit @page_chunk_size::int;
@@ -1,6 +1,9 @@
 /* plpgsql-language-server:use-keyword-query-parameter */
--- name: GetUser :one
+-- name: GetAuthUserByUsername :one
+-- Resolves the user behind an access token on every authenticated request,
+-- so it skips credentials and the profile join.
 select
+  user_id,
   username,
   email,
   role,
@@ -10,31 +13,86 @@ select
   last_global_notification_at,
   last_personal_notification_at,
   created_at,
-  updated_at,
-  full_name,
-  phone_number,
-  bio,
-  image,
-  COALESCE(
-    case when @get_db_data::boolean then
-      (user_id)
-    end, -1)::int as user_id,
-  case when @get_db_data::boolean then
-    (salt)
-  end as salt,
-  case when @get_db_data::boolean then
-    (password)
-  end as password
+  updated_at
+from
+  users
+where
+  username = @username;
+
+-- name: GetUserByEmail :one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
 from
   users
   left join profiles using (user_id)
-where (email = LOWER(sqlc.arg('email?'))::text
-  or sqlc.arg('email?')::text is null)
-and (username = sqlc.arg('username?')::text
-  or sqlc.arg('username?')::text is null)
-and (users.user_id = sqlc.arg('user_id?')::int
-  or sqlc.arg('user_id?')::int is null)
-limit 1;
+where
+  users.email = LOWER(@email);
+
+-- name: GetUserById :one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
+from
+  users
+  left join profiles using (user_id)
+where
+  users.user_id = @user_id;
+
+-- name: GetUserByUsername :one
+select
+  users.user_id,
+  users.username,
+  users.email,
+  users.role,
+  users.is_verified,
+  users.salt,
+  users.password,
+  users.is_active,
+  users.is_superuser,
+  users.last_global_notification_at,
+  users.last_personal_notification_at,
+  users.created_at,
+  users.updated_at,
+  profiles.full_name,
+  profiles.phone_number,
+  profiles.bio,
+  profiles.image
+from
+  users
+  left join profiles using (user_id)
+where
+  users.username = @username;
 
 -- name: RegisterNewUser :one
 insert into users (username, email, password, salt, is_superuser, is_verified)
@@ -69,14 +127,13 @@ returning
   updated_at;
 
 -- name: ListAllUsers :many
+-- Keyset paginated by user_id. Credentials are never listed.
 select
-  users.user_id,
+  user_id,
   username,
   email,
   role,
   is_verified,
-  salt,
-  password,
   is_active,
   is_superuser,
   last_global_notification_at,
@@ -85,18 +142,39 @@ select
   updated_at
 from
   users
-  left join profiles using (user_id)
-where
-  is_verified = sqlc.arg('is_verified?')::boolean
-  or sqlc.arg('is_verified?')::boolean is null;
+where (is_verified = sqlc.arg('is_verified?')::boolean
+  or sqlc.arg('is_verified?')::boolean is null)
+and user_id > @after_user_id::int
+order by
+  user_id
+limit sqlc.arg('page_size?')::int;
 
--- name: VerifyUserByEmail :one
+-- name: ListNotificationRecipients :many
+-- Keyset paginated by user_id. Filters that are null select every user.
+select
+  user_id,
+  email
+from
+  users
+where (role = sqlc.arg('role?')::role
+  or sqlc.arg('role?')::role is null)
+and (is_verified = sqlc.arg('is_verified?')::boolean
+  or sqlc.arg('is_verified?')::boolean is null)
+and (email = any (sqlc.arg('emails?')::text[])
+  or sqlc.arg('emails?')::text[] is null)
+and user_id > @after_user_id::int
+order by
+  user_id
+limit @page_size::int;
+
+-- name: VerifyUsersByEmails :many
+-- Emails must be lowercase. Emails that are not returned don't exist.
 update
   users
 set
   is_verified = 'true'
 where
-  email = LOWER(@email)
+  email = any (@emails::text[])
 returning
   email;
 
@@ -110,29 +188,235 @@ where
   email = LOWER(@email);
 
 -- name: UpdateGlobalLastNotificationAt :exec
-update
-  users
-set
-  last_global_notification_at = @last_global_notification_at
-where
-  user_id = @user_id;
+with updated_user as (
+  update
+    users
+  set
+    last_global_notification_at = @last_global_notification_at
+  where
+    user_id = @user_id
+  returning
+    user_id,
+    role,
+    last_global_notification_at)
+insert into cache.user_notification_state (user_id, unread_global_count)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role
+      and global_notifications.updated_at > updated_user.last_global_notification_at)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    updated_at = timezone('utc', current_timestamp);
 
 -- name: UpdatePersonalLastNotificationAt :exec
-update
-  users
-set
-  last_personal_notification_at = @last_personal_notification_at
-where
-  user_id = @user_id;
+with updated_user as (
+  update
+    users
+  set
+    last_personal_notification_at = @last_personal_notification_at
+  where
+    user_id = @user_id
+  returning
+    user_id,
+    email,
+    last_personal_notification_at)
+insert into cache.user_notification_state (user_id, unread_personal_count)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = updated_user.email
+      and personal_notifications.updated_at > updated_user.last_personal_notification_at)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_personal_count = excluded.unread_personal_count,
+    updated_at = timezone('utc', current_timestamp);
 
 -- name: UpdateUserRole :exec
-update
+with updated_user as (
+  update
+    users
+  set
+    role = @role
+  where
+    user_id = @user_id
+  returning
+    user_id,
+    role,
+    last_global_notification_at)
+insert into cache.user_notification_state (user_id, unread_global_count, latest_global_notification_at)
+select
+  updated_user.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role
+      and global_notifications.updated_at > updated_user.last_global_notification_at),
+  (
+    select
+      max(global_notifications.updated_at)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= updated_user.role)
+from
+  updated_user
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    latest_global_notification_at = excluded.latest_global_notification_at,
+    updated_at = timezone('utc', current_timestamp);
+
+-- name: GetRoles :many
+select
+  ENUM_RANGE(null::role)::text[];
+
+-- name: CheckHasNewNotifications :many
+select
+  user_id,
+  unread_global_count > 0 as has_new_global_notifications,
+  unread_personal_count > 0 as has_new_personal_notifications,
+  unread_global_count,
+  unread_personal_count
+from
+  cache.user_notification_state
+where
+  user_id = any (@user_ids::int[]);
+
+-- name: RebuildUserNotificationState :exec
+insert into cache.user_notification_state (user_id, unread_global_count, unread_personal_count,
+  latest_global_notification_at, latest_personal_notification_at)
+select
+  users.user_id,
+  (
+    select
+      count(*)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= users.role
+      and global_notifications.updated_at > users.last_global_notification_at),
+  (
+    select
+      count(*)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = users.email
+      and personal_notifications.updated_at > users.last_personal_notification_at),
+  (
+    select
+      max(global_notifications.updated_at)
+    from
+      global_notifications
+    where
+      global_notifications.receiver_role <= users.role),
+  (
+    select
+      max(personal_notifications.updated_at)
+    from
+      personal_notifications
+    where
+      personal_notifications.receiver_email = users.email)
+from
   users
-set
-  role = @role
+on conflict (user_id)
+  do update set
+    unread_global_count = excluded.unread_global_count,
+    unread_personal_count = excluded.unread_personal_count,
+    latest_global_notification_at = excluded.latest_global_notification_at,
+    latest_personal_notification_at = excluded.latest_personal_notification_at,
+    updated_at = timezone('utc', current_timestamp);
+
+-- name: GetUnreadNotificationCounts :one
+select
+  unread_global_count,
+  unread_personal_count
+from
+  cache.user_notification_state
 where
   user_id = @user_id;
 
--- name: GetRoles :many
+-- name: SearchUsers :many
+-- Users with a username, email or full name similar to the query, most similar first.
+-- Keyset paginated by (rank, user_id): pass the rank and user_id of the last user of the previous page.
+with matches as (
+  select
+    user_id
+  from
+    users
+  where
+    username % @query
+  union
+  select
+    user_id
+  from
+    users
+  where
+    email % @query
+  union
+  select
+    user_id
+  from
+    profiles
+  where
+    full_name % @query
+),
+ranked as (
+  select
+    users.user_id,
+    users.username,
+    users.email,
+    users.role,
+    users.is_verified,
+    users.is_active,
+    users.is_superuser,
+    users.created_at,
+    users.updated_at,
+    profiles.full_name,
+    greatest(similarity(users.username, @query), similarity(users.email, @query), coalesce(similarity(profiles.full_name, @query), 0)) as rank
+  from
+    matches
+    inner join users using (user_id)
+    left join profiles using (user_id)
+)
 select
-  ENUM_RANGE(null::users.role)::text[];
+  user_id,
+  username,
+  email,
+  role,
+  is_verified,
+  is_active,
+  is_superuser,
+  created_at,
+  updated_at,
+  full_name,
+  rank
+from
+  ranked
+where (rank < sqlc.arg('after_rank?')::real
+  or (rank = sqlc.arg('after_rank?')::real
+    and user_id > @after_user_id::int)
+  or sqlc.arg('after_rank?')::real is null)
+order by
+  rank desc,
+  user_id
+limit @page_size::int;
@@ -0,0 +1,79 @@
+"""
+Lightweight counterparts of the pydantic rows in ``app.db.gen.queries``, for query results that are
+only used internally, such as authentication checks and notification stream ticks.
+
+Rows are ``__slots__`` objects that skip validation. They expose enough of the pydantic API for
+internal use (``dict()``, ``copy(update=...)``) and the mapping protocol, so that FastAPI converts
+them to the route's ``response_model`` only when they are part of a response.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+import pydantic
+
+
+class Row:
+    __slots__ = ()
+
+    _fields: tuple[str, ...] = ()
+    _model: type[pydantic.BaseModel]
+
+    def keys(self) -> tuple[str, ...]:
+        return self._fields
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[tuple[str, Any]]:
+        # same as pydantic models
+        for field in self._fields:
+            yield field, getattr(self, field)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Row, pydantic.BaseModel)):
+            return self.dict() == other.dict()
+        return self.dict() == other
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"{type(self).__name__}({values})"
+
+    def dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def copy(self, *, update: Optional[Dict[str, Any]] = None) -> "Row":
+        return type(self)(**{**self.dict(), **(update or {})})
+
+    def to_model(self) -> pydantic.BaseModel:
+        """
+        The pydantic row this is a stand-in for.
+        """
+        return self._model.construct(_fields_set=set(self._fields), **self.dict())
+
+
+@lru_cache(maxsize=None)
+def row_class(model: type[pydantic.BaseModel]) -> type[Row]:
+    """
+    ``Row`` subclass with the same fields as ``model``, constructed positionally in field order.
+    """
+    fields = tuple(model.__fields__)
+    # generated like dataclasses and namedtuples do, which is faster than setting attributes in a loop
+    source = f"def __init__(self, {', '.join(fields)}):\n" + (
+        "".join(f"    self.{field} = {field}\n" for field in fields) or "    pass\n"
+    )
+    namespace: dict[str, Any] = {}
+    exec(source, {}, namespace)  # nosec: field names are python identifiers from generated models
+    return type(
+        model.__name__,
+        (Row,),
+        {
+            "__slots__": fields,
+            "__init__": namespace["__init__"],
+            "__module__": __name__,
+            "__qualname__": model.__name__,
+            "_fields": fields,
+            "_model": model,
+        },
+    )
@@ -1,9 +1,17 @@
+from typing import Optional
+
 from app.db.gen.queries.global_notifications import (
     GetGlobalNotificationsByStartingDateRow,
+    GetGlobalNotificationsFeedRow,
+    SearchGlobalNotificationsRow,
 )
+from app.db.gen.queries.models import Role
 from app.db.gen.queries.personal_notifications import (
     GetPersonalNotificationsByStartingDateRow,
+    GetPersonalNotificationsFeedRow,
+    SearchPersonalNotificationsRow,
 )
+from app.models.core import CoreModel
 
 
 class GlobalNotificationFeedItem(GetGlobalNotificationsByStartingDateRow):
@@ -12,3 +20,67 @@ class GlobalNotificationFeedItem(GetGlobalNotificationsByStartingDateRow):
 
 class PersonalNotificationFeedItem(GetPersonalNotificationsByStartingDateRow):
     pass
+
+
+class GlobalNotificationsFeedPage(CoreModel):
+    items: list[GetGlobalNotificationsFeedRow]
+    next_cursor: Optional[str]
+
+
+class PersonalNotificationsFeedPage(CoreModel):
+    items: list[GetPersonalNotificationsFeedRow]
+    next_cursor: Optional[str]
+
+
+class GlobalNotificationsSearchResults(CoreModel):
+    items: list[SearchGlobalNotificationsRow]
+    fuzzy: bool
+    """
+    Whether items are labels similar to the query, since nothing matched it as full text.
+    """
+
+
+class PersonalNotificationsSearchResults(CoreModel):
+    items: list[SearchPersonalNotificationsRow]
+    fuzzy: bool
+    """
+    Whether items are labels similar to the query, since nothing matched it as full text.
+    """
+
+
+class UnreadNotificationCounts(CoreModel):
+    unread_global_count: int = 0
+    unread_personal_count: int = 0
+
+
+class NotificationsBulkCreated(CoreModel):
+    created: int
+    missing_receivers: list[str] = []
+    rows_per_second: float
+
+
+class NotificationRecipients(CoreModel):
+    """
+    Users matching every filter that is set. Every user is selected when none are.
+    """
+
+    role: Optional[Role]
+    is_verified: Optional[bool]
+    emails: Optional[list[str]]
+
+
+class PersonalNotificationFanOut(CoreModel):
+    sender: Optional[str]
+    title: str
+    body: str
+    label: str
+    link: Optional[str]
+    recipients: NotificationRecipients
+
+
+class PersonalNotificationsPartitions(CoreModel):
+    created: list[str] = []
+    expired: list[str] = []
+    """
+    Partitions detached for being past retention, and dropped unless configured otherwise.
+    """
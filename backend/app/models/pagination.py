@@ -0,0 +1,28 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from pydantic import ValidationError
+
+from app.models.core import CoreModel
+
+
+class Cursor(CoreModel):
+    """
+    Position right after the last item of a keyset paginated page, sent to clients as an opaque string.
+    """
+
+    timestamp: datetime
+    id: int
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(json.dumps([self.timestamp.isoformat(), self.id]).encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "Cursor":
+        try:
+            timestamp, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return cls(timestamp=timestamp, id=id)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ValidationError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -4,7 +4,7 @@ from typing import Optional
 from pydantic import EmailStr, constr, validator
 
 from app.db.gen.queries.models import Role
-from app.db.gen.queries.users import GetUserRow
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
 from app.models.core import CoreModel
 from app.models.token import AccessToken
 
@@ -64,7 +64,16 @@ class RoleUpdate(CoreModel):
     role: Role
 
 
-class UserPublic(GetUserRow):
-    # user_id: int
+class UserVerification(CoreModel):
+
+    email: str
+    verified: bool
+
+
+class UserPublic(GetAuthUserByUsernameRow):
+    full_name: Optional[str]
+    phone_number: Optional[str]
+    bio: Optional[str]
+    image: Optional[str]
     access_token: Optional[AccessToken]
     # profile: Optional[ProfilePublic]
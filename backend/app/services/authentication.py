@@ -1,31 +1,108 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Union
 
 import bcrypt
 import jwt
 from fastapi import HTTPException, status
+from loguru import logger
 from passlib.context import CryptContext
 from pydantic import ValidationError
+from redis.exceptions import RedisError
 
+from app.core.cache import TTLCache
 from app.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_HASHING_EXECUTOR,
+    AUTH_HASHING_QUEUE_SIZE,
+    AUTH_HASHING_WORKERS,
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_USER_CACHE_TTL,
     JWT_ALGORITHM,
     JWT_AUDIENCE,
     UNIQUE_KEY,
 )
 from app.core.errors import BaseAppException
-from app.db.gen.queries.users import GetUserRow, RegisterNewUserRow
+from app.core.executors import BoundedExecutor
+from app.core.redis import cache_redis_pool
+from app.db.gen.queries.users import GetUserByEmailRow, RegisterNewUserRow
 from app.models.token import JWTCreds, JWTMeta, JWTPayload
 from app.models.user import UserPasswordRegistration
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+password_hashing_executor = BoundedExecutor(
+    "password-hashing",
+    kind=AUTH_HASHING_EXECUTOR,
+    max_workers=AUTH_HASHING_WORKERS,
+    max_queue=AUTH_HASHING_QUEUE_SIZE,
+)
+"""
+bcrypt takes tens of milliseconds per call and would otherwise block the event loop.
+"""
+
+
+def _hash(secret: str) -> str:
+    return pwd_context.hash(secret)
+
+
+def _verify(secret: str, hashed: str) -> bool:
+    return pwd_context.verify(secret, hashed)
+
 
 class AuthException(BaseAppException):
     pass
 
 
+token_payloads_cache: TTLCache[tuple[int, str, str], JWTPayload] = TTLCache(
+    maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+"""
+Verified token payloads, keyed by (revocation epoch, secret key, token). Entries live until the token expires.
+"""
+
+REVOCATION_EPOCH_KEY = "auth:token-revocation-epoch"
+
+
 class AuthService:
+    def __init__(self) -> None:
+        self.redis_pool = cache_redis_pool
+        self.revocation_epoch = 0
+        self.revocation_epoch_checked_at = float("-inf")
+
+    async def revoke_cached_tokens(self) -> None:
+        """
+        Force every token to be verified again on its next use, in every process.
+        The epoch is shared through redis and other processes pick it up in ``refresh_revocation_epoch``.
+        Without redis only this process drops its verified tokens, and the epoch is left alone,
+        since a local epoch ahead of the shared one would be overwritten by the next refresh.
+        """
+        try:
+            self.revocation_epoch = await self.redis_pool.aio.client.incr(REVOCATION_EPOCH_KEY)
+        except RedisError as e:
+            logger.warning(f"Could not share token revocation: {e}")
+            token_payloads_cache.clear()
+        self.revocation_epoch_checked_at = time.monotonic()
+
+    async def refresh_revocation_epoch(self) -> None:
+        """
+        Read the shared revocation epoch at most every ``AUTH_USER_CACHE_TTL`` seconds,
+        which bounds how long a revocation in another process goes unnoticed, as for authenticated users.
+        """
+        now = time.monotonic()
+        if now - self.revocation_epoch_checked_at < AUTH_USER_CACHE_TTL:
+            return
+        self.revocation_epoch_checked_at = now
+        try:
+            revocation_epoch = int(await self.redis_pool.aio.client.get(REVOCATION_EPOCH_KEY) or 0)
+        except RedisError as e:
+            logger.warning(f"Could not get token revocation epoch: {e}")
+            return
+        if revocation_epoch < self.revocation_epoch:
+            # the shared epoch was reset, so entries cached under the epochs it counts up through again are stale
+            token_payloads_cache.clear()
+        self.revocation_epoch = revocation_epoch
+
     def create_salt_and_hashed_password(self, *, plaintext_password: str) -> UserPasswordRegistration:
         salt = self.generate_salt()
         hashed_password = self.hash_password(password=plaintext_password, salt=salt)
@@ -36,15 +113,24 @@ class AuthService:
         return bcrypt.gensalt().decode()
 
     def hash_password(self, *, password: str, salt: str) -> str:
-        return pwd_context.hash(password + salt)
+        return _hash(password + salt)
 
     def verify_password(self, *, password: str, salt: str, hashed_pw: str) -> bool:
-        return pwd_context.verify(password + salt, hashed_pw)
+        return _verify(password + salt, hashed_pw)
+
+    async def create_salt_and_hashed_password_async(self, *, plaintext_password: str) -> UserPasswordRegistration:
+        salt = self.generate_salt()
+        hashed_password = await password_hashing_executor.run(_hash, plaintext_password + salt)
+
+        return UserPasswordRegistration(salt=salt, password=hashed_password)
+
+    async def verify_password_async(self, *, password: str, salt: str, hashed_pw: str) -> bool:
+        return await password_hashing_executor.run(_verify, password + salt, hashed_pw)
 
     def create_access_token_for_user(
         self,
         *,
-        user: Union[RegisterNewUserRow, GetUserRow],
+        user: Union[RegisterNewUserRow, GetUserByEmailRow],
         secret_key: str = str(UNIQUE_KEY),
         audience: str = JWT_AUDIENCE,
         expires_in: int = ACCESS_TOKEN_EXPIRE_MINUTES,
@@ -66,6 +152,14 @@ class AuthService:
         return jwt.encode(token_payload.dict(), secret_key, algorithm=JWT_ALGORITHM)
 
     def get_username_from_token(self, *, token: str, secret_key: str) -> Optional[str]:
+        return self.get_payload_from_token(token=token, secret_key=secret_key).username
+
+    def get_payload_from_token(self, *, token: str, secret_key: str) -> JWTPayload:
+        key = (self.revocation_epoch, secret_key, token)
+        payload = token_payloads_cache.get(key)
+        if payload is not None:
+            return payload
+
         try:
             decoded_token = jwt.decode(token, secret_key, audience=JWT_AUDIENCE, algorithms=[JWT_ALGORITHM])
 
@@ -77,4 +171,5 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             ) from e
 
-        return payload.username
+        token_payloads_cache.set(key, payload, ttl=payload.exp - time.time())
+        return payload
@@ -1,6 +1,22 @@
+from typing import TypeVar
+
 from sqlalchemy.ext.asyncio import AsyncConnection
 
+from app.core.config import NATIVE_QUERIES_SERVICES
+from app.db.native import native_querier
+
+Q = TypeVar("Q")
+
 
 class BaseService:
     def __init__(self, conn: AsyncConnection) -> None:
         self.conn = conn
+
+    def get_querier(self, querier: type[Q]) -> Q:
+        """
+        Instantiate a generated ``AsyncQuerier``, or its asyncpg-native counterpart if the service
+        is listed in ``NATIVE_QUERIES_SERVICES``.
+        """
+        if type(self).__name__ in NATIVE_QUERIES_SERVICES:
+            return native_querier(querier)(self.conn)  # type: ignore
+        return querier(self.conn)  # type: ignore
@@ -1,14 +1,20 @@
+import time
+from datetime import datetime
+from typing import Optional
+
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncConnection
 from starlette import status
 
+from app.core.cache import response_cache
 from app.core.errors import BaseAppException
 from app.db.gen.queries import global_notifications
 from app.db.gen.queries.global_notifications import (
-    CheckHasNewGlobalNotificationsParams,
     CreateGlobalNotificationParams,
+    CreateGlobalNotificationsParams,
 )
 from app.db.gen.queries.models import Role
+from app.models.global_notifications import NotificationsBulkCreated
 from app.services.authorization import ROLE_PERMISSIONS
 from app.services.base import BaseService
 
@@ -20,28 +26,87 @@ class GlobalNotificationsError(BaseAppException):
 
 class GlobalNotificationsService(BaseService):
     page_chunk_size = 10
+    bulk_chunk_size = 10_000
+    """
+    Notifications inserted per statement when creating notifications in bulk.
+    """
+    latest_updated_at_ttl = 10  # seconds
+    """
+    Upper bound on how stale the per-role high-water mark may get when changes
+    made by other processes are not being received.
+    """
+    cache_tag = "global_notifications"
+    """
+    Tag of cached responses that include global notifications.
+    """
+    _latest_updated_at: Optional[dict[Role, datetime]] = None
+    _latest_updated_at_refreshed_at = 0.0
 
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
         logger.warning(f"GlobalNotificationsService connection: {id(conn)}")
-        self.gn_querier = global_notifications.AsyncQuerier(conn)
+        self.gn_querier = self.get_querier(global_notifications.AsyncQuerier)
+
+    @classmethod
+    def invalidate_latest_updated_at(cls) -> None:
+        cls._latest_updated_at = None
+
+    async def get_latest_updated_at(self) -> dict[Role, datetime]:
+        """
+        Latest ``updated_at`` of global notifications per receiver role, shared by the whole process.
+        """
+        cls = GlobalNotificationsService
+        if (
+            cls._latest_updated_at is None
+            or time.monotonic() - cls._latest_updated_at_refreshed_at > cls.latest_updated_at_ttl
+        ):
+            refreshed_at = time.monotonic()
+            latest_updated_at = {
+                row.receiver_role: row.latest_updated_at
+                async for row in self.gn_querier.get_global_notifications_latest_updated_at()
+            }
+            cls._latest_updated_at, cls._latest_updated_at_refreshed_at = latest_updated_at, refreshed_at
+            return latest_updated_at
+        return cls._latest_updated_at
 
     async def create_global_notification(self, *, notification: CreateGlobalNotificationParams):
         new_global_notification = await self.gn_querier.create_global_notification(arg=notification)
         if not new_global_notification:
             raise GlobalNotificationsError("Failed to create notification", status_code=status.HTTP_400_BAD_REQUEST)
+        self.invalidate_latest_updated_at()
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
         return new_global_notification
 
+    async def create_global_notifications_bulk(
+        self, *, notifications: list[CreateGlobalNotificationParams]
+    ) -> NotificationsBulkCreated:
+        start = time.perf_counter()
+        created = 0
+        for i in range(0, len(notifications), self.bulk_chunk_size):
+            chunk = notifications[i : i + self.bulk_chunk_size]
+            params = CreateGlobalNotificationsParams(
+                senders=[notification.sender for notification in chunk],
+                receiver_roles=[notification.receiver_role for notification in chunk],
+                titles=[notification.title for notification in chunk],
+                bodies=[notification.body for notification in chunk],
+                labels=[notification.label for notification in chunk],
+                links=[notification.link for notification in chunk],
+            )
+            created += len([id async for id in self.gn_querier.create_global_notifications(arg=params)])
+        elapsed = time.perf_counter() - start
+        self.invalidate_latest_updated_at()
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
+        logger.info(f"Created {created} global notifications in {elapsed:.3f}s")
+        return NotificationsBulkCreated(created=created, rows_per_second=created / elapsed if elapsed else 0)
+
     async def delete_notification_by_id(self, *, id: int):
         await self.gn_querier.delete_global_notification(global_notification_id=id)
+        self.invalidate_latest_updated_at()
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
 
-    async def has_new_global_notifications(self, *, user_id: int, role: Role):
-        has_new_global_notifications = await self.gn_querier.check_has_new_global_notifications(
-            arg=CheckHasNewGlobalNotificationsParams(
-                roles=ROLE_PERMISSIONS[role],
-                user_id=user_id,
-            )
+    async def has_new_global_notifications(self, *, role: Role, last_global_notification_at: datetime) -> bool:
+        latest_updated_at = await self.get_latest_updated_at()
+        return any(
+            receiver_role in latest_updated_at and latest_updated_at[receiver_role] > last_global_notification_at
+            for receiver_role in ROLE_PERMISSIONS[role]
         )
-        if has_new_global_notifications is None:
-            raise GlobalNotificationsError("Failed to check for new notifications")
-        return has_new_global_notifications
@@ -1,17 +1,38 @@
+import re
+from datetime import date, datetime
+
 import sqlalchemy
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncConnection
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 
 from app.core.errors import BaseAppException
+from app.db.gen.queries import users
+from app.models.global_notifications import PersonalNotificationsPartitions
 from app.services.base import BaseService
 
+PERSONAL_NOTIFICATIONS_PARTITION = re.compile(r"^personal_notifications_p(\d{4})_(\d{2})$")
+PARTITION_LOCK_TIMEOUT = "5s"
+"""
+Attaching and detaching partitions locks out every query on ``personal_notifications``,
+so give up instead of queueing them behind a long running one.
+"""
+
 
 class MaintenanceError(BaseAppException):
     def __init__(self, msg, *, status_code=HTTP_500_INTERNAL_SERVER_ERROR):
         super().__init__(msg, status_code=status_code)
 
 
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def personal_notifications_partition(month: date) -> str:
+    return f"personal_notifications_p{month:%Y_%m}"
+
+
 class MaintenanceService(BaseService):
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
@@ -28,3 +49,80 @@ class MaintenanceService(BaseService):
         except Exception as e:
             logger.exception(e)
             raise MaintenanceError("vacuum_analyze failed") from e
+
+    async def rebuild_user_notification_state(self):
+        """
+        Recount unread notifications of every user from scratch, fixing any drift of the trigger maintained counters.
+        Notification writes wait for the rebuild to commit, so that none is counted twice or missed.
+        """
+        try:
+            await self.conn.execute(
+                sqlalchemy.text("lock table cache.user_notification_state in share row exclusive mode")
+            )
+            await self.get_querier(users.AsyncQuerier).rebuild_user_notification_state()
+        except Exception as e:
+            logger.exception(e)
+            raise MaintenanceError("rebuild_user_notification_state failed") from e
+
+    async def list_personal_notifications_partitions(self) -> dict[date, str]:
+        """
+        Monthly partitions of ``personal_notifications`` by their first day.
+        """
+        result = await self.conn.execute(
+            sqlalchemy.text(
+                """
+                select child.relname from pg_inherits
+                  inner join pg_class child on child.oid = pg_inherits.inhrelid
+                where pg_inherits.inhparent = 'personal_notifications'::regclass
+                """
+            )
+        )
+        partitions = {}
+        for (name,) in result:
+            if match := PERSONAL_NOTIFICATIONS_PARTITION.match(name):
+                partitions[date(int(match[1]), int(match[2]), 1)] = name
+        return partitions
+
+    async def manage_personal_notifications_partitions(
+        self, *, months_ahead: int, retention_months: int, drop_expired: bool
+    ) -> PersonalNotificationsPartitions:
+        """
+        Create the partitions of ``personal_notifications`` from the current month up to ``months_ahead`` months
+        ahead, and detach the ones older than ``retention_months``, dropping them if ``drop_expired``.
+        Unread notification counts are rebuilt when partitions expire, since their rows are not deleted one by one.
+        """
+        current_month = datetime.utcnow().date().replace(day=1)
+        maintained = PersonalNotificationsPartitions()
+        try:
+            await self.conn.execute(sqlalchemy.text(f"set local lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            partitions = await self.list_personal_notifications_partitions()
+            for month in (add_months(current_month, i) for i in range(months_ahead + 1)):
+                if month in partitions:
+                    continue
+                name = personal_notifications_partition(month)
+                await self.conn.execute(
+                    sqlalchemy.text(
+                        f"create table {name} partition of personal_notifications"
+                        f" for values from ('{month}') to ('{add_months(month, 1)}')"
+                    )
+                )
+                maintained.created.append(name)
+
+            if retention_months > 0:
+                oldest_kept = add_months(current_month, -retention_months)
+                for month, name in sorted(partitions.items()):
+                    if add_months(month, 1) > oldest_kept:
+                        break
+                    await self.conn.execute(
+                        sqlalchemy.text(f"alter table personal_notifications detach partition {name}")
+                    )
+                    if drop_expired:
+                        await self.conn.execute(sqlalchemy.text(f"drop table {name}"))
+                    maintained.expired.append(name)
+        except Exception as e:
+            logger.exception(e)
+            raise MaintenanceError("manage_personal_notifications_partitions failed") from e
+
+        if maintained.expired:
+            await self.rebuild_user_notification_state()
+        return maintained
@@ -22,7 +22,7 @@ class PwdResetReqError(BaseAppException):
 class PwdResetReqService(BaseService):
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
-        self.prr_querier = password_reset_requests.AsyncQuerier(conn)
+        self.prr_querier = self.get_querier(password_reset_requests.AsyncQuerier)
         logger.warning(f"PwdResetReqService connection: {id(conn)}")
 
     async def create_password_reset_request(self, *, reset_request: CreatePasswordResetRequestParams):
@@ -1,15 +1,24 @@
+import time
 from datetime import datetime
+from typing import AsyncIterator, Optional
 
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncConnection
 from starlette import status
 
+from app.core.cache import response_cache
 from app.core.errors import BaseAppException
-from app.db.gen.queries import personal_notifications
+from app.db.gen.queries import personal_notifications, users
 from app.db.gen.queries.personal_notifications import (
+    ClaimFanOutChunkParams,
     CreatePersonalNotificationParams,
+    CreatePersonalNotificationsParams,
+)
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
+from app.models.global_notifications import (
+    NotificationRecipients,
+    NotificationsBulkCreated,
 )
-from app.db.gen.queries.users import GetUserRow
 from app.services.base import BaseService
 
 
@@ -20,19 +29,101 @@ class PersonalNotificationsError(BaseAppException):
 
 class PersonalNotificationsService(BaseService):
     page_chunk_size = 10
+    cache_tag = "personal_notifications"
+    """
+    Tag of cached responses that include personal notifications.
+    """
+    bulk_chunk_size = 10_000
+    """
+    Receivers inserted per statement when creating notifications in bulk.
+    """
 
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
         logger.warning(f"PersonalNotificationsService connection: {id(conn)}")
-        self.gn_querier = personal_notifications.AsyncQuerier(conn)
+        self.gn_querier = self.get_querier(personal_notifications.AsyncQuerier)
+        self.users_querier = self.get_querier(users.AsyncQuerier)
 
     async def create_personal_notification(self, *, notification: CreatePersonalNotificationParams):
         new_personal_notification = await self.gn_querier.create_personal_notification(arg=notification)
         if not new_personal_notification:
             raise PersonalNotificationsError("Failed to create notification", status_code=status.HTTP_400_BAD_REQUEST)
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
         return new_personal_notification
 
-    async def delete_notification_by_id(self, *, user: GetUserRow, id: int):
+    async def create_personal_notifications_bulk(
+        self, *, notifications: CreatePersonalNotificationsParams
+    ) -> NotificationsBulkCreated:
+        """
+        Send the same notification to every receiver, skipping emails that don't exist.
+        """
+        start = time.perf_counter()
+        receiver_emails = list(dict.fromkeys(email.lower() for email in notifications.receiver_emails))
+        created_receivers: set[str] = set()
+        for i in range(0, len(receiver_emails), self.bulk_chunk_size):
+            chunk = notifications.copy(update={"receiver_emails": receiver_emails[i : i + self.bulk_chunk_size]})
+            created_receivers.update(
+                [email async for email in self.gn_querier.create_personal_notifications(arg=chunk)]
+            )
+        elapsed = time.perf_counter() - start
+        logger.info(f"Created {len(created_receivers)} personal notifications in {elapsed:.3f}s")
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
+        return NotificationsBulkCreated(
+            created=len(created_receivers),
+            missing_receivers=[email for email in receiver_emails if email not in created_receivers],
+            rows_per_second=len(created_receivers) / elapsed if elapsed else 0,
+        )
+
+    async def stream_recipient_chunks(
+        self, *, recipients: NotificationRecipients, chunk_size: int
+    ) -> AsyncIterator[list[str]]:
+        """
+        Emails of the selected users, ordered by user id, in chunks of at most ``chunk_size``.
+        """
+        after_user_id = 0
+        while True:
+            chunk = [
+                row
+                async for row in self.users_querier.list_notification_recipients(
+                    arg=users.ListNotificationRecipientsParams(
+                        role=recipients.role,
+                        is_verified=recipients.is_verified,
+                        emails=[email.lower() for email in recipients.emails]
+                        if recipients.emails is not None
+                        else None,
+                        after_user_id=after_user_id,
+                        page_size=chunk_size,
+                    )
+                )
+            ]
+            if chunk:
+                yield [row.email for row in chunk]
+            if len(chunk) < chunk_size:
+                return
+            after_user_id = chunk[-1].user_id
+
+    async def deliver_fan_out_chunk(
+        self, *, fan_out_id: str, chunk: int, notifications: CreatePersonalNotificationsParams
+    ) -> Optional[NotificationsBulkCreated]:
+        """
+        Create the notifications of a fan-out chunk, unless it was already delivered.
+        Must run in a single transaction.
+        """
+        claimed = await self.gn_querier.claim_fan_out_chunk(
+            arg=ClaimFanOutChunkParams(fan_out_id=fan_out_id, chunk=chunk)
+        )
+        if claimed is None:
+            logger.info(f"Chunk {chunk} of fan-out {fan_out_id} was already delivered")
+            return None
+        return await self.create_personal_notifications_bulk(notifications=notifications)
+
+    async def prune_fan_out_chunk_claims(self, *, created_before: datetime) -> int:
+        """
+        Delete the claims of fan-out chunks delivered before ``created_before``, whose tasks can no longer be retried.
+        """
+        return await self.gn_querier.delete_fan_out_chunk_claims(created_before=created_before) or 0
+
+    async def delete_notification_by_id(self, *, user: GetAuthUserByUsernameRow, id: int):
         notification = await self.get_notification_by_id(id=id)
         if not notification:
             raise PersonalNotificationsError("Notification not found", status_code=status.HTTP_404_NOT_FOUND)
@@ -41,11 +132,14 @@ class PersonalNotificationsService(BaseService):
                 "You are not allowed to delete this notification", status_code=status.HTTP_403_FORBIDDEN
             )
         await self.gn_querier.delete_personal_notification(personal_notification_id=id)
+        response_cache.invalidate_tags_on_commit(self.conn, self.cache_tag)
 
     async def get_notification_by_id(self, *, id: int):
         return await self.gn_querier.get_personal_notification_by_id(personal_notification_id=id)
 
-    async def has_new_personal_notifications(self, *, last_personal_notification_at: datetime, user: GetUserRow):
+    async def has_new_personal_notifications(
+        self, *, last_personal_notification_at: datetime, user: GetAuthUserByUsernameRow
+    ):
         has_new_personal_notifications = await self.gn_querier.check_has_new_personal_notifications(
             receiver_email=user.email
         )
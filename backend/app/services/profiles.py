@@ -1,6 +1,7 @@
 from fastapi import status
 from sqlalchemy.ext.asyncio import AsyncConnection
 
+from app.core.cache import response_cache
 from app.core.errors import BaseAppException
 from app.db.gen.queries import profiles
 from app.db.gen.queries.profiles import (
@@ -8,6 +9,7 @@ from app.db.gen.queries.profiles import (
     UpdateProfileParams,
 )
 from app.services.base import BaseService
+from app.services.users import UsersService
 
 
 class ProfilesError(BaseAppException):
@@ -18,7 +20,7 @@ class ProfilesError(BaseAppException):
 class ProfilesService(BaseService):
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
-        self.profiles_querier = profiles.AsyncQuerier(conn)
+        self.profiles_querier = self.get_querier(profiles.AsyncQuerier)
 
     async def create_profile_for_user(self, *, profile_create: CreateProfileParams):
         return await self.profiles_querier.create_profile(arg=profile_create)
@@ -27,7 +29,10 @@ class ProfilesService(BaseService):
         return await self.profiles_querier.get_profile_by_id(user_id=user_id)
 
     async def get_profile_by_username(self, *, username: str):
-        return await self.get_profile_by_username(username=username)
+        return await self.profiles_querier.get_profile_by_username(username=username)
 
     async def update_profile(self, *, profile_update: UpdateProfileParams):
-        return await self.profiles_querier.update_profile(arg=profile_update)
+        updated_profile = await self.profiles_querier.update_profile(arg=profile_update)
+        UsersService.invalidate_authenticated_user(self.conn, user_id=profile_update.user_id)
+        response_cache.invalidate_tags_on_commit(self.conn, UsersService.get_cache_tag(user_id=profile_update.user_id))
+        return updated_profile
@@ -1,7 +1,7 @@
 import secrets
 import string
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import AsyncIterator, Collection, Optional
 
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncConnection
@@ -12,7 +12,8 @@ from starlette.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
-from app.core.config import is_prod
+from app.core.cache import TTLCache, response_cache
+from app.core.config import AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL, is_prod
 from app.core.errors import BaseAppException
 from app.db.gen.queries import (
     global_notifications,
@@ -21,32 +22,65 @@ from app.db.gen.queries import (
     users,
 )
 from app.db.gen.queries.models import Role
-from app.models.user import RoleUpdate, UserCreate, UserUpdate
+from app.models.global_notifications import (
+    GlobalNotificationsFeedPage,
+    GlobalNotificationsSearchResults,
+    PersonalNotificationsFeedPage,
+    PersonalNotificationsSearchResults,
+    UnreadNotificationCounts,
+)
+from app.models.pagination import Cursor
+from app.models.user import (
+    RoleUpdate,
+    UserCreate,
+    UserUpdate,
+    UserVerification,
+)
 from app.services import auth_service
+from app.services.authorization import ROLE_PERMISSIONS
 from app.services.base import BaseService
 
+authenticated_users_cache: TTLCache[tuple[str, float], users.GetAuthUserByUsernameRow] = TTLCache(
+    maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL
+)
+"""
+Users resolved from access tokens, keyed by (username, token iat).
+"""
+
 
 class UsersError(BaseAppException):
     def __init__(self, msg, *, status_code=HTTP_500_INTERNAL_SERVER_ERROR, user=""):
         super().__init__(msg, status_code=status_code, user=user)
 
 
+VERIFY_USERS_BATCH_SIZE = 1000
+"""
+Emails verified per statement when streaming verification results.
+"""
+
+FIRST_PAGE_CURSOR = Cursor(timestamp=datetime.max, id=2**31 - 1)
+
+
+def decode_cursor(cursor: Optional[str]) -> Cursor:
+    if cursor is None:
+        return FIRST_PAGE_CURSOR
+    try:
+        return Cursor.decode(cursor)
+    except ValueError as e:
+        raise UsersError(str(e), status_code=HTTP_400_BAD_REQUEST) from e
+
+
 class UsersService(BaseService):
     def __init__(self, conn: AsyncConnection) -> None:
         super().__init__(conn)
         # self.users_repo = UsersRepository(conn)
-        self.users_querier = users.AsyncQuerier(conn)
-        self.profiles_querier = profiles.AsyncQuerier(conn)
-        self.global_notifications_querier = global_notifications.AsyncQuerier(conn)
-        self.personal_notifications_querier = personal_notifications.AsyncQuerier(conn)
+        self.users_querier = self.get_querier(users.AsyncQuerier)
+        self.profiles_querier = self.get_querier(profiles.AsyncQuerier)
+        self.global_notifications_querier = self.get_querier(global_notifications.AsyncQuerier)
+        self.personal_notifications_querier = self.get_querier(personal_notifications.AsyncQuerier)
 
     async def update_user_role(self, role_update: RoleUpdate):
-        user = await self.users_querier.get_user(
-            arg=users.GetUserParams(
-                email=role_update.email,
-                get_db_data=True,
-            )  # type: ignore
-        )
+        user = await self.users_querier.get_user_by_email(email=role_update.email)
         if not user:
             raise UsersError(f"User with email {role_update.email} not found", status_code=HTTP_404_NOT_FOUND)
         if user.is_superuser and is_prod() and role_update.role != Role.ADMIN:
@@ -55,30 +89,59 @@ class UsersService(BaseService):
         await self.users_querier.update_user_role(
             arg=users.UpdateUserRoleParams(user_id=user.user_id, role=role_update.role)
         )
+        self.invalidate_authenticated_user(self.conn, user_id=user.user_id)
+        await auth_service.revoke_cached_tokens()
+
+    async def get_user_by_email(self, *, email: str) -> Optional[users.GetUserByEmailRow]:
+        return await self.users_querier.get_user_by_email(email=email)
+
+    async def get_user_by_username(self, *, username: str) -> Optional[users.GetUserByUsernameRow]:
+        return await self.users_querier.get_user_by_username(username=username)
+
+    async def get_user_by_id(self, *, user_id: int) -> Optional[users.GetUserByIdRow]:
+        return await self.users_querier.get_user_by_id(user_id=user_id)
+
+    async def get_authenticated_user(
+        self, *, username: str, issued_at: float
+    ) -> Optional[users.GetAuthUserByUsernameRow]:
+        """
+        Resolve the user behind an access token, without credentials or profile.
+        """
+        key = (username, issued_at)
+        user = authenticated_users_cache.get(key)
+        if user is None:
+            user = await self.users_querier.get_auth_user_by_username(username=username)
+            if user:
+                authenticated_users_cache.set(key, user)
+        return user
 
-    async def get_user_by_email(self, *, email: str, get_db_data: bool = True):
-        return await self.users_querier.get_user(
-            arg=users.GetUserParams(
-                email=email,
-                get_db_data=get_db_data,
-            )  # type: ignore
-        )
-
-    async def get_user_by_username(self, *, username: str, get_db_data: bool = True):
-        return await self.users_querier.get_user(
-            arg=users.GetUserParams(
-                username=username,
-                get_db_data=get_db_data,
-            )  # type: ignore
+    @staticmethod
+    def invalidate_authenticated_user(
+        conn: AsyncConnection, *, user_id: Optional[int] = None, email: Optional[str] = None
+    ) -> None:
+        """
+        Drop the cached user once the changes made on ``conn`` are committed, see ``invalidate_on_commit``.
+        """
+        response_cache.invalidate_on_commit(
+            conn,
+            lambda: authenticated_users_cache.invalidate_where(
+                lambda _, user: user.user_id == user_id or user.email == email
+            ),
         )
 
-    async def get_user_by_id(self, *, user_id: int, get_db_data: bool = True):
-        return await self.users_querier.get_user(
-            arg=users.GetUserParams(
-                user_id=user_id,
-                get_db_data=get_db_data,
-            )  # type: ignore
-        )
+    @staticmethod
+    def get_cache_tag(*, user_id: int) -> str:
+        """
+        Tag of cached responses that include data of the user, e.g. its profile.
+        """
+        return f"user:{user_id}"
+
+    @staticmethod
+    def invalidate_authenticated_users(conn: AsyncConnection, *, emails: Collection[str]) -> None:
+        if emails:
+            response_cache.invalidate_on_commit(
+                conn, lambda: authenticated_users_cache.invalidate_where(lambda _, user: user.email in emails)
+            )
 
     async def register_new_user(
         self,
@@ -94,7 +157,9 @@ class UsersService(BaseService):
         if await self.get_user_by_username(username=new_user.username):
             raise UsersError(f"User with username {new_user.username} already exists", status_code=HTTP_409_CONFLICT)
 
-        user_password_update = auth_service.create_salt_and_hashed_password(plaintext_password=new_user.password)
+        user_password_update = await auth_service.create_salt_and_hashed_password_async(
+            plaintext_password=new_user.password
+        )
 
         if admin:
             logger.critical(f"Created new admin user {new_user.email}")
@@ -125,7 +190,7 @@ class UsersService(BaseService):
         return created_user
 
     async def update_user(self, *, user_id: int, user_update: UserUpdate):
-        user = await self.get_user_by_id(user_id=user_id, get_db_data=True)
+        user = await self.get_user_by_id(user_id=user_id)
         if not user:
             raise UsersError("User not found", status_code=HTTP_404_NOT_FOUND)
 
@@ -145,15 +210,15 @@ class UsersService(BaseService):
 
         if user_update.password and user_update.old_password:
 
-            if not auth_service.verify_password(
+            if not await auth_service.verify_password_async(
                 password=user_update.old_password,
                 salt=user.salt,
                 hashed_pw=user.password,
             ):
                 raise UsersError("Incorrect current password", user=user.email, status_code=HTTP_400_BAD_REQUEST)
 
-            user_password_update = auth_service.create_salt_and_hashed_password(
-                plaintext_password=user_update.password
+            user_password_update = (
+                await auth_service.create_salt_and_hashed_password_async(plaintext_password=user_update.password)
             ).dict()
             user_to_update = user.copy(update=user_password_update)
 
@@ -176,34 +241,76 @@ class UsersService(BaseService):
         )
         if updated_user is None:
             raise UsersError("Could not update user", user=user.email, status_code=HTTP_400_BAD_REQUEST)
+        self.invalidate_authenticated_user(self.conn, user_id=user.user_id)
+        response_cache.invalidate_tags_on_commit(self.conn, self.get_cache_tag(user_id=user.user_id))
+        if user_update.password:
+            await auth_service.revoke_cached_tokens()
 
         return updated_user
 
     async def verify_users(self, *, user_emails: list[str]):
-        updated_users = [await self.users_querier.verify_user_by_email(email=email) for email in user_emails]
-        if not_updated_users := [email for email in user_emails if email not in updated_users]:
+        emails = [email.lower() for email in user_emails]
+        verified_emails = {email async for email in self.users_querier.verify_users_by_emails(emails=emails)}
+        self.invalidate_authenticated_users(self.conn, emails=verified_emails)
+        if not_updated_users := [email for email in user_emails if email.lower() not in verified_emails]:
             raise UsersError(f"Could not verify users {not_updated_users}", status_code=HTTP_400_BAD_REQUEST)
 
+    async def stream_verify_users(
+        self, *, user_emails: list[str], batch_size: int = VERIFY_USERS_BATCH_SIZE
+    ) -> AsyncIterator[UserVerification]:
+        """
+        Verify users one batch at a time, yielding whether each email was verified as soon
+        as its batch is done. Unknown emails are reported instead of raising.
+        """
+        for start in range(0, len(user_emails), batch_size):
+            batch = user_emails[start : start + batch_size]
+            emails = [email.lower() for email in batch]
+            verified_emails = {email async for email in self.users_querier.verify_users_by_emails(emails=emails)}
+            self.invalidate_authenticated_users(self.conn, emails=verified_emails)
+            for email in batch:
+                yield UserVerification(email=email, verified=email.lower() in verified_emails)
+
     async def authenticate_user(self, *, email: str, password: str):
-        user = await self.get_user_by_email(email=email, get_db_data=True)
+        user = await self.get_user_by_email(email=email)
         if not user:
             return None
 
-        if not auth_service.verify_password(password=password, salt=user.salt, hashed_pw=user.password):
+        if not await auth_service.verify_password_async(password=password, salt=user.salt, hashed_pw=user.password):
             return None
         return user
 
-    async def list_all_users(self, is_verified: Optional[bool] = None):
-        return [i async for i in self.users_querier.list_all_users(is_verified=is_verified)]
+    def stream_users(
+        self, *, is_verified: Optional[bool] = None, after_user_id: int = 0, page_size: Optional[int] = None
+    ) -> AsyncIterator[users.ListAllUsersRow]:
+        """
+        Users ordered by id, starting after ``after_user_id``. Every remaining user is streamed
+        when ``page_size`` is not given.
+        """
+        return self.users_querier.list_all_users(
+            arg=users.ListAllUsersParams(is_verified=is_verified, after_user_id=after_user_id, page_size=page_size)
+        )
+
+    def search_users(
+        self, *, query: str, after_rank: Optional[float] = None, after_user_id: int = 0, page_size: int
+    ) -> AsyncIterator[users.SearchUsersRow]:
+        """
+        Users with a username, email or full name similar to ``query``, most similar first.
+        The next page starts after the ``rank`` and ``user_id`` of the last user of the previous one.
+        """
+        return self.users_querier.search_users(
+            arg=users.SearchUsersParams(
+                query=query, after_rank=after_rank, after_user_id=after_user_id, page_size=page_size
+            )
+        )
 
     async def reset_user_password(self, *, email: str) -> str:
-        user = await self.get_user_by_email(email=email, get_db_data=True)
+        user = await self.get_user_by_email(email=email)
         if not user:
             raise UsersError(f"User with email {email} not found", status_code=HTTP_404_NOT_FOUND)
 
         alphabet = string.ascii_letters + string.digits
         new_password = "".join(secrets.choice(alphabet) for _ in range(20))
-        user_password_update = auth_service.create_salt_and_hashed_password(plaintext_password=new_password)
+        user_password_update = await auth_service.create_salt_and_hashed_password_async(plaintext_password=new_password)
         new_user_params = user.copy(update=user_password_update.dict())
 
         await self.users_querier.reset_user_password(
@@ -213,9 +320,20 @@ class UsersService(BaseService):
                 password=new_user_params.password,
             )
         )
+        self.invalidate_authenticated_user(self.conn, user_id=user.user_id)
+        await auth_service.revoke_cached_tokens()
 
         return new_password
 
+    async def check_has_new_notifications(self, *, user_ids: list[int]) -> dict[int, users.CheckHasNewNotificationsRow]:
+        rows = self.users_querier.check_has_new_notifications(user_ids=user_ids)
+        return {row.user_id: row async for row in rows}
+
+    async def get_unread_notification_counts(self, *, user_id: int) -> UnreadNotificationCounts:
+        counts = await self.users_querier.get_unread_notification_counts(user_id=user_id)
+        # users without a counters row have never had unread notifications
+        return UnreadNotificationCounts(**counts.dict()) if counts else UnreadNotificationCounts()
+
     async def fetch_global_notifications_by_date(
         self, *, params: global_notifications.GetGlobalNotificationsByStartingDateParams, user_id: int
     ):
@@ -230,6 +348,7 @@ class UsersService(BaseService):
                     last_global_notification_at=params.starting_date,
                 )
             )
+            self.invalidate_authenticated_user(self.conn, user_id=user_id)
         return notifications
 
     async def fetch_personal_notifications_by_date(
@@ -246,4 +365,127 @@ class UsersService(BaseService):
                     last_personal_notification_at=params.starting_date,
                 )
             )
+            self.invalidate_authenticated_user(self.conn, user_id=user_id)
         return notifications
+
+    async def fetch_global_notifications_feed(
+        self, *, user: users.GetAuthUserByUsernameRow, cursor: Optional[str], page_chunk_size: int
+    ) -> GlobalNotificationsFeedPage:
+        position = decode_cursor(cursor)
+        notifications = [
+            i
+            async for i in self.global_notifications_querier.get_global_notifications_feed(
+                arg=global_notifications.GetGlobalNotificationsFeedParams(
+                    roles=ROLE_PERMISSIONS[user.role],
+                    cursor_timestamp=position.timestamp,
+                    cursor_id=position.id,
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        if cursor is None:
+            await self.users_querier.update_global_last_notification_at(
+                arg=users.UpdateGlobalLastNotificationAtParams(
+                    user_id=user.user_id,
+                    last_global_notification_at=datetime.utcnow(),
+                )
+            )
+            self.invalidate_authenticated_user(self.conn, user_id=user.user_id)
+        next_cursor = None
+        if len(notifications) == page_chunk_size:
+            last = notifications[-1]
+            next_cursor = Cursor(timestamp=last.event_timestamp, id=last.global_notification_id).encode()
+        return GlobalNotificationsFeedPage(items=notifications, next_cursor=next_cursor)
+
+    async def search_global_notifications(
+        self, *, user: users.GetAuthUserByUsernameRow, query: str, page_chunk_size: int
+    ) -> GlobalNotificationsSearchResults:
+        """
+        Most recent global notifications visible to the user that match ``query``, or with labels similar to it
+        if none does.
+        """
+        notifications = [
+            i
+            async for i in self.global_notifications_querier.search_global_notifications(
+                arg=global_notifications.SearchGlobalNotificationsParams(
+                    query=query,
+                    roles=ROLE_PERMISSIONS[user.role],
+                    before=datetime.utcnow(),
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        if notifications:
+            return GlobalNotificationsSearchResults(items=notifications, fuzzy=False)
+        similar = [
+            global_notifications.SearchGlobalNotificationsRow(**i.dict())
+            async for i in self.global_notifications_querier.search_global_notifications_by_label(
+                arg=global_notifications.SearchGlobalNotificationsByLabelParams(
+                    query=query,
+                    roles=ROLE_PERMISSIONS[user.role],
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        return GlobalNotificationsSearchResults(items=similar, fuzzy=True)
+
+    async def fetch_personal_notifications_feed(
+        self, *, user: users.GetAuthUserByUsernameRow, cursor: Optional[str], page_chunk_size: int
+    ) -> PersonalNotificationsFeedPage:
+        position = decode_cursor(cursor)
+        notifications = [
+            i
+            async for i in self.personal_notifications_querier.get_personal_notifications_feed(
+                arg=personal_notifications.GetPersonalNotificationsFeedParams(
+                    receiver_email=user.email,
+                    cursor_timestamp=position.timestamp,
+                    cursor_id=position.id,
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        if cursor is None:
+            await self.users_querier.update_personal_last_notification_at(
+                arg=users.UpdatePersonalLastNotificationAtParams(
+                    user_id=user.user_id,
+                    last_personal_notification_at=datetime.utcnow(),
+                )
+            )
+            self.invalidate_authenticated_user(self.conn, user_id=user.user_id)
+        next_cursor = None
+        if len(notifications) == page_chunk_size:
+            last = notifications[-1]
+            next_cursor = Cursor(timestamp=last.event_timestamp, id=last.personal_notification_id).encode()
+        return PersonalNotificationsFeedPage(items=notifications, next_cursor=next_cursor)
+
+    async def search_personal_notifications(
+        self, *, user: users.GetAuthUserByUsernameRow, query: str, page_chunk_size: int
+    ) -> PersonalNotificationsSearchResults:
+        """
+        Most recent personal notifications of the user that match ``query``, or with labels similar to it
+        if none does.
+        """
+        notifications = [
+            i
+            async for i in self.personal_notifications_querier.search_personal_notifications(
+                arg=personal_notifications.SearchPersonalNotificationsParams(
+                    query=query,
+                    receiver_email=user.email,
+                    before=datetime.utcnow(),
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        if notifications:
+            return PersonalNotificationsSearchResults(items=notifications, fuzzy=False)
+        similar = [
+            personal_notifications.SearchPersonalNotificationsRow(**i.dict())
+            async for i in self.personal_notifications_querier.search_personal_notifications_by_label(
+                arg=personal_notifications.SearchPersonalNotificationsByLabelParams(
+                    query=query,
+                    receiver_email=user.email,
+                    page_chunk_size=page_chunk_size,
+                )
+            )
+        ]
+        return PersonalNotificationsSearchResults(items=similar, fuzzy=True)
@@ -0,0 +1,3 @@
+from app.stream.registry import registry
+
+__all__ = ["registry"]
@@ -0,0 +1,78 @@
+import asyncio
+from typing import AsyncContextManager, Callable, Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.gen.queries.users import GetAuthUserByUsernameRow
+from app.services.global_notifications import GlobalNotificationsService
+from app.services.users import UsersService
+from app.stream.models import NotificationsState
+
+ConnectionFactory = Callable[[], AsyncContextManager[AsyncConnection]]
+
+
+class NotificationsChecker:
+    """
+    Shared "has new notifications" checker for every open stream in the process.
+    Checks requested within ``batch_window`` are answered together with a single query, on a connection
+    borrowed from the pool only for the duration of the batch. Streams never hold a connection between ticks.
+
+    Streams wait ``MESSAGE_STREAM_DELAY`` after getting their result, so those answered in the same batch
+    request their next check together as well, and the number of queries per tick stays constant.
+    """
+
+    batch_window = 0.05  # seconds
+
+    def __init__(self, connect: ConnectionFactory) -> None:
+        self.connect = connect
+        self._pending: dict[int, tuple[GetAuthUserByUsernameRow, asyncio.Future]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def check(self, *, user: GetAuthUserByUsernameRow) -> NotificationsState:
+        pending = self._pending.get(user.user_id)
+        if pending is None:
+            pending = (user, asyncio.get_running_loop().create_future())
+            self._pending[user.user_id] = pending
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        # a disconnecting stream must not cancel the check for everyone else
+        return await asyncio.shield(pending[1])
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        try:
+            states = await self._check_batch([user for user, _ in pending.values()])
+        except Exception as e:
+            logger.warning(f"Could not check for new notifications: {e}")
+            for _, future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for user_id, (_, future) in pending.items():
+            if not future.done():
+                future.set_result(states[user_id])
+
+    async def _check_batch(self, users: list[GetAuthUserByUsernameRow]) -> dict[int, NotificationsState]:
+        async with self.connect() as conn:
+            rows = await UsersService(conn).check_has_new_notifications(user_ids=[user.user_id for user in users])
+            # compared against the per-role high-water mark, which only queries once it is invalidated
+            global_notifications_service = GlobalNotificationsService(conn)
+            has_new_global_notifications = {
+                user.user_id: await global_notifications_service.has_new_global_notifications(
+                    role=user.role, last_global_notification_at=user.last_global_notification_at
+                )
+                for user in users
+            }
+        states = {}
+        for user in users:
+            row = rows.get(user.user_id)
+            states[user.user_id] = NotificationsState(
+                has_new_global_notifications=has_new_global_notifications[user.user_id],
+                has_new_personal_notifications=row.has_new_personal_notifications if row else False,
+                unread_global_count=row.unread_global_count if row else 0,
+                unread_personal_count=row.unread_personal_count if row else 0,
+            )
+        return states
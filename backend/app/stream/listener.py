@@ -0,0 +1,86 @@
+import asyncio
+from typing import Optional
+
+import asyncpg
+from loguru import logger
+
+from app.core import config
+from app.db.gen.queries.models import Role
+from app.services.global_notifications import GlobalNotificationsService
+from app.stream.registry import SubscriberRegistry
+
+GLOBAL_NOTIFICATIONS_CHANNEL = "global_notifications"
+PERSONAL_NOTIFICATIONS_CHANNEL = "personal_notifications"
+NOTIFICATIONS_SEEN_CHANNEL = "notifications_seen"
+
+
+def get_asyncpg_dsn() -> str:
+    return str(config.DATABASE_URL).replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class NotificationsListener:
+    """
+    Single LISTEN connection per worker process, outside of the engine's pool.
+    Forwards change events published by the notification triggers to the subscriber registry.
+    """
+
+    health_check_interval = 30  # seconds
+    reconnect_delay = 5  # seconds
+
+    def __init__(self, registry: SubscriberRegistry) -> None:
+        self.registry = registry
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._conn = await asyncpg.connect(get_asyncpg_dsn())
+                await self._conn.add_listener(GLOBAL_NOTIFICATIONS_CHANNEL, self._on_global_notification)
+                await self._conn.add_listener(PERSONAL_NOTIFICATIONS_CHANNEL, self._on_personal_notification)
+                await self._conn.add_listener(NOTIFICATIONS_SEEN_CHANNEL, self._on_personal_notification)
+                logger.info(f"Listening for notification changes on connection {id(self._conn)}")
+                self.registry.listening = True
+                # anything may have changed while we were not listening
+                GlobalNotificationsService.invalidate_latest_updated_at()
+                self.registry.publish_all()
+                while True:
+                    await asyncio.sleep(self.health_check_interval)
+                    await self._conn.execute("SELECT 1")
+            except Exception as e:
+                logger.warning(f"Notifications listener disconnected: {e}")
+            finally:
+                self.registry.listening = False
+                await self._close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            await self._conn.close(timeout=5)
+        except Exception as e:
+            logger.warning(f"Could not close notifications listener connection: {e}")
+            self._conn.terminate()
+        self._conn = None
+
+    def _on_global_notification(self, conn, pid, channel, payload: str) -> None:
+        logger.debug(f"{channel}: {payload}")
+        GlobalNotificationsService.invalidate_latest_updated_at()
+        self.registry.publish_global(receiver_role=Role(payload))
+
+    def _on_personal_notification(self, conn, pid, channel, payload: str) -> None:
+        logger.debug(f"{channel}: {payload}")
+        self.registry.publish_personal(receiver_email=payload)
@@ -0,0 +1,8 @@
+from app.models.core import CoreModel
+
+
+class NotificationsState(CoreModel):
+    has_new_global_notifications: bool
+    has_new_personal_notifications: bool
+    unread_global_count: int = 0
+    unread_personal_count: int = 0
@@ -0,0 +1,99 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+from loguru import logger
+
+from app.db.gen.queries.models import Role
+from app.services.authorization import ROLE_PERMISSIONS
+
+
+class StreamSubscriber:
+    """
+    An open notification stream for a given user.
+    Notified by the registry whenever something it cares about may have changed.
+    """
+
+    def __init__(self, *, email: str, role: Role) -> None:
+        self.email = email
+        self.role = role
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+
+    async def wait_for_change(self, *, timeout: float) -> bool:
+        """
+        Wait at most ``timeout`` seconds for a change event. Returns whether there was one.
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+
+class SubscriberRegistry:
+    """
+    In-process registry of open notification streams, keyed by user email and role.
+    Fed by ``NotificationsListener`` with change events from the database.
+    """
+
+    def __init__(self) -> None:
+        self._by_email: dict[str, set[StreamSubscriber]] = defaultdict(set)
+        self._by_role: dict[Role, set[StreamSubscriber]] = defaultdict(set)
+        self.listening = False
+        """
+        Whether change events are being received. Streams must poll the database otherwise.
+        """
+
+    def __len__(self) -> int:
+        return sum(len(subscribers) for subscribers in self._by_email.values())
+
+    def subscribe(self, *, email: str, role: Role) -> StreamSubscriber:
+        subscriber = StreamSubscriber(email=email, role=role)
+        self._by_email[email].add(subscriber)
+        self._by_role[role].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        self._by_email[subscriber.email].discard(subscriber)
+        if not self._by_email[subscriber.email]:
+            del self._by_email[subscriber.email]
+        self._by_role[subscriber.role].discard(subscriber)
+
+    @contextmanager
+    def subscription(self, *, email: str, role: Role) -> Iterator[StreamSubscriber]:
+        subscriber = self.subscribe(email=email, role=role)
+        try:
+            yield subscriber
+        finally:
+            self.unsubscribe(subscriber)
+
+    def publish_global(self, *, receiver_role: Role) -> None:
+        """
+        Notify every subscriber whose role has access to notifications sent to ``receiver_role``.
+        """
+        for role, subscribers in self._by_role.items():
+            if receiver_role not in ROLE_PERMISSIONS[role]:
+                continue
+            for subscriber in subscribers:
+                subscriber.notify()
+
+    def publish_personal(self, *, receiver_email: str) -> None:
+        for subscriber in self._by_email.get(receiver_email, ()):
+            subscriber.notify()
+
+    def publish_all(self) -> None:
+        """
+        Notify every subscriber, e.g. when change events may have been missed.
+        """
+        logger.info(f"Notifying all {len(self)} stream subscribers")
+        for subscribers in self._by_email.values():
+            for subscriber in subscribers:
+                subscriber.notify()
+
+
+registry = SubscriberRegistry()
@@ -4,18 +4,15 @@ import os
 import pathlib
 import sys
 
-import sqlalchemy
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncConnection
 
-from app.api.routes.celery import (
-    get_status,
-    run_vacuum_analyze_task,
-)
+from app.api.routes.celery import get_status, run_vacuum_analyze_task
 from app.core.config import ADMIN_EMAIL
 from app.db.gen.queries.personal_notifications import (
-    CreatePersonalNotificationParams,
+    CreatePersonalNotificationsParams,
 )
+from app.services.global_notifications import GlobalNotificationsService
 from app.services.personal_notifications import PersonalNotificationsService
 from initial_data.data import (
     GLOBAL_NOTIFICATIONS,
@@ -27,11 +24,8 @@ from initial_data.data import (
 
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
 
-from app.api.routes.admin import create_global_notification, update_user_role
-from app.api.routes.users import (
-    create_personal_notification,
-    request_password_reset,
-)
+from app.api.routes.admin import update_user_role
+from app.api.routes.users import request_password_reset
 from app.db.tasks import connect_to_db
 from app.models.user import RoleUpdate, UserCreate
 from app.services.users import UsersService
@@ -67,6 +61,7 @@ async def init_database():
     conn: AsyncConnection = await engine.connect()
     users_service = UsersService(conn)
     pn_service = PersonalNotificationsService(conn)
+    gn_service = GlobalNotificationsService(conn)
 
     for user in USERS[DATASET].values():
         await users_service.register_new_user(
@@ -84,52 +79,47 @@ async def init_database():
                 role=user.role,
             ),
         )
-        await pn_service.create_personal_notification(
-            notification=CreatePersonalNotificationParams(
-                sender=ADMIN_EMAIL.lower(),
-                receiver_email=existing_user.email,
-                title="Welcome to MYAPP",
-                body="Here you can check out all news and updates from MYAPP. \nVisit the help page for more information.",
-                label="news",
-                link="/help",
-            )
+
+    await pn_service.create_personal_notifications_bulk(
+        notifications=CreatePersonalNotificationsParams(
+            sender=ADMIN_EMAIL.lower(),
+            receiver_emails=[user.email for user in USERS[DATASET].values()],
+            title="Welcome to MYAPP",
+            body="Here you can check out all news and updates from MYAPP. \nVisit the help page for more information.",
+            label="news",
+            link="/help",
         )
+    )
 
     for reset_request in PASSWORD_RESET_REQUESTS[DATASET].values():
         await request_password_reset(conn=conn, reset_request=reset_request)
 
-    for i, notification in enumerate(GLOBAL_NOTIFICATIONS[DATASET].values()):
-        new_global_notification = await create_global_notification(conn=conn, notification=notification)
-        assert new_global_notification.global_notification_id is not None
-
-        await conn.execute(
-            text(
-                f"""
-            UPDATE global_notifications
-            SET created_at = created_at - interval '{i+1} hour',
-                updated_at = updated_at - interval '{i+1} hour'
-            WHERE global_notification_id = {i+1}
+    await gn_service.create_global_notifications_bulk(notifications=list(GLOBAL_NOTIFICATIONS[DATASET].values()))
+    await conn.execute(
+        text(
             """
-            )
+        UPDATE global_notifications
+        SET created_at = created_at - global_notification_id * interval '1 hour',
+            updated_at = updated_at - global_notification_id * interval '1 hour'
+        """
         )
+    )
 
-    user = await users_service.get_user_by_email(email=ADMIN_EMAIL)
-    for i, notification in enumerate(PERSONAL_NOTIFICATIONS[DATASET].values()):
-        new_global_notification = await create_personal_notification(conn=conn, notification=notification, user=user)
-        assert new_global_notification.personal_notification_id is not None
-
-    n_notifications = (await conn.execute(sqlalchemy.text("""SELECT COUNT(*) FROM personal_notifications"""))).scalar()
-    for i in range(n_notifications):
-        await conn.execute(
-            text(
-                f"""
-            UPDATE personal_notifications
-            SET created_at = created_at - interval '{i+1} hour',
-                updated_at = updated_at - interval '{i+1} hour'
-            WHERE personal_notification_id = {i+1}
-            """
+    for notification in PERSONAL_NOTIFICATIONS[DATASET].values():
+        await pn_service.create_personal_notifications_bulk(
+            notifications=CreatePersonalNotificationsParams(
+                **notification.dict(exclude={"receiver_email"}), receiver_emails=[notification.receiver_email]
             )
         )
+    await conn.execute(
+        text(
+            """
+        UPDATE personal_notifications
+        SET created_at = created_at - personal_notification_id * interval '1 hour',
+            updated_at = updated_at - personal_notification_id * interval '1 hour'
+        """
+        )
+    )
 
     await conn.commit()
 
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the authentication dependency chain, with and without the in-memory
+token payload and authenticated user caches.
+
+    python scripts/benchmarks/auth_dependencies.py --email admin@myapp.com --iterations 5000
+"""
+import argparse
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from utils import report, timed
+
+from app.api.dependencies.auth import (
+    get_current_active_user,
+    get_user_from_token,
+)
+from app.core.config import ADMIN_EMAIL, DATABASE_URL, UNIQUE_KEY
+from app.services import auth_service
+from app.services.authentication import token_payloads_cache
+from app.services.users import UsersService, authenticated_users_cache
+
+
+async def bench_token_decode(token: str, iterations: int) -> None:
+    for cached in (False, True):
+        samples: list[float] = []
+        for _ in range(iterations):
+            if not cached:
+                await auth_service.revoke_cached_tokens()
+            with timed(samples):
+                auth_service.get_payload_from_token(token=token, secret_key=str(UNIQUE_KEY))
+        report(f"token decode ({'cached' if cached else 'uncached'})", samples, unit="us", scale=1e6)
+    print(f"token payloads cache: {token_payloads_cache.stats()}")
+
+
+async def bench_dependency_chain(token: str, iterations: int, database_url: str) -> None:
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            for cached in (False, True):
+                samples: list[float] = []
+                for _ in range(iterations):
+                    if not cached:
+                        await auth_service.revoke_cached_tokens()
+                        authenticated_users_cache.clear()
+                    with timed(samples):
+                        user = await get_user_from_token(None, token=token, conn=conn)  # type: ignore
+                        await get_current_active_user(None, current_user=user)  # type: ignore
+                report(f"get_current_active_user ({'cached' if cached else 'uncached'})", samples)
+        print(f"authenticated users cache: {authenticated_users_cache.stats()}")
+    finally:
+        await engine.dispose()
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    async with engine.connect() as conn:
+        user = await UsersService(conn).get_user_by_email(email=args.email)
+    await engine.dispose()
+    if not user:
+        raise SystemExit(f"User {args.email} not found")
+    token = str(auth_service.create_access_token_for_user(user=user))
+
+    await bench_token_decode(token, args.iterations)
+    await bench_dependency_chain(token, args.iterations, args.database_url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--iterations", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Send the same personal notification to ``--users`` users one INSERT at a time, as initial_data used
+to, against ``PersonalNotificationsService.create_personal_notifications_bulk`` and, for reference,
+asyncpg's COPY. Seeds ``--users`` users on first run. Every run is rolled back.
+
+    python scripts/benchmarks/bulk_notifications.py --users 50000 --iterations 3
+"""
+import argparse
+import asyncio
+from typing import Awaitable, Callable
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from user_lookups import BENCH_USER_PREFIX, seed_users
+from utils import report, timed
+
+from app.core.config import DATABASE_URL
+from app.db.gen.queries.personal_notifications import (
+    AsyncQuerier,
+    CreatePersonalNotificationParams,
+    CreatePersonalNotificationsParams,
+)
+from app.db.native import driver_connection
+from app.services.personal_notifications import PersonalNotificationsService
+
+NOTIFICATION = dict(sender=None, title="Benchmark", body="Benchmark notification", label="benchmark", link=None)
+
+
+async def insert_one_by_one(conn: AsyncConnection, emails: list[str]) -> None:
+    querier = AsyncQuerier(conn)
+    for email in emails:
+        await querier.create_personal_notification(
+            arg=CreatePersonalNotificationParams(**NOTIFICATION, receiver_email=email)
+        )
+
+
+async def insert_in_bulk(conn: AsyncConnection, emails: list[str]) -> None:
+    await PersonalNotificationsService(conn).create_personal_notifications_bulk(
+        notifications=CreatePersonalNotificationsParams(**NOTIFICATION, receiver_emails=emails)
+    )
+
+
+async def copy_records(conn: AsyncConnection, emails: list[str]) -> None:
+    columns = ["receiver_email", *NOTIFICATION]
+    async with driver_connection(conn) as (driver, _):
+        await driver.copy_records_to_table(
+            "personal_notifications",
+            records=[(email, *NOTIFICATION.values()) for email in emails],
+            columns=columns,
+        )
+
+
+STRATEGIES: dict[str, Callable[[AsyncConnection, list[str]], Awaitable[None]]] = {
+    "one INSERT per notification": insert_one_by_one,
+    "create_personal_notifications_bulk": insert_in_bulk,
+    "COPY": copy_records,
+}
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            emails = (
+                (
+                    await conn.execute(
+                        sqlalchemy.text(
+                            "select email from users where username like :prefix order by user_id limit :limit"
+                        ),
+                        {"prefix": f"{BENCH_USER_PREFIX}%", "limit": args.users},
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            await conn.rollback()
+
+            for name, insert in STRATEGIES.items():
+                samples: list[float] = []
+                for _ in range(args.iterations):
+                    with timed(samples):
+                        await insert(conn, emails)
+                    await conn.rollback()
+                report(f"{name} ({len(emails)})", samples)
+                print(f"{'':<40} {len(emails) / (sum(samples) / len(samples)):,.0f} rows/s")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--iterations", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
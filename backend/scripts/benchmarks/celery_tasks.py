@@ -0,0 +1,71 @@
+"""
+Run ``--tasks`` small async task bodies the way a worker process runs them, with a new event loop
+and unpooled connection per task as before, against the worker process loop and pooled engine set
+up by ``init_worker_process``. Reports per task latency and database connections opened.
+
+    python scripts/benchmarks/celery_tasks.py --tasks 1000
+"""
+import argparse
+from typing import Callable
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from utils import report, timed
+
+from app.celery.utils import async_to_sync, close_worker_loop, init_worker_loop
+from app.core.config import DATABASE_URL
+
+
+def count_connections(engine: AsyncEngine) -> list[int]:
+    connections = [0]
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(*args) -> None:
+        connections[0] += 1
+
+    return connections
+
+
+def small_task(engine: AsyncEngine) -> Callable[[], int]:
+    @async_to_sync
+    async def task() -> int:
+        conn = await engine.connect()
+        try:
+            return (await conn.execute(sqlalchemy.text("select 1"))).scalar_one()
+        finally:
+            await conn.close()
+
+    return task
+
+
+def run(name: str, engine: AsyncEngine, tasks: int) -> None:
+    connections = count_connections(engine)
+    task = small_task(engine)
+    samples: list[float] = []
+    for _ in range(tasks):
+        with timed(samples):
+            task()
+    report(f"{name} ({tasks})", samples)
+    print(f"{'':<40} {connections[0]} connections opened")
+
+
+def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url, poolclass=NullPool)
+    run("event loop per task, NullPool", engine, args.tasks)
+
+    loop = init_worker_loop()
+    engine = create_async_engine(args.database_url)
+    try:
+        run("worker process loop, pooled", engine, args.tasks)
+    finally:
+        loop.run_until_complete(engine.dispose())
+        close_worker_loop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--tasks", type=int, default=1000)
+    main(parser.parse_args())
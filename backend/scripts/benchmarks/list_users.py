@@ -0,0 +1,92 @@
+"""
+Memory and CPU cost of listing users, with validated pydantic rows from the generated querier
+against lightweight rows from the native querier, both serialized with a ``response_model``, and
+with the JSON array ``admin:list-users`` streams from the cursor. Seeds ``--users`` users on first run.
+
+    python scripts/benchmarks/list_users.py --users 10000 --iterations 20
+"""
+import argparse
+import asyncio
+import tracemalloc
+from typing import Any
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from user_lookups import seed_users
+from utils import report, timed
+
+from app.api.routes.utils.streaming import encode_json_array
+from app.core.config import DATABASE_URL
+from app.db.gen.queries import users
+from app.db.native import native_querier
+
+RESPONSE_FIELD = create_response_field(name="Response_list_all_users", type_=list[users.ListAllUsersRow])
+
+
+async def list_users(conn: AsyncConnection, native: bool) -> list[Any]:
+    querier = native_querier(users.AsyncQuerier)(conn) if native else users.AsyncQuerier(conn)
+    params = users.ListAllUsersParams(is_verified=None, after_user_id=0, page_size=None)
+    return [user async for user in querier.list_all_users(arg=params)]
+
+
+async def stream_users(conn: AsyncConnection) -> int:
+    params = users.ListAllUsersParams(is_verified=None, after_user_id=0, page_size=None)
+    size = 0
+    async for chunk in encode_json_array(users.AsyncQuerier(conn).list_all_users(arg=params)):
+        size += len(chunk)
+    return size
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            for native in (False, True):
+                name = "lightweight rows" if native else "pydantic rows"
+                await list_users(conn, native)  # warm up statement caches
+
+                query_samples: list[float] = []
+                response_samples: list[float] = []
+                for _ in range(args.iterations):
+                    with timed(query_samples):
+                        rows = await list_users(conn, native)
+                    with timed(response_samples):
+                        await serialize_response(field=RESPONSE_FIELD, response_content=rows)
+                report(f"{name} query ({len(rows)})", query_samples)
+                report(f"{name} response", response_samples)
+
+                del rows
+                tracemalloc.start()
+                rows = await list_users(conn, native)
+                rows_peak = tracemalloc.get_traced_memory()[1]
+                await serialize_response(field=RESPONSE_FIELD, response_content=rows)
+                response_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                del rows
+                print(
+                    f"{name + ' peak memory':<40} rows={rows_peak / 2**20:.1f}MiB response={response_peak / 2**20:.1f}MiB"
+                )
+
+            # as admin:list-users responds, encoding rows as they are read from the cursor
+            samples: list[float] = []
+            for _ in range(args.iterations):
+                with timed(samples):
+                    await stream_users(conn)
+            report("streamed response", samples)
+            tracemalloc.start()
+            await stream_users(conn)
+            print(f"{'streamed response peak memory':<40} {tracemalloc.get_traced_memory()[1] / 2**20:.1f}MiB")
+            tracemalloc.stop()
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
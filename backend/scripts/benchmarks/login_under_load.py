@@ -0,0 +1,72 @@
+"""
+Measure login latency while many notification streams are open, to compare bcrypt running
+on the event loop against the password hashing pool. Start the backend with
+AUTH_HASHING_EXECUTOR=inline for the baseline, then with thread or process.
+
+    python scripts/benchmarks/login_under_load.py --streams 500 --logins 200
+"""
+import argparse
+import asyncio
+
+import httpx
+from streams_load import login, open_stream
+from utils import report, timed
+
+from app.core.config import ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.streams + args.concurrency, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.base_url, verify=False, limits=limits, timeout=None) as client:
+        token = await login(client, email=args.email, password=args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        opened = asyncio.Semaphore(0)
+        stream_errors: list[str] = []
+        streams = [asyncio.create_task(open_stream(client, opened, stream_errors)) for _ in range(args.streams)]
+        for _ in range(args.streams):
+            await asyncio.wait_for(opened.acquire(), timeout=args.timeout)
+        print(f"{args.streams} streams open ({len(stream_errors)} errors)")
+
+        login_latencies: list[float] = []
+        me_latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def do_login() -> None:
+            async with sem:
+                with timed(login_latencies):
+                    res = await client.post(
+                        "/users/login/token/", data={"username": args.email, "password": args.password}
+                    )
+                statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+        async def do_me() -> None:
+            async with sem:
+                with timed(me_latencies):
+                    await client.get("/users/me/")
+
+        await asyncio.gather(*(do_login() for _ in range(args.logins)), *(do_me() for _ in range(args.logins)))
+        report("POST /users/login/token/", login_latencies)
+        report("GET /users/me/ (during logins)", me_latencies)
+        print(f"login status codes: {statuses}")
+
+        res = await client.get("/admin/metrics/")
+        if res.status_code == 200:
+            print(f"password hashing: {res.json()['password_hashing']}")
+
+        for stream in streams:
+            stream.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="https://myapp.dev.localhost/api/v1")
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--password", default=ADMIN_PASSWORD)
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for each stream to open")
+    asyncio.run(main(parser.parse_args()))
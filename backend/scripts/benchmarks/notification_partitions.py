@@ -0,0 +1,130 @@
+"""
+First and deep pages of ``GetPersonalNotificationsFeed`` as the history of the partitioned ``personal_notifications``
+grows one month at a time, up to ``--months``, with ``--rows-per-month`` notifications over ``--users`` users
+per month. Latency stays flat since only the newest partitions are scanned, which the plans show.
+
+    python scripts/benchmarks/notification_partitions.py --months 12 --rows-per-month 1000000 --users 10000
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import date, datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from user_lookups import BENCH_USER_PREFIX, seed_users
+from utils import report, timed
+
+from app.core.config import DATABASE_URL
+from app.db.gen.queries.personal_notifications import (
+    GET_PERSONAL_NOTIFICATIONS_FEED,
+)
+from app.services.maintenance import (
+    MaintenanceService,
+    add_months,
+    personal_notifications_partition,
+)
+
+BENCH_LINK = "/bench/partitions"
+
+
+async def seed_month(conn: AsyncConnection, month: date, rows: int, users: int) -> None:
+    start, stop = datetime(month.year, month.month, 1), datetime.combine(add_months(month, 1), datetime.min.time())
+    if month not in await MaintenanceService(conn).list_personal_notifications_partitions():
+        await conn.execute(
+            sqlalchemy.text(
+                f"create table {personal_notifications_partition(month)} partition of personal_notifications"
+                f" for values from ('{month}') to ('{add_months(month, 1)}')"
+            )
+        )
+    existing = (
+        await conn.execute(
+            sqlalchemy.text(
+                """
+                select count(*) from personal_notifications
+                where link = :link and created_at >= :start and created_at < :stop
+                """
+            ),
+            {"link": BENCH_LINK, "start": start, "stop": stop},
+        )
+    ).scalar()
+    if existing >= rows:
+        return
+    print(f"seeding {rows - existing} notifications in {month:%Y-%m}")
+    await conn.execute(
+        sqlalchemy.text(
+            """
+            insert into personal_notifications (receiver_email, title, body, label, link, created_at, updated_at)
+            select :prefix || (1 + i % :users) || '@myapp.com', 'title', 'body', 'label', :link, ts, ts
+            from generate_series(:first\\:\\:int, :last\\:\\:int) i,
+              lateral (select :stop\\:\\:timestamp - (i % :seconds) * interval '1 second' as ts) t
+            """
+        ),
+        {
+            "prefix": BENCH_USER_PREFIX,
+            "users": users,
+            "link": BENCH_LINK,
+            "first": existing + 1,
+            "last": rows,
+            "stop": min(stop, datetime.utcnow()),
+            "seconds": int((min(stop, datetime.utcnow()) - start).total_seconds()),
+        },
+    )
+    await conn.commit()
+    # sets the visibility map too, so that index only scans don't fetch seeded rows from the heap
+    await MaintenanceService(conn).vacuum_analyze()
+
+
+async def scanned_partitions(conn: AsyncConnection, params: dict) -> tuple[int, int]:
+    """
+    Partitions scanned by the feed query, out of the ones in its plan.
+    """
+    plan = (
+        await conn.execute(sqlalchemy.text(f"explain (analyze, format json) {GET_PERSONAL_NOTIFICATIONS_FEED}"), params)
+    ).scalar()
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    nodes, scans = [plan["Plan"]], []
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if "Relation Name" in node:
+            scans.append(node)
+    return len([node for node in scans if node["Actual Loops"]]), len(scans)
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    current_month = datetime.utcnow().date().replace(day=1)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            for months in range(1, args.months + 1):
+                await seed_month(conn, add_months(current_month, 1 - months), args.rows_per_month, args.users)
+
+                receivers = [f"{BENCH_USER_PREFIX}{random.randint(1, args.users)}@myapp.com" for _ in range(100)]
+                for page, cursor_timestamp in (("first", datetime.max), ("week old", datetime.utcnow() - timedelta(7))):
+                    params = [
+                        {"p1": receiver, "p2": cursor_timestamp, "p3": 2**31 - 1, "p4": args.page_chunk_size}
+                        for receiver in receivers
+                    ]
+                    samples: list[float] = []
+                    for _ in range(args.iterations // len(params) or 1):
+                        for p in params:
+                            with timed(samples):
+                                (await conn.execute(sqlalchemy.text(GET_PERSONAL_NOTIFICATIONS_FEED), p)).all()
+                    scanned, planned = await scanned_partitions(conn, params[0])
+                    report(f"{months:>2} months, {page} page ({scanned}/{planned} scanned)", samples)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--rows-per-month", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--page-chunk-size", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
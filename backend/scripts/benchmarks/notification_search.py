@@ -0,0 +1,137 @@
+"""
+Search personal notifications of random receivers with ``SearchPersonalNotifications``, read in order
+from the RUM index, against the ILIKE scan it replaces, and fuzzy label matching with
+``SearchPersonalNotificationsByLabel``. Seeds ``--rows`` notifications over ``--users`` users on first run.
+
+    python scripts/benchmarks/notification_search.py --rows 10000000 --users 10000 --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from user_lookups import BENCH_USER_PREFIX, seed_users
+from utils import report, timed
+
+from app.core.config import DATABASE_URL
+from app.db.gen.queries.personal_notifications import (
+    SEARCH_PERSONAL_NOTIFICATIONS,
+    SEARCH_PERSONAL_NOTIFICATIONS_BY_LABEL,
+)
+
+BENCH_LINK = "/bench/search"
+SEED_CHUNK_SIZE = 1_000_000
+WORDS = ["account", "billing", "deploy", "invoice", "maintenance", "password", "report", "security", "update"]
+LABELS = ["billing", "maintenance", "report", "security", "task"]
+MISSPELLED_LABELS = ["biling", "maintenace", "reprot", "securty"]
+
+LEGACY_SEARCH = """
+select
+  personal_notification_id, sender, receiver_email, title, body, label, link, created_at, updated_at
+from
+  personal_notifications
+where
+  receiver_email = :p2
+  and (title ilike '%' || :p1 || '%' or body ilike '%' || :p1 || '%' or label ilike '%' || :p1 || '%')
+order by
+  updated_at desc
+limit :p4
+"""
+
+
+async def seed_notifications(conn: AsyncConnection, rows: int, users: int) -> None:
+    existing = (
+        await conn.execute(
+            sqlalchemy.text("select count(*) from personal_notifications where link = :link"),
+            {"link": BENCH_LINK},
+        )
+    ).scalar()
+    if existing >= rows:
+        return
+    print(f"seeding {rows - existing} notifications")
+    for start in range(existing, rows, SEED_CHUNK_SIZE):
+        stop = min(start + SEED_CHUNK_SIZE, rows)
+        await conn.execute(
+            sqlalchemy.text(
+                """
+                insert into personal_notifications (receiver_email, title, body, label, link, created_at, updated_at)
+                select
+                  :prefix || (1 + i % :users) || '@myapp.com',
+                  initcap((:words\\:\\:text[])[1 + i % 9]) || ' ' || (:words\\:\\:text[])[1 + (i / 9) % 9],
+                  'Notification ' || i || ' about ' || (:words\\:\\:text[])[1 + (i / 81) % 9] || ' and ' || (:words\\:\\:text[])[1 + (i / 7) % 9],
+                  (:labels\\:\\:text[])[1 + (i / 3) % 5],
+                  :link,
+                  ts,
+                  ts
+                from generate_series(:start\\:\\:int, :stop\\:\\:int) i,
+                  lateral (select timezone('utc', now()) - (i % 525600) * interval '1 minute' as ts) t
+                """
+            ),
+            {
+                "link": BENCH_LINK,
+                "prefix": BENCH_USER_PREFIX,
+                "users": users,
+                "words": WORDS,
+                "labels": LABELS,
+                "start": start + 1,
+                "stop": stop,
+            },
+        )
+        await conn.commit()
+        print(f"seeded {stop} notifications")
+    await conn.execute(sqlalchemy.text("analyze personal_notifications"))
+    await conn.commit()
+
+
+async def run(conn: AsyncConnection, name: str, query: str, params: list[dict], explain: bool = False) -> None:
+    samples: list[float] = []
+    for p in params:
+        with timed(samples):
+            (await conn.execute(sqlalchemy.text(query), p)).all()
+    report(name, samples)
+    if explain:
+        plan = (
+            await conn.execute(sqlalchemy.text(f"explain (analyze, buffers, format json) {query}"), params[0])
+        ).scalar()
+        plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+        print(f"{'':<40} {plan['Plan']['Node Type']} in {plan['Execution Time']:.3f}ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            await seed_notifications(conn, args.rows, args.users)
+
+            receivers = [
+                f"{BENCH_USER_PREFIX}{random.randint(1, args.users)}@myapp.com" for _ in range(args.iterations)
+            ]
+            now = datetime.utcnow()
+            search_params = [
+                {"p1": random.choice(WORDS), "p2": receiver, "p3": now, "p4": args.page_chunk_size}
+                for receiver in receivers
+            ]
+            label_params = [
+                {"p1": random.choice(MISSPELLED_LABELS), "p2": receiver, "p3": args.page_chunk_size}
+                for receiver in receivers
+            ]
+            await run(conn, "ILIKE scan", LEGACY_SEARCH, search_params)
+            await run(conn, "tsvector, RUM ordered", SEARCH_PERSONAL_NOTIFICATIONS, search_params, explain=True)
+            await run(conn, "label trigram", SEARCH_PERSONAL_NOTIFICATIONS_BY_LABEL, label_params, explain=True)
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--page-chunk-size", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""
+Per-query overhead of the generated SQLAlchemy queriers against their asyncpg-native counterparts.
+
+    python scripts/benchmarks/querier_overhead.py --email admin@myapp.com --iterations 5000
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from utils import report, timed
+
+from app.core.config import ADMIN_EMAIL, DATABASE_URL
+from app.db.gen.queries import global_notifications, users
+from app.db.gen.queries.models import Role
+from app.db.native import native_querier
+
+
+async def collect(result: Any) -> Any:
+    if hasattr(result, "__aiter__"):
+        return [row async for row in result]
+    return await result
+
+
+def get_calls(user: users.GetUserByEmailRow) -> dict[str, Callable[[AsyncConnection, bool], Awaitable[Any]]]:
+    def querier(querier_cls, conn, native):
+        return native_querier(querier_cls)(conn) if native else querier_cls(conn)
+
+    feed_params = global_notifications.GetGlobalNotificationsFeedParams(
+        roles=list(Role), cursor_timestamp=datetime.max, cursor_id=2**31 - 1, page_chunk_size=50
+    )
+    return {
+        "get_auth_user_by_username": lambda conn, native: collect(
+            querier(users.AsyncQuerier, conn, native).get_auth_user_by_username(username=user.username)
+        ),
+        "get_user_by_email": lambda conn, native: collect(
+            querier(users.AsyncQuerier, conn, native).get_user_by_email(email=user.email)
+        ),
+        "check_has_new_notifications": lambda conn, native: collect(
+            querier(users.AsyncQuerier, conn, native).check_has_new_notifications(user_ids=[user.user_id])
+        ),
+        "get_global_notifications_feed (50)": lambda conn, native: collect(
+            querier(global_notifications.AsyncQuerier, conn, native).get_global_notifications_feed(arg=feed_params)
+        ),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            user = await users.AsyncQuerier(conn).get_user_by_email(email=args.email)
+            if not user:
+                raise SystemExit(f"User {args.email} not found")
+            for name, call in get_calls(user).items():
+                for native in (False, True):
+                    await call(conn, native)  # warm up statement caches
+                    samples: list[float] = []
+                    for _ in range(args.iterations):
+                        with timed(samples):
+                            await call(conn, native)
+                    report(f"{name} ({'native' if native else 'sqlalchemy'})", samples, unit="us", scale=1e6)
+            await conn.rollback()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--iterations", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""
+Open many notification streams against a running backend and check that
+regular REST endpoints keep responding while they are open.
+
+    python scripts/benchmarks/streams_load.py --base-url https://myapp.dev.localhost/api/v1 --streams 1000
+"""
+import argparse
+import asyncio
+
+import httpx
+from utils import report, timed
+
+from app.core.config import ADMIN_EMAIL, ADMIN_PASSWORD
+
+
+async def login(client: httpx.AsyncClient, *, email: str, password: str) -> str:
+    res = await client.post("/users/login/token/", data={"username": email, "password": password})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+
+async def open_stream(client: httpx.AsyncClient, opened: asyncio.Semaphore, errors: list[str]) -> None:
+    try:
+        async with client.stream("GET", "/stream/notifications/") as response:
+            if response.status_code != 200:
+                errors.append(str(response.status_code))
+                return
+            first = True
+            async for _ in response.aiter_text():
+                if first:
+                    opened.release()
+                    first = False
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        errors.append(e.__class__.__name__)
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.streams + args.concurrency, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=args.base_url, verify=False, limits=limits, timeout=None) as client:
+        token = await login(client, email=args.email, password=args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        opened = asyncio.Semaphore(0)
+        stream_errors: list[str] = []
+        streams = [asyncio.create_task(open_stream(client, opened, stream_errors)) for _ in range(args.streams)]
+        open_durations: list[float] = []
+        with timed(open_durations):
+            for _ in range(args.streams):
+                await asyncio.wait_for(opened.acquire(), timeout=args.timeout)
+        print(f"{args.streams} streams open after {open_durations[0]:.2f}s ({len(stream_errors)} errors)")
+
+        latencies: dict[str, list[float]] = {path: [] for path in args.paths}
+        statuses: dict[int, int] = {}
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def request(path: str) -> None:
+            async with sem:
+                with timed(latencies[path]):
+                    res = await client.get(path)
+                statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+
+        await asyncio.gather(*(request(path) for _ in range(args.requests) for path in args.paths))
+        for path, samples in latencies.items():
+            report(f"GET {path}", samples)
+        print(f"status codes: {statuses}")
+        alive = sum(not stream.done() for stream in streams)
+        print(f"streams still open: {alive}/{args.streams}")
+
+        for stream in streams:
+            stream.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="https://myapp.dev.localhost/api/v1")
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--password", default=ADMIN_PASSWORD)
+    parser.add_argument("--streams", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per path")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for each stream to open")
+    parser.add_argument("--paths", nargs="+", default=["/users/me/", "/admin/users/", "/users/global-notifications/"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+"""
+Compare the former catch-all GetUser query against the dedicated user lookups, with both
+custom and generic (cached) plans. Seeds ``--users`` users on first run; pass ``--cleanup``
+to delete them afterwards.
+
+    python scripts/benchmarks/user_lookups.py --users 1000000 --iterations 2000
+"""
+import argparse
+import asyncio
+import random
+from functools import partial
+from typing import Any, Callable
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from utils import report, timed
+
+from app.core.config import DATABASE_URL
+from app.db.gen.queries.users import (
+    GET_AUTH_USER_BY_USERNAME,
+    GET_USER_BY_EMAIL,
+    GET_USER_BY_ID,
+    GET_USER_BY_USERNAME,
+)
+
+LEGACY_GET_USER = """
+select
+  username, email, role, is_verified, is_active, is_superuser, last_global_notification_at,
+  last_personal_notification_at, created_at, updated_at, full_name, phone_number, bio, image,
+  COALESCE(case when :get_db_data\\:\\:boolean then (user_id) end, -1)\\:\\:int as user_id,
+  case when :get_db_data\\:\\:boolean then (salt) end as salt,
+  case when :get_db_data\\:\\:boolean then (password) end as password
+from
+  users
+  left join profiles using (user_id)
+where (email = LOWER(:email)\\:\\:text or :email\\:\\:text is null)
+and (username = :username\\:\\:text or :username\\:\\:text is null)
+and (users.user_id = :user_id\\:\\:int or :user_id\\:\\:int is null)
+limit 1
+"""
+
+BENCH_USER_PREFIX = "bench_user_"
+
+
+async def seed_users(conn: AsyncConnection, count: int) -> None:
+    existing = (
+        await conn.execute(
+            sqlalchemy.text("select count(*) from users where username like :prefix"),
+            {"prefix": f"{BENCH_USER_PREFIX}%"},
+        )
+    ).scalar()
+    if existing >= count:
+        return
+    print(f"seeding {count - existing} users")
+    await conn.execute(
+        sqlalchemy.text(
+            """
+            insert into users (username, email, role, is_verified, salt, password)
+            select :prefix || i, :prefix || i || '@myapp.com', 'user', true, 'salt', 'password'
+            from generate_series(:start\\:\\:int, :stop\\:\\:int) i
+            """
+        ),
+        {"prefix": BENCH_USER_PREFIX, "start": existing + 1, "stop": count},
+    )
+    await conn.execute(
+        sqlalchemy.text(
+            """
+            insert into profiles (user_id)
+            select user_id from users
+            where username like :prefix and not exists (select 1 from profiles where profiles.user_id = users.user_id)
+            """
+        ),
+        {"prefix": f"{BENCH_USER_PREFIX}%"},
+    )
+    await conn.commit()
+    await conn.execute(sqlalchemy.text("analyze users, profiles"))
+    await conn.commit()
+
+
+LOOKUPS = (
+    ("by email", "email", GET_USER_BY_EMAIL),
+    ("by username", "username", GET_USER_BY_USERNAME),
+    ("by id", "user_id", GET_USER_BY_ID),
+    ("auth by username", "username", GET_AUTH_USER_BY_USERNAME),
+)
+
+
+async def bench(
+    conn: AsyncConnection,
+    name: str,
+    query: str,
+    make_params: Callable[[dict[str, Any]], dict[str, Any]],
+    users: list[dict[str, Any]],
+    iterations: int,
+) -> None:
+    samples: list[float] = []
+    statement = sqlalchemy.text(query)
+    for _ in range(iterations):
+        params = make_params(random.choice(users))
+        with timed(samples):
+            (await conn.execute(statement, params)).first()
+    report(name, samples)
+
+
+def legacy_params(lookup: str, user: dict[str, Any]) -> dict[str, Any]:
+    return {"get_db_data": True, "email": None, "username": None, "user_id": None, lookup: user[lookup]}
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            users = [
+                dict(row._mapping)
+                for row in await conn.execute(
+                    sqlalchemy.text(
+                        "select user_id, username, email from users where username like :prefix limit 10000"
+                    ),
+                    {"prefix": f"{BENCH_USER_PREFIX}%"},
+                )
+            ]
+            # prepared statements switch to a generic plan after a few executions when it looks cheap enough
+            for plan_cache_mode in ("force_custom_plan", "force_generic_plan"):
+                await conn.execute(sqlalchemy.text(f"set plan_cache_mode = {plan_cache_mode}"))
+                print(f"-- {plan_cache_mode}")
+                for name, lookup, query in LOOKUPS:
+                    await bench(
+                        conn,
+                        f"GetUser {name}",
+                        LEGACY_GET_USER,
+                        partial(legacy_params, lookup),
+                        users,
+                        args.iterations,
+                    )
+                    await bench(
+                        conn,
+                        f"dedicated {name}",
+                        query,
+                        lambda user: {"p1": user[lookup]},
+                        users,
+                        args.iterations,
+                    )
+            await conn.rollback()
+
+            if args.cleanup:
+                await conn.execute(
+                    sqlalchemy.text("delete from users where username like :prefix"),
+                    {"prefix": f"{BENCH_USER_PREFIX}%"},
+                )
+                await conn.commit()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--cleanup", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,43 @@
+import pathlib
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# allow running benchmarks from anywhere, e.g. python scripts/benchmarks/<benchmark>.py
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name: str, samples: list[float], *, unit: str = "ms", scale: float = 1000) -> None:
+    """
+    Print a single summary line for the given samples, in seconds.
+    """
+    if not samples:
+        print(f"{name:<40} no samples")
+        return
+    print(
+        f"{name:<40} n={len(samples):<7} "
+        f"mean={statistics.mean(samples) * scale:9.3f}{unit} "
+        f"p50={percentile(samples, 50) * scale:9.3f}{unit} "
+        f"p95={percentile(samples, 95) * scale:9.3f}{unit} "
+        f"p99={percentile(samples, 99) * scale:9.3f}{unit} "
+        f"max={max(samples) * scale:9.3f}{unit}"
+    )
+
+
+@contextmanager
+def timed(samples: list[float]) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
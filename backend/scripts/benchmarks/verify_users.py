@@ -0,0 +1,91 @@
+"""
+Verify ``--users`` users by email one statement per email, as done before VerifyUsersByEmails, against
+a single set based statement and the batches streamed by ``admin:verify-users-by-email-bulk``.
+Seeds ``--users`` users on first run. Every run is rolled back.
+
+    python scripts/benchmarks/verify_users.py --users 10000 --iterations 5
+"""
+import argparse
+import asyncio
+from typing import Awaitable, Callable
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from user_lookups import BENCH_USER_PREFIX, seed_users
+from utils import report, timed
+
+from app.core.config import DATABASE_URL
+from app.db.gen.queries import users
+from app.services.users import UsersService
+
+LEGACY_VERIFY_USER_BY_EMAIL = """
+update
+  users
+set
+  is_verified = 'true'
+where
+  email = LOWER(:p1)
+returning
+  email
+"""
+
+
+async def verify_one_by_one(conn: AsyncConnection, emails: list[str]) -> int:
+    statement = sqlalchemy.text(LEGACY_VERIFY_USER_BY_EMAIL)
+    verified = [(await conn.execute(statement, {"p1": email})).scalar() for email in emails]
+    return sum(email is not None for email in verified)
+
+
+async def verify_in_one_statement(conn: AsyncConnection, emails: list[str]) -> int:
+    return len([email async for email in users.AsyncQuerier(conn).verify_users_by_emails(emails=emails)])
+
+
+async def verify_in_batches(conn: AsyncConnection, emails: list[str]) -> int:
+    return sum([result.verified async for result in UsersService(conn).stream_verify_users(user_emails=emails)])
+
+
+STRATEGIES: dict[str, Callable[[AsyncConnection, list[str]], Awaitable[int]]] = {
+    "one statement per email": verify_one_by_one,
+    "VerifyUsersByEmails": verify_in_one_statement,
+    "streamed batches": verify_in_batches,
+}
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.database_url)
+    try:
+        async with engine.connect() as conn:
+            await seed_users(conn, args.users)
+            emails = [
+                email
+                for email, in await conn.execute(
+                    sqlalchemy.text(
+                        "select email from users where username like :prefix order by user_id limit :limit"
+                    ),
+                    {"prefix": f"{BENCH_USER_PREFIX}%", "limit": args.users},
+                )
+            ]
+            await conn.rollback()
+
+            for name, verify in STRATEGIES.items():
+                samples: list[float] = []
+                for _ in range(args.iterations):
+                    await conn.execute(
+                        sqlalchemy.text("update users set is_verified = false where email = any (:emails)"),
+                        {"emails": emails},
+                    )
+                    with timed(samples):
+                        verified = await verify(conn, emails)
+                    await conn.rollback()
+                    assert verified == len(emails)
+                report(f"{name} ({len(emails)})", samples)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=str(DATABASE_URL))
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import AsyncGenerator, Callable, Dict, Generator
 
@@ -7,19 +8,27 @@ import pyfakefs.fake_filesystem
 import pytest
 import pytest_asyncio
 from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from alembic.script import ScriptDirectory
 from asgi_lifespan import LifespanManager
 from fakeredis import FakeStrictRedis
+from fakeredis.aioredis import FakeRedis
 from fastapi import FastAPI, Request
 from httpx import AsyncClient
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from app.api.dependencies.database import get_async_conn, get_new_async_conn
+from app.api.dependencies.stream import get_notifications_checker
+from app.core.cache import response_cache
+from app.core.redis import RedisPool
 from app.db.gen.queries.models import Role
 from app.db.gen.queries.users import RegisterNewUserRow
 from app.models.user import RoleUpdate, UserCreate
 from app.services import auth_service
 from app.services.users import UsersService
+from app.stream.checker import NotificationsChecker
 
 os.environ["TESTING"] = "1"
 
@@ -42,6 +51,17 @@ def redis(monkeypatch):
     return fake_redis
 
 
+@pytest.fixture(autouse=True)
+def response_cache_redis(monkeypatch) -> FakeRedis:
+    fake_redis = FakeRedis()
+    redis_pool = RedisPool("redis://", max_connections=1)
+    redis_pool.use(aio=fake_redis)
+    monkeypatch.setattr(response_cache, "redis_pool", redis_pool)
+    monkeypatch.setattr(auth_service, "redis_pool", redis_pool)
+    response_cache.local.clear()
+    return fake_redis
+
+
 @pytest.fixture(scope="session")
 def celery_enable_logging():
     return True
@@ -132,6 +152,27 @@ async def get_async_conn_test(request: Request) -> AsyncGenerator[AsyncConnectio
     yield request.app.state._conn
 
 
+def get_notifications_checker_test(request: Request) -> NotificationsChecker:
+    @asynccontextmanager
+    async def connect() -> AsyncGenerator[AsyncConnection, None]:
+        yield request.app.state._conn
+
+    return NotificationsChecker(connect)
+
+
+async def run_migration(conn: AsyncConnection, *, revision: str, direction: str) -> None:
+    """
+    Run a single revision on ``conn``, so that it is rolled back along with the test.
+    """
+    module = ScriptDirectory.from_config(Config("alembic.ini")).get_revision(revision).module
+
+    def migrate(sync_conn) -> None:
+        with Operations.context(MigrationContext.configure(sync_conn)):
+            getattr(module, direction)()
+
+    await conn.run_sync(migrate)
+
+
 @pytest_asyncio.fixture(scope="function")
 async def new_conn(app: FastAPI) -> AsyncGenerator[AsyncConnection, None]:
     async with app.state._engine.connect() as conn:
@@ -155,6 +196,7 @@ def app(apply_migrations) -> Generator[FastAPI, None, None]:
     # NOT commit'ing and rollback'ing in the exception handler is a must for tests
     app.dependency_overrides[get_async_conn] = get_async_conn_test
     app.dependency_overrides[get_new_async_conn] = get_async_conn_test
+    app.dependency_overrides[get_notifications_checker] = get_notifications_checker_test
 
     yield app
 
@@ -259,13 +301,12 @@ async def user_fixture_helper(
     *,
     new_conn: AsyncConnection,
     new_user: UserCreate,
-    get_db_data: bool = True,
     admin: bool = False,
     verified: bool = False,
 ):
     users_service = UsersService(new_conn)
 
-    existing_user = await users_service.get_user_by_email(email=new_user.email, get_db_data=get_db_data)
+    existing_user = await users_service.get_user_by_email(email=new_user.email)
     if existing_user:
         return existing_user
 
@@ -275,7 +316,7 @@ async def user_fixture_helper(
     if admin:
         await users_service.update_user_role(RoleUpdate(email=user.email, role=Role.ADMIN))
     await new_conn.commit()  # not using routes -> commit manually
-    return await users_service.get_user_by_email(email=new_user.email, get_db_data=get_db_data)
+    return await users_service.get_user_by_email(email=new_user.email)
 
 
 ###############################################################################
@@ -343,27 +384,27 @@ TEST_USERS: Dict[str, UserCreate] = {
 @pytest_asyncio.fixture
 async def test_user_db(new_conn: AsyncConnection):
     new_user = TEST_USERS["test_user_db"]
-    return await user_fixture_helper(new_conn=new_conn, new_user=new_user, get_db_data=True)
+    return await user_fixture_helper(new_conn=new_conn, new_user=new_user)
 
 
 @pytest_asyncio.fixture
 async def test_admin_user(new_conn: AsyncConnection):
     new_user = TEST_USERS["test_admin_user"]
-    return await user_fixture_helper(new_conn=new_conn, new_user=new_user, verified=True, admin=True, get_db_data=True)
+    return await user_fixture_helper(new_conn=new_conn, new_user=new_user, verified=True, admin=True)
 
 
 @pytest_asyncio.fixture
 async def test_unverified_user(new_conn: AsyncConnection):
     new_user = TEST_USERS["test_unverified_user"]
 
-    return await user_fixture_helper(new_conn=new_conn, new_user=new_user, get_db_data=True)
+    return await user_fixture_helper(new_conn=new_conn, new_user=new_user)
 
 
 @pytest_asyncio.fixture
 async def test_unverified_user2(new_conn: AsyncConnection):
     new_user = TEST_USERS["test_unverified_user2"]
 
-    return await user_fixture_helper(new_conn=new_conn, new_user=new_user, get_db_data=True)
+    return await user_fixture_helper(new_conn=new_conn, new_user=new_user)
 
 
 @pytest_asyncio.fixture
@@ -5,13 +5,20 @@ from datetime import datetime, timedelta
 from typing import Callable, Dict, Set, cast
 
 import pytest
+from fakeredis import FakeStrictRedis
 from fastapi import FastAPI, status
 from httpx import AsyncClient, Response
 from loguru import logger
 from sqlalchemy import text
 
 from app.api.routes.admin import router as admin_router
-from app.db.gen.queries import models
+from app.api.routes.utils.streaming import (
+    JSON_ARRAY_CHUNK_SIZE,
+    StreamAbortedError,
+)
+from app.celery import tasks
+from app.celery.locking import get_task_progress
+from app.core import config
 from app.db.gen.queries.global_notifications import (
     CreateGlobalNotificationParams,
 )
@@ -21,8 +28,18 @@ from app.db.gen.queries.password_reset_requests import (
 )
 from app.db.gen.queries.personal_notifications import (
     CreatePersonalNotificationParams,
+    CreatePersonalNotificationsParams,
+)
+from app.db.gen.queries.users import (
+    GetUserByEmailRow,
+    ListAllUsersRow,
+    RegisterNewUserRow,
+    SearchUsersRow,
+)
+from app.models.global_notifications import (
+    NotificationRecipients,
+    PersonalNotificationFanOut,
 )
-from app.db.gen.queries.users import GetUserRow, RegisterNewUserRow
 from app.models.user import RoleUpdate
 from app.services.global_notifications import GlobalNotificationsService
 from app.services.personal_notifications import PersonalNotificationsService
@@ -95,10 +112,104 @@ class TestAdminUserlistAccess:
         res = await superuser_client.get(
             app.url_path_for("admin:list-users"),
         )
-        users = [models.User(**user) for user in res.json()]
+        users = [ListAllUsersRow(**user) for user in res.json()]
         assert res.status_code == status.HTTP_200_OK
         assert len(res.json()) == 2
         assert test_user.user_id in [user.user_id for user in users]
+        assert all("salt" not in user and "password" not in user for user in res.json())
+
+        await app.state._conn.rollback()
+
+    async def test_admin_can_page_through_users(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_user: RegisterNewUserRow,
+        test_unverified_user: RegisterNewUserRow,
+    ) -> None:
+        res = await superuser_client.get(app.url_path_for("admin:list-users"))
+        all_user_ids = [user["user_id"] for user in res.json()]
+        assert all_user_ids == sorted(all_user_ids)
+
+        user_ids = []
+        after_user_id = 0
+        while True:
+            res = await superuser_client.get(
+                app.url_path_for("admin:list-users"),
+                params={"after_user_id": after_user_id, "page_size": 2},
+            )
+            assert res.status_code == status.HTTP_200_OK
+            page = res.json()
+            if not page:
+                break
+            assert len(page) <= 2
+            user_ids.extend(user["user_id"] for user in page)
+            after_user_id = page[-1]["user_id"]
+        assert user_ids == all_user_ids
+
+        await app.state._conn.rollback()
+
+    async def test_user_listing_errors_before_streaming_are_reported(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def stream_users(*args, **kwargs):
+            raise RuntimeError("query failed")
+            yield
+
+        monkeypatch.setattr(UsersService, "stream_users", stream_users)
+        res = await superuser_client.get(app.url_path_for("admin:list-users"))
+        assert res.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        await app.state._conn.rollback()
+
+    async def test_user_listing_errors_while_streaming_abort_the_response(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def stream_users(*args, **kwargs):
+            for user_id in range(JSON_ARRAY_CHUNK_SIZE + 1):
+                yield {"user_id": user_id}
+            raise RuntimeError("connection lost")
+
+        monkeypatch.setattr(UsersService, "stream_users", stream_users)
+        # the status has already been sent, so the array is left unterminated instead
+        with pytest.raises(StreamAbortedError):
+            await superuser_client.get(app.url_path_for("admin:list-users"))
+
+        await app.state._conn.rollback()
+
+    async def test_admin_can_search_users(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_user: RegisterNewUserRow,
+        test_user2: RegisterNewUserRow,
+        test_unverified_user: RegisterNewUserRow,
+    ) -> None:
+        res = await superuser_client.get(app.url_path_for("admin:search-users"), params={"q": test_user.username})
+        assert res.status_code == status.HTTP_200_OK
+        all_users = [SearchUsersRow(**user) for user in res.json()]
+        assert all_users[0].user_id == test_user.user_id
+        assert all(a.rank >= b.rank for a, b in zip(all_users, all_users[1:]))
+        assert all("salt" not in user and "password" not in user for user in res.json())
+
+        user_ids = []
+        params = {"q": test_user.username, "page_size": 2}
+        while True:
+            res = await superuser_client.get(app.url_path_for("admin:search-users"), params=params)
+            assert res.status_code == status.HTTP_200_OK
+            page = res.json()
+            if not page:
+                break
+            assert len(page) <= 2
+            user_ids.extend(user["user_id"] for user in page)
+            params.update(after_rank=page[-1]["rank"], after_user_id=page[-1]["user_id"])
+        assert user_ids == [user.user_id for user in all_users]
 
         await app.state._conn.rollback()
 
@@ -114,7 +225,7 @@ class TestAdminUserModification:
         test_admin_user: RegisterNewUserRow,
     ) -> None:
         res = await superuser_client.get(app.url_path_for("admin:list-unverified-users"))
-        unverified_user_emails = [models.User(**user).email for user in res.json()]
+        unverified_user_emails = [ListAllUsersRow(**user).email for user in res.json()]
         assert res.status_code == status.HTTP_200_OK
         assert len(unverified_user_emails) == 2  # number of unverified fixtures used
 
@@ -130,6 +241,47 @@ class TestAdminUserModification:
 
         await app.state._conn.rollback()
 
+    async def test_admin_verification_reports_unknown_emails(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_unverified_user: RegisterNewUserRow,
+    ) -> None:
+        res = await superuser_client.post(
+            app.url_path_for("admin:verify-users-by-email"),
+            json={"user_emails": [test_unverified_user.email.upper(), "unknown@myapp.com"]},
+        )
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert "unknown@myapp.com" in res.json()["detail"]
+        assert test_unverified_user.email.upper() not in res.json()["detail"]
+
+        await app.state._conn.rollback()
+
+    async def test_admin_can_verify_users_in_bulk(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_unverified_user: RegisterNewUserRow,
+        test_unverified_user2: RegisterNewUserRow,
+    ) -> None:
+        user_emails = [test_unverified_user.email, "unknown@myapp.com", test_unverified_user2.email.upper()]
+        res = await superuser_client.post(
+            app.url_path_for("admin:verify-users-by-email-bulk"),
+            json={"user_emails": user_emails},
+        )
+        assert res.status_code == status.HTTP_200_OK
+        assert res.json() == [
+            {"email": test_unverified_user.email, "verified": True},
+            {"email": "unknown@myapp.com", "verified": False},
+            {"email": test_unverified_user2.email.upper(), "verified": True},
+        ]
+
+        res = await superuser_client.get(app.url_path_for("admin:list-unverified-users"))
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.json()) == 0
+
+        await app.state._conn.rollback()
+
     async def test_admin_has_access_to_password_reset_requests(
         self,
         app: FastAPI,
@@ -241,7 +393,7 @@ class TestAdminUserModification:
         assert res.status_code == status.HTTP_200_OK
 
         updated_user = await users_service.get_user_by_email(email=role_update.email)
-        assert cast(GetUserRow, updated_user).role == "manager"
+        assert cast(GetUserByEmailRow, updated_user).role == "manager"
 
         await app.state._conn.rollback()
 
@@ -469,6 +621,42 @@ class TestAdminGlobalNotifications:
 
         await app.state._conn.rollback()
 
+    async def test_admin_can_create_global_notifications_in_bulk(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_admin_user: RegisterNewUserRow,
+    ) -> None:
+        query = "SELECT COUNT(*) FROM global_notifications"
+        n_notifications = (await app.state._conn.execute(text(query))).scalar()
+        notifications = [
+            CreateGlobalNotificationParams(
+                sender=test_admin_user.email if i % 2 else None,
+                receiver_role=list(Role)[i % len(Role)],
+                title=f"Bulk notification {i}",
+                body=f"This is bulk notification {i}",
+                label="bulk",
+                link=None,
+            )
+            for i in range(25)
+        ]
+        res = await superuser_client.post(
+            app.url_path_for("admin:create-global-notifications-bulk"),
+            json={"notifications": [notification.dict() for notification in notifications]},
+        )
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json()["created"] == len(notifications)
+        assert res.json()["rows_per_second"] > 0
+
+        assert (await app.state._conn.execute(text(query))).scalar() == n_notifications + len(notifications)
+        query = "SELECT sender, receiver_role, title FROM global_notifications WHERE label = 'bulk' ORDER BY title"
+        created = (await app.state._conn.execute(text(query))).all()
+        assert sorted((n.sender, n.receiver_role, n.title) for n in notifications) == sorted(
+            (sender, Role(receiver_role), title) for sender, receiver_role, title in created
+        )
+
+        await app.state._conn.rollback()
+
 
 class TestAdminPersonalNotifications:
     _n_notifications = 11
@@ -696,3 +884,112 @@ class TestAdminPersonalNotifications:
         assert len(id_set) == total_feed_items_to_fetch
 
         await app.state._conn.rollback()
+
+    async def test_admin_can_notify_users_in_bulk(
+        self,
+        app: FastAPI,
+        superuser_client: AsyncClient,
+        test_admin_user: RegisterNewUserRow,
+        test_user: RegisterNewUserRow,
+        test_unverified_user: RegisterNewUserRow,
+    ) -> None:
+        notifications = CreatePersonalNotificationsParams(
+            sender=test_admin_user.email,
+            receiver_emails=[test_user.email.upper(), test_unverified_user.email, "unknown@myapp.com", test_user.email],
+            title="Bulk notification",
+            body="This is a bulk notification",
+            label="bulk",
+            link=None,
+        )
+        res = await superuser_client.post(
+            app.url_path_for("admin:create-personal-notifications-bulk"),
+            json={"notifications": notifications.dict()},
+        )
+        assert res.status_code == status.HTTP_201_CREATED
+        assert res.json()["created"] == 2
+        assert res.json()["missing_receivers"] == ["unknown@myapp.com"]
+
+        query = "SELECT receiver_email FROM personal_notifications WHERE label = 'bulk' ORDER BY receiver_email"
+        receivers = (await app.state._conn.execute(text(query))).scalars().all()
+        assert receivers == sorted([test_user.email, test_unverified_user.email])
+
+        await app.state._conn.rollback()
+
+    async def test_fan_out_delivers_every_chunk_once(
+        self,
+        app: FastAPI,
+        monkeypatch: pytest.MonkeyPatch,
+        redis: FakeStrictRedis,
+        test_admin_user: RegisterNewUserRow,
+        test_user: RegisterNewUserRow,
+        test_unverified_user: RegisterNewUserRow,
+    ) -> None:
+        monkeypatch.setattr("app.celery.locking.rds", redis)
+        fan_out = PersonalNotificationFanOut(
+            sender=test_admin_user.email,
+            title="Fan-out notification",
+            body="This is a fan-out notification",
+            label="fan-out",
+            link=None,
+            recipients=NotificationRecipients(
+                emails=[test_admin_user.email, test_user.email.upper(), test_unverified_user.email]
+            ),
+        )
+        chunks: list[Dict] = []
+
+        async def deliver(**kwargs) -> None:
+            chunks.append(kwargs)
+            await tasks.deliver_personal_notification_chunk(
+                fan_out_id=kwargs["fan_out_id"],
+                chunk=kwargs["chunk"],
+                notifications=CreatePersonalNotificationsParams(
+                    **kwargs["notifications"], receiver_emails=kwargs["receiver_emails"]
+                ),
+                conn=app.state._conn,
+            )
+
+        await tasks.fan_out_personal_notification(
+            fan_out_id="fan-out-test", fan_out=fan_out, conn=app.state._conn, dispatch=deliver, chunk_size=2
+        )
+        assert [len(chunk["receiver_emails"]) for chunk in chunks] == [2, 1]
+        assert get_task_progress("fan-out-test") == {"done": 2, "total": 2, "delivered": 3}
+
+        # a retried chunk is not delivered again
+        await deliver(**chunks[0])
+        assert get_task_progress("fan-out-test") == {"done": 2, "total": 2, "delivered": 3}
+
+        query = "SELECT receiver_email FROM personal_notifications WHERE label = 'fan-out' ORDER BY receiver_email"
+        receivers = (await app.state._conn.execute(text(query))).scalars().all()
+        assert receivers == sorted([test_admin_user.email, test_user.email, test_unverified_user.email])
+
+        await app.state._conn.rollback()
+
+    async def test_fan_out_chunk_claims_are_pruned_past_retention(
+        self,
+        app: FastAPI,
+        test_user: RegisterNewUserRow,
+    ) -> None:
+        conn = app.state._conn
+        pn_service = PersonalNotificationsService(conn)
+        notifications = CreatePersonalNotificationsParams(
+            sender=None, title="title", body="body", label="fan-out", link=None, receiver_emails=[test_user.email]
+        )
+        for fan_out_id in ("expired-fan-out", "recent-fan-out"):
+            await pn_service.deliver_fan_out_chunk(fan_out_id=fan_out_id, chunk=0, notifications=notifications)
+        retention = timedelta(hours=config.PERSONAL_NOTIFICATION_FAN_OUT_CLAIMS_RETENTION_HOURS)
+        await conn.execute(
+            text(
+                """
+                UPDATE personal_notification_fan_out_chunks SET created_at = :created_at
+                WHERE fan_out_id = 'expired-fan-out'
+                """
+            ),
+            {"created_at": datetime.utcnow() - retention - timedelta(hours=1)},
+        )
+
+        await tasks.manage_personal_notifications_partitions(conn=conn)
+
+        query = "SELECT fan_out_id FROM personal_notification_fan_out_chunks ORDER BY fan_out_id"
+        assert (await conn.execute(text(query))).scalars().all() == ["recent-fan-out"]
+
+        await conn.rollback()
@@ -0,0 +1,80 @@
+import asyncio
+
+from fakeredis import FakeStrictRedis
+
+from app.celery import tasks
+from app.celery.models import TaskResult
+from app.celery.utils import async_to_sync, close_worker_loop, init_worker_loop
+from app.core import config
+from app.core.redis import RedisPool
+
+
+@async_to_sync
+async def get_running_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+class TestWorkerLoop:
+    def test_tasks_share_the_worker_process_loop(self) -> None:
+        loop = init_worker_loop()
+        try:
+            assert get_running_loop() is loop
+            assert get_running_loop() is loop
+        finally:
+            close_worker_loop()
+        assert loop.is_closed()
+
+    def test_tasks_run_on_a_new_loop_without_worker_process_loop(self) -> None:
+        first, second = get_running_loop(), get_running_loop()
+        assert first is not second
+        assert first.is_closed()
+
+
+class TestWorkerProcess:
+    def test_redis_pools_are_opened_and_closed_with_the_worker_process(self, monkeypatch) -> None:
+        pools = [RedisPool("redis://", max_connections=1) for _ in range(2)]
+        monkeypatch.setattr(tasks, "redis_pool", pools[0])
+        monkeypatch.setattr(tasks, "cache_redis_pool", pools[1])
+        monkeypatch.setattr(tasks, "engine", tasks.engine)
+
+        tasks.init_worker_process()
+        assert all(pool._async is not None for pool in pools)
+        tasks.shutdown_worker_process()
+        assert all(pool._async is None for pool in pools)
+
+
+class TestFanOutChunkRetries:
+    def test_failed_chunks_are_retried_and_delivered_once(self, monkeypatch) -> None:
+        monkeypatch.setattr("celery_once.backends.redis.Redis.redis", FakeStrictRedis())
+        attempts: list[int] = []
+        delivered: set[tuple[str, int]] = set()
+
+        async def deliver_personal_notification_chunk(*, fan_out_id: str, chunk: int, notifications, conn=None):
+            attempts.append(chunk)
+            if len(attempts) == 1:
+                # a failed delivery rolls back its claim along with the notifications
+                raise ConnectionError("connection lost")
+            if (fan_out_id, chunk) in delivered:
+                return TaskResult(message=f"Chunk {chunk} was already delivered.").json()
+            delivered.add((fan_out_id, chunk))
+            return TaskResult(message="Delivered 1 notifications.").json()
+
+        monkeypatch.setattr(tasks, "deliver_personal_notification_chunk", deliver_personal_notification_chunk)
+
+        result = tasks.deliver_personal_notification_chunk_task.apply(
+            kwargs=dict(
+                fan_out_id="fan-out-test",
+                chunk=0,
+                notifications=dict(sender=None, title="title", body="body", label="label", link=None),
+                receiver_emails=["user@myapp.com"],
+            )
+        )
+        assert result.successful()
+        assert attempts == [0, 0]
+        assert delivered == {("fan-out-test", 0)}
+
+    def test_chunks_stop_being_retried_before_their_claims_expire(self) -> None:
+        task = tasks.deliver_personal_notification_chunk_task
+        assert task.max_retries == tasks.FAN_OUT_CHUNK_MAX_RETRIES
+        retry_window = task.max_retries * task.retry_backoff_max
+        assert retry_window < config.PERSONAL_NOTIFICATION_FAN_OUT_CLAIMS_RETENTION_HOURS * 60 * 60
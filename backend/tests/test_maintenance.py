@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.core import config
+from app.db.gen.queries.personal_notifications import (
+    CreatePersonalNotificationParams,
+)
+from app.db.gen.queries.users import GetUserByEmailRow
+from app.services.maintenance import (
+    MaintenanceService,
+    add_months,
+    personal_notifications_partition,
+)
+from app.services.personal_notifications import PersonalNotificationsService
+from tests.conftest import run_migration
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestPersonalNotificationsPartitions:
+    async def test_partitions_are_created_ahead_and_expire_past_retention(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn = app.state._conn
+        service = MaintenanceService(conn)
+        current_month = datetime.utcnow().date().replace(day=1)
+        months_ahead = config.PERSONAL_NOTIFICATIONS_PARTITIONS_AHEAD
+        partitions = await service.list_personal_notifications_partitions()
+        assert add_months(current_month, months_ahead) in partitions
+
+        oldest_month = min(partitions)
+        await conn.execute(
+            sqlalchemy.text(
+                """
+                insert into personal_notifications (receiver_email, title, body, label, created_at, updated_at)
+                values (:receiver_email, 'title', 'body', 'label', :created_at, :created_at)
+                """
+            ),
+            {"receiver_email": test_user.email, "created_at": datetime(oldest_month.year, oldest_month.month, 2)},
+        )
+
+        maintained = await service.manage_personal_notifications_partitions(
+            months_ahead=months_ahead + 1, retention_months=1, drop_expired=True
+        )
+        assert maintained.created == [personal_notifications_partition(add_months(current_month, months_ahead + 1))]
+        assert personal_notifications_partition(oldest_month) in maintained.expired
+        assert min(await service.list_personal_notifications_partitions()) == add_months(current_month, -1)
+        assert not (
+            await conn.execute(
+                sqlalchemy.text("select count(*) from personal_notifications where created_at < :oldest_kept"),
+                {"oldest_kept": add_months(current_month, -1)},
+            )
+        ).scalar()
+
+        # nothing left to do
+        maintained = await service.manage_personal_notifications_partitions(
+            months_ahead=months_ahead + 1, retention_months=1, drop_expired=True
+        )
+        assert not maintained.created and not maintained.expired
+
+        await conn.rollback()
+
+    async def test_migration_keeps_notifications_and_their_ids(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn = app.state._conn
+        maintenance_service = MaintenanceService(conn)
+        personal_notifications_service = PersonalNotificationsService(conn)
+
+        async def create_personal_notification() -> int:
+            notification = await personal_notifications_service.create_personal_notification(
+                notification=CreatePersonalNotificationParams(
+                    sender=None,
+                    receiver_email=test_user.email,
+                    title="Test notification",
+                    body="Test body",
+                    label="Test label",
+                    link=None,
+                )
+            )
+            return notification.personal_notification_id
+
+        async def list_personal_notification_ids() -> list[int]:
+            return list(
+                (
+                    await conn.execute(
+                        sqlalchemy.text("select personal_notification_id from personal_notifications order by 1")
+                    )
+                ).scalars()
+            )
+
+        await create_personal_notification()
+        ids = await list_personal_notification_ids()
+
+        # back to the unpartitioned table, the index of the next revision being defined on the partitioned one
+        await run_migration(conn, revision="00000010", direction="downgrade")
+        await run_migration(conn, revision="00000009", direction="downgrade")
+        assert not await maintenance_service.list_personal_notifications_partitions()
+        assert await list_personal_notification_ids() == ids
+        ids.append(await create_personal_notification())
+        assert ids[-1] > ids[-2]
+
+        await run_migration(conn, revision="00000009", direction="upgrade")
+        await run_migration(conn, revision="00000010", direction="upgrade")
+        assert await maintenance_service.list_personal_notifications_partitions()
+        assert await list_personal_notification_ids() == ids
+        assert await create_personal_notification() > ids[-1]
+        # still owned by the id column, so that it is dropped along with the table
+        assert (
+            await conn.execute(
+                sqlalchemy.text("select pg_get_serial_sequence('personal_notifications', 'personal_notification_id')")
+            )
+        ).scalar()
+
+        await conn.rollback()
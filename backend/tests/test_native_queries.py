@@ -0,0 +1,185 @@
+from datetime import datetime
+from typing import Any, Callable
+
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.gen.queries import (
+    global_notifications,
+    password_reset_requests,
+    personal_notifications,
+    profiles,
+    users,
+)
+from app.db.gen.queries.models import Role
+from app.db.gen.queries.users import GetUserByEmailRow
+from app.db.native import _params_getter, native_querier, to_asyncpg_query
+from app.db.rows import Row, row_class
+from app.models import user as user_models
+from app.services.users import UsersService
+
+pytestmark = pytest.mark.asyncio
+
+QUERIERS = [
+    global_notifications.AsyncQuerier,
+    password_reset_requests.AsyncQuerier,
+    personal_notifications.AsyncQuerier,
+    profiles.AsyncQuerier,
+    users.AsyncQuerier,
+]
+
+
+async def collect(result: Any) -> Any:
+    if hasattr(result, "__aiter__"):
+        return [row async for row in result]
+    return await result
+
+
+def get_read_calls(user: GetUserByEmailRow) -> list[tuple[type, Callable]]:
+    return [
+        (users.AsyncQuerier, lambda q: q.get_user_by_email(email=user.email.upper())),
+        (users.AsyncQuerier, lambda q: q.get_auth_user_by_username(username=user.username)),
+        (users.AsyncQuerier, lambda q: q.get_user_by_id(user_id=user.user_id)),
+        (users.AsyncQuerier, lambda q: q.get_user_by_id(user_id=-1)),
+        (
+            users.AsyncQuerier,
+            lambda q: q.list_all_users(arg=users.ListAllUsersParams(is_verified=None, after_user_id=0, page_size=None)),
+        ),
+        (users.AsyncQuerier, lambda q: q.get_roles()),
+        (users.AsyncQuerier, lambda q: q.check_has_new_notifications(user_ids=[user.user_id])),
+        (users.AsyncQuerier, lambda q: q.get_unread_notification_counts(user_id=user.user_id)),
+        (global_notifications.AsyncQuerier, lambda q: q.get_global_notifications_latest_updated_at()),
+        (
+            global_notifications.AsyncQuerier,
+            lambda q: q.check_has_new_global_notifications(
+                arg=global_notifications.CheckHasNewGlobalNotificationsParams(roles=[Role.USER], user_id=user.user_id)
+            ),
+        ),
+        (
+            global_notifications.AsyncQuerier,
+            lambda q: q.get_global_notifications_feed(
+                arg=global_notifications.GetGlobalNotificationsFeedParams(
+                    roles=list(Role), cursor_timestamp=datetime.max, cursor_id=2**31 - 1, page_chunk_size=10
+                )
+            ),
+        ),
+        (profiles.AsyncQuerier, lambda q: q.get_profile_by_username(username=user.username)),
+    ]
+
+
+class TestNativeQuerier:
+    async def test_query_placeholders_are_converted(self) -> None:
+        assert to_asyncpg_query("select :p1\\:\\:role[], null\\:\\:int where a = :p12") == (
+            "select $1::role[], null::int where a = $12"
+        )
+
+    async def test_parameters_follow_the_generated_signatures(self) -> None:
+        get_params = _params_getter(users.AsyncQuerier.update_user_role, 2)
+        assert get_params((users.UpdateUserRoleParams(role=Role.MANAGER, user_id=1),), {}) == [Role.MANAGER, 1]
+        get_params = _params_getter(users.AsyncQuerier.get_user_by_id, 1)
+        assert get_params((), {"user_id": 1}) == [1]
+
+        with pytest.raises(ValueError):
+            _params_getter(users.AsyncQuerier.update_user_role, 3)
+
+    @pytest.mark.parametrize("querier", QUERIERS)
+    async def test_every_query_has_a_native_method(self, querier: type) -> None:
+        native = native_querier(querier)
+        assert issubclass(native, querier)
+        for name, method in vars(querier).items():
+            if not name.startswith("_"):
+                assert vars(native)[name] is not method
+
+    async def test_native_results_match_generated_querier(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        await native_querier(global_notifications.AsyncQuerier)(conn).create_global_notification(
+            arg=global_notifications.CreateGlobalNotificationParams(
+                sender=None, receiver_role=Role.USER, title="title", body="body", label="label", link=None
+            )
+        )
+
+        for querier, call in get_read_calls(test_user):
+            expected = await collect(call(querier(conn)))
+            assert await collect(call(native_querier(querier)(conn))) == expected
+            # prepared statements are reused
+            assert await collect(call(native_querier(querier)(conn))) == expected
+
+        await conn.rollback()
+
+    async def test_native_queries_run_in_the_connection_transaction(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        await native_querier(users.AsyncQuerier)(conn).update_user_role(
+            arg=users.UpdateUserRoleParams(role=Role.MANAGER, user_id=test_user.user_id)
+        )
+        updated_user = await users.AsyncQuerier(conn).get_user_by_id(user_id=test_user.user_id)
+        assert updated_user and updated_user.role == Role.MANAGER
+
+        await conn.rollback()
+        user = await native_querier(users.AsyncQuerier)(conn).get_user_by_id(user_id=test_user.user_id)
+        assert user and user.role == test_user.role
+
+        await conn.rollback()
+
+    async def test_services_can_opt_into_native_queries(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        assert type(UsersService(conn).users_querier) is users.AsyncQuerier
+
+        monkeypatch.setattr("app.services.base.NATIVE_QUERIES_SERVICES", ["UsersService"])
+        assert type(UsersService(conn).users_querier) is native_querier(users.AsyncQuerier)
+
+        await conn.rollback()
+
+
+class TestLightweightRows:
+    async def test_rows_have_the_fields_of_the_generated_row(self) -> None:
+        row = row_class(users.CheckHasNewNotificationsRow)
+        assert row.__name__ == "CheckHasNewNotificationsRow"
+        assert row._fields == tuple(users.CheckHasNewNotificationsRow.__fields__)
+
+        instance = row(*range(len(row._fields)))
+        assert instance.keys() == row._fields
+        assert list(instance) == list(zip(row._fields, range(len(row._fields))))
+        with pytest.raises(AttributeError):
+            instance.unknown_field = 1
+        with pytest.raises(KeyError):
+            instance["unknown_field"]
+
+    async def test_rows_are_validated_only_at_the_api_boundary(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        row = await native_querier(users.AsyncQuerier)(conn).get_user_by_id(user_id=test_user.user_id)
+        assert isinstance(row, Row)
+        assert not hasattr(row, "__dict__")
+        assert row == test_user
+        assert dict(row) == test_user.dict()
+        assert row.to_model() == test_user
+        assert row.copy(update={"role": Role.ADMIN}).role == Role.ADMIN
+
+        public_user = user_models.UserPublic.validate(row)
+        assert public_user.email == test_user.email
+        assert "password" not in jsonable_encoder(public_user)
+        assert jsonable_encoder(row) == jsonable_encoder(test_user)
+
+        await conn.rollback()
@@ -1,10 +1,18 @@
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
-from starlette.status import HTTP_200_OK, HTTP_201_CREATED
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_304_NOT_MODIFIED,
+)
 
+from app.api.routes.utils.errors import exception_handler
+from app.core.cache import response_cache
 from app.db.gen.queries.models import Profile
-from app.models.user import GetUserRow
+from app.db.gen.queries.profiles import UpdateProfileParams
+from app.db.gen.queries.users import GetUserByEmailRow, RegisterNewUserRow
+from app.models.user import UserPublic
 from app.services.profiles import ProfilesService
 
 pytestmark = pytest.mark.asyncio
@@ -26,21 +34,79 @@ class TestProfilesRoutes:
         }
         res = await client.post(app.url_path_for("users:register-new-user"), json={"new_user": new_user})
         assert res.status_code == HTTP_201_CREATED
-        created_user = GetUserRow(**res.json())
+        created_user = UserPublic(**res.json())
         user_profile = await profiles_repo.get_profile_by_user_id(user_id=created_user.user_id)
         assert user_profile is not None
         assert isinstance(user_profile, Profile)
         await app.state._conn.commit()
 
 
+class TestProfileCache:
+    async def test_profile_is_served_from_cache_until_updated(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: RegisterNewUserRow,
+    ) -> None:
+        path = app.url_path_for("profiles:get-profile-by-username", username=test_user.username)
+        res = await authorized_client.get(path)
+        assert res.status_code == HTTP_200_OK
+        assert "email" not in res.json()
+        etag = res.headers["ETag"]
+
+        local_hits = response_cache.stats()["local_hits"]
+        res = await authorized_client.get(path, headers={"If-None-Match": etag})
+        assert res.status_code == HTTP_304_NOT_MODIFIED
+        assert response_cache.stats()["local_hits"] == local_hits + 1
+
+        res = await authorized_client.put(
+            app.url_path_for("profiles:update-own-profile"),
+            json={"profile_update": {"full_name": "Cached User"}},
+        )
+        assert res.status_code == HTTP_200_OK
+        res = await authorized_client.get(path, headers={"If-None-Match": etag})
+        assert res.status_code == HTTP_200_OK
+        assert res.headers["ETag"] != etag
+        assert res.json()["full_name"] == "Cached User"
+
+        await app.state._conn.rollback()
+
+    async def test_profile_cache_is_invalidated_once_the_update_commits(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: RegisterNewUserRow,
+    ) -> None:
+        conn = app.state._conn
+        path = app.url_path_for("profiles:get-profile-by-username", username=test_user.username)
+        res = await authorized_client.get(path)
+        assert res.status_code == HTTP_200_OK
+        profile = res.json()
+
+        async with exception_handler(conn):
+            await ProfilesService(conn).update_profile(
+                profile_update=UpdateProfileParams(
+                    full_name="Committed User", phone_number=None, bio=None, image=None, user_id=test_user.user_id
+                )
+            )
+            # concurrent requests still read the previous profile until the update commits
+            res = await authorized_client.get(path)
+            assert res.json() == profile
+
+        res = await authorized_client.get(path)
+        assert res.json()["full_name"] == "Committed User"
+
+        await conn.rollback()
+
+
 # not really worth it
 # class TestProfileView:
 #     async def test_authenticated_user_can_view_other_users_profile(
 #         self,
 #         app: FastAPI,
 #         authorized_client: AsyncClient,
-#         test_user: GetUserRow ,
-#         test_user2: GetUserRow ,
+#         test_user: GetUserByEmailRow ,
+#         test_user2: GetUserByEmailRow ,
 #     ) -> None:
 #         """
 #         Check if test_user (authorized by fixture authorized_client) can access the profile of test_user2.
@@ -53,7 +119,7 @@ class TestProfilesRoutes:
 #         assert profile.username == test_user2.username
 
 #     async def test_unregistered_users_cannot_access_other_users_profile(
-#         self, app: FastAPI, client: AsyncClient, test_user2: GetUserRow
+#         self, app: FastAPI, client: AsyncClient, test_user2: GetUserByEmailRow
 #     ) -> None:
 #         res = await client.get(app.url_path_for("profiles:get-profile-by-username", username=test_user2.username))  # type: ignore
 #         assert res.status_code == HTTP_401_UNAUTHORIZED  # authentication scope
@@ -81,7 +147,7 @@ class TestProfileManagement:
         self,
         app: FastAPI,
         authorized_client: AsyncClient,
-        test_user: GetUserRow,
+        test_user: GetUserByEmailRow,
         attr: str,
         value: str,
     ) -> None:
@@ -108,7 +174,7 @@ class TestProfileManagement:
         self,
         app: FastAPI,
         authorized_client: AsyncClient,
-        test_user: GetUserRow,
+        test_user: GetUserByEmailRow,
         attr: str,
         value: str,
         status_code: int,
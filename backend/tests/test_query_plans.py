@@ -0,0 +1,364 @@
+from datetime import datetime
+from types import ModuleType
+from typing import Any, Callable, Iterator
+
+import pytest
+import sqlalchemy
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.gen.queries import (
+    global_notifications,
+    password_reset_requests,
+    personal_notifications,
+    profiles,
+    users,
+)
+from app.db.gen.queries.global_notifications import (
+    GET_GLOBAL_NOTIFICATIONS_FEED,
+)
+from app.db.gen.queries.models import Role
+from app.db.gen.queries.personal_notifications import (
+    GET_PERSONAL_NOTIFICATIONS_FEED,
+)
+
+pytestmark = pytest.mark.asyncio
+
+SEED_USERS = 2000
+SEED_RECEIVERS = 200
+SEED_NOTIFICATIONS = 20_000
+SEQ_SCAN_ROW_THRESHOLD = 1000
+"""
+Sequential scans are only acceptable on tables smaller than this.
+"""
+
+SEED_STATEMENTS = (
+    f"""
+    insert into users (username, email, role, is_verified, salt, password)
+    select 'plan_user_' || i, 'plan_user_' || i || '@myapp.com', 'user', i % 50 != 0, 'salt', 'password'
+    from generate_series(1, {SEED_USERS}) i
+    """,
+    """
+    insert into profiles (user_id)
+    select user_id from users where username like 'plan_user_%'
+    """,
+    f"""
+    insert into global_notifications (receiver_role, title, body, label, created_at, updated_at)
+    select (array['user', 'manager', 'admin'])[1 + i % 3]::role, 'title', 'body', 'label',
+      now() - i * interval '1 minute',
+      now() - i * interval '1 minute' + (i % 7 = 0)::int * interval '30 seconds'
+    from generate_series(1, {SEED_NOTIFICATIONS}) i
+    """,
+    f"""
+    insert into personal_notifications (receiver_email, title, body, label, created_at, updated_at)
+    select 'plan_user_' || (1 + i % {SEED_RECEIVERS}) || '@myapp.com', 'title', 'body', 'label',
+      now() - i * interval '1 minute', now() - i * interval '1 minute'
+    from generate_series(1, {SEED_NOTIFICATIONS}) i
+    """,
+    "analyze users, profiles, global_notifications, personal_notifications",
+)
+
+
+async def seed_notifications(conn: AsyncConnection) -> None:
+    for statement in SEED_STATEMENTS:
+        await conn.execute(sqlalchemy.text(statement))
+
+
+async def explain(conn: AsyncConnection, query: str, params: dict[str, Any]) -> dict:
+    result = await conn.execute(sqlalchemy.text(f"EXPLAIN (FORMAT JSON) {query}"), params)
+    return result.scalar()[0]["Plan"]
+
+
+async def explain_analyze(conn: AsyncConnection, query: str, params: dict[str, Any]) -> dict:
+    result = await conn.execute(sqlalchemy.text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"), params)
+    return result.scalar()[0]["Plan"]
+
+
+def walk(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def rows_read(plan: dict) -> int:
+    """
+    Rows read from tables or indexes by every scan in the plan, including the ones filtered out.
+    """
+    return sum(
+        (node["Actual Rows"] + node.get("Rows Removed by Filter", 0)) * node["Actual Loops"]
+        for node in walk(plan)
+        if "Relation Name" in node
+    )
+
+
+class TestNotificationFeedPlans:
+    """
+    Feed pages return whole notifications, so their rows are fetched from the heap: deep pages are index range
+    scans reading about as many rows as the page holds, rather than index only scans.
+    """
+
+    page_chunk_size = 10
+
+    async def test_deep_global_notifications_feed_pages_read_bounded_index_ranges(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        await seed_notifications(conn)
+        roles = [Role.ADMIN, Role.MANAGER, Role.USER]
+        deep_page = (
+            await conn.execute(
+                sqlalchemy.text(
+                    """
+                    select updated_at, global_notification_id from global_notifications
+                    order by updated_at desc, global_notification_id desc offset :offset limit 1
+                    """
+                ),
+                {"offset": SEED_NOTIFICATIONS - 1000},
+            )
+        ).first()
+
+        for cursor_timestamp, cursor_id in ((datetime.max, 2**31 - 1), tuple(deep_page)):
+            plan = await explain_analyze(
+                conn,
+                GET_GLOBAL_NOTIFICATIONS_FEED,
+                {"p1": roles, "p2": cursor_timestamp, "p3": cursor_id, "p4": self.page_chunk_size},
+            )
+            assert plan["Actual Rows"] == self.page_chunk_size
+            scans = [node for node in walk(plan) if "Relation Name" in node]
+            assert {node["Node Type"] for node in scans} == {"Index Scan"}
+            # one bounded range per role, no matter how deep the page is
+            assert rows_read(plan) <= 5 * self.page_chunk_size * len(roles)
+
+        await conn.rollback()
+
+    async def test_deep_personal_notifications_feed_pages_read_bounded_index_ranges(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        await seed_notifications(conn)
+        receiver_email = "plan_user_1@myapp.com"
+        deep_page = (
+            await conn.execute(
+                sqlalchemy.text(
+                    """
+                    select created_at, personal_notification_id from personal_notifications
+                    where receiver_email = :receiver_email
+                    order by created_at desc, personal_notification_id desc offset :offset limit 1
+                    """
+                ),
+                {"receiver_email": receiver_email, "offset": SEED_NOTIFICATIONS // SEED_RECEIVERS - 20},
+            )
+        ).first()
+        feed_indexes = set(
+            (
+                await conn.execute(
+                    sqlalchemy.text(
+                        """
+                        select inhrelid::regclass::text from pg_inherits
+                        where inhparent = 'ix_personal_notifications_receiver_email_created_at_id'::regclass
+                        """
+                    )
+                )
+            ).scalars()
+        )
+
+        # partitions without rows yet are cheapest to read sequentially, and the unordered append of those scans
+        # is sorted instead of stopping once the page is full. Partitions holding notifications are read by index
+        await conn.execute(sqlalchemy.text("set local enable_seqscan = off"))
+
+        for cursor_timestamp, cursor_id in ((datetime.max, 2**31 - 1), tuple(deep_page)):
+            plan = await explain_analyze(
+                conn,
+                GET_PERSONAL_NOTIFICATIONS_FEED,
+                {"p1": receiver_email, "p2": cursor_timestamp, "p3": cursor_id, "p4": self.page_chunk_size},
+            )
+            assert plan["Actual Rows"] == self.page_chunk_size
+            # partitions are read newest first and older ones are never scanned once the page is full
+            scans = [node for node in walk(plan) if "Relation Name" in node and rows_read(node)]
+            assert {node.get("Index Name") for node in scans} <= feed_indexes
+            assert rows_read(plan) == self.page_chunk_size
+
+        await conn.rollback()
+
+
+QUERY_MODULES: list[ModuleType] = [
+    global_notifications,
+    password_reset_requests,
+    personal_notifications,
+    profiles,
+    users,
+]
+
+Params = Callable[[dict[str, Any]], dict[str, Any]]
+
+QUERY_PARAMS: dict[str, list[Params]] = {
+    # global_notifications
+    "CHECK_HAS_NEW_GLOBAL_NOTIFICATIONS": [lambda seed: {"p1": [Role.USER], "p2": seed["user_id"]}],
+    "CREATE_GLOBAL_NOTIFICATION": [
+        lambda seed: {"p1": None, "p2": Role.USER, "p3": "title", "p4": "body", "p5": "label", "p6": None}
+    ],
+    "CREATE_GLOBAL_NOTIFICATIONS": [
+        lambda seed: {
+            "p1": [None, None],
+            "p2": [Role.USER, Role.ADMIN],
+            "p3": ["title", "title"],
+            "p4": ["body", "body"],
+            "p5": ["label", "label"],
+            "p6": [None, None],
+        }
+    ],
+    "DELETE_GLOBAL_NOTIFICATION": [lambda seed: {"p1": seed["global_notification_id"]}],
+    "GET_GLOBAL_NOTIFICATIONS_BY_STARTING_DATE": [
+        lambda seed: {"p1": datetime.utcnow(), "p2": [Role.ADMIN, Role.MANAGER, Role.USER], "p3": 10}
+    ],
+    "GET_GLOBAL_NOTIFICATIONS_FEED": [
+        lambda seed: {"p1": [Role.ADMIN, Role.MANAGER, Role.USER], "p2": datetime.max, "p3": 2**31 - 1, "p4": 10}
+    ],
+    "GET_GLOBAL_NOTIFICATIONS_LATEST_UPDATED_AT": [lambda seed: {}],
+    "SEARCH_GLOBAL_NOTIFICATIONS": [
+        lambda seed: {"p1": "title", "p2": [Role.ADMIN, Role.MANAGER, Role.USER], "p3": datetime.utcnow(), "p4": 10}
+    ],
+    "SEARCH_GLOBAL_NOTIFICATIONS_BY_LABEL": [lambda seed: {"p1": "lable", "p2": [Role.USER], "p3": 10}],
+    # password_reset_requests
+    "CREATE_PASSWORD_RESET_REQUEST": [lambda seed: {"p1": seed["email"], "p2": "message"}],
+    "DELETE_PASSWORD_RESET_REQUEST": [lambda seed: {"p1": 1}],
+    "GET_PASSWORD_RESET_REQUESTS": [lambda seed: {}],
+    # personal_notifications
+    "CHECK_HAS_NEW_PERSONAL_NOTIFICATIONS": [lambda seed: {"p1": seed["email"]}],
+    "CLAIM_FAN_OUT_CHUNK": [lambda seed: {"p1": "fan-out", "p2": 0}],
+    "CREATE_PERSONAL_NOTIFICATION": [
+        lambda seed: {"p1": None, "p2": seed["email"], "p3": "title", "p4": "body", "p5": "label", "p6": None}
+    ],
+    "CREATE_PERSONAL_NOTIFICATIONS": [
+        lambda seed: {"p1": None, "p2": "title", "p3": "body", "p4": "label", "p5": None, "p6": [seed["email"]]}
+    ],
+    "DELETE_FAN_OUT_CHUNK_CLAIMS": [lambda seed: {"p1": datetime.utcnow()}],
+    "DELETE_PERSONAL_NOTIFICATION": [lambda seed: {"p1": seed["personal_notification_id"]}],
+    "GET_PERSONAL_NOTIFICATION_BY_ID": [lambda seed: {"p1": seed["personal_notification_id"]}],
+    "GET_PERSONAL_NOTIFICATIONS_BY_STARTING_DATE": [
+        lambda seed: {"p1": datetime.utcnow(), "p2": seed["email"], "p3": 10}
+    ],
+    "GET_PERSONAL_NOTIFICATIONS_FEED": [
+        lambda seed: {"p1": seed["email"], "p2": datetime.max, "p3": 2**31 - 1, "p4": 10}
+    ],
+    "SEARCH_PERSONAL_NOTIFICATIONS": [
+        lambda seed: {"p1": "title", "p2": seed["email"], "p3": datetime.utcnow(), "p4": 10}
+    ],
+    "SEARCH_PERSONAL_NOTIFICATIONS_BY_LABEL": [lambda seed: {"p1": "lable", "p2": seed["email"], "p3": 10}],
+    # profiles
+    "CREATE_PROFILE": [lambda seed: {"p1": None, "p2": None, "p3": None, "p4": None, "p5": seed["user_id"]}],
+    "GET_PROFILE_BY_ID": [lambda seed: {"p1": seed["user_id"]}],
+    "GET_PROFILE_BY_USERNAME": [lambda seed: {"p1": seed["username"]}],
+    "UPDATE_PROFILE": [lambda seed: {"p1": "Full Name", "p2": None, "p3": None, "p4": None, "p5": seed["user_id"]}],
+    # users
+    "CHECK_HAS_NEW_NOTIFICATIONS": [lambda seed: {"p1": [seed["user_id"]]}],
+    "GET_ROLES": [lambda seed: {}],
+    "GET_AUTH_USER_BY_USERNAME": [lambda seed: {"p1": seed["username"]}],
+    "GET_UNREAD_NOTIFICATION_COUNTS": [lambda seed: {"p1": seed["user_id"]}],
+    "GET_USER_BY_EMAIL": [lambda seed: {"p1": seed["email"]}],
+    "GET_USER_BY_ID": [lambda seed: {"p1": seed["user_id"]}],
+    "GET_USER_BY_USERNAME": [lambda seed: {"p1": seed["username"]}],
+    "LIST_ALL_USERS": [
+        lambda seed: {"p1": None, "p2": seed["user_id"], "p3": 50},
+        lambda seed: {"p1": False, "p2": 0, "p3": 50},
+    ],
+    "LIST_NOTIFICATION_RECIPIENTS": [
+        lambda seed: {"p1": None, "p2": None, "p3": None, "p4": seed["user_id"], "p5": 1000},
+        lambda seed: {"p1": Role.USER, "p2": True, "p3": [seed["email"]], "p4": 0, "p5": 1000},
+    ],
+    "REBUILD_USER_NOTIFICATION_STATE": [lambda seed: {}],
+    "REGISTER_NEW_USER": [
+        lambda seed: {
+            "p1": "new_user",
+            "p2": "new_user@myapp.com",
+            "p3": "password",
+            "p4": "salt",
+            "p5": False,
+            "p6": False,
+        }
+    ],
+    "RESET_USER_PASSWORD": [lambda seed: {"p1": "password", "p2": "salt", "p3": seed["email"]}],
+    "SEARCH_USERS": [
+        lambda seed: {"p1": seed["username"], "p2": None, "p3": 0, "p4": 20},
+        lambda seed: {"p1": seed["email"], "p2": 0.5, "p3": seed["user_id"], "p4": 20},
+    ],
+    "UPDATE_GLOBAL_LAST_NOTIFICATION_AT": [lambda seed: {"p1": datetime.utcnow(), "p2": seed["user_id"]}],
+    "UPDATE_PERSONAL_LAST_NOTIFICATION_AT": [lambda seed: {"p1": datetime.utcnow(), "p2": seed["user_id"]}],
+    "UPDATE_USER_BY_ID": [
+        lambda seed: {"p1": None, "p2": None, "p3": "new_username", "p4": None, "p5": seed["user_id"]}
+    ],
+    "UPDATE_USER_ROLE": [lambda seed: {"p1": Role.MANAGER, "p2": seed["user_id"]}],
+    "VERIFY_USERS_BY_EMAILS": [lambda seed: {"p1": [seed["email"], "unknown@myapp.com"]}],
+}
+
+FULL_TABLE_QUERIES = {"GET_PASSWORD_RESET_REQUESTS", "REBUILD_USER_NOTIFICATION_STATE"}
+"""
+Queries that return whole tables by design.
+"""
+
+
+def get_queries() -> dict[str, str]:
+    return {
+        name: value
+        for module in QUERY_MODULES
+        for name, value in vars(module).items()
+        if isinstance(value, str) and value.startswith("-- name:")
+    }
+
+
+async def get_seed(conn: AsyncConnection) -> dict[str, Any]:
+    user = (
+        await conn.execute(sqlalchemy.text("select user_id, email, username from users where username = 'plan_user_1'"))
+    ).first()
+    return {
+        "user_id": user.user_id,
+        "email": user.email,
+        "username": user.username,
+        "global_notification_id": (
+            await conn.execute(sqlalchemy.text("select max(global_notification_id) from global_notifications"))
+        ).scalar(),
+        "personal_notification_id": (
+            await conn.execute(sqlalchemy.text("select max(personal_notification_id) from personal_notifications"))
+        ).scalar(),
+    }
+
+
+class TestQueryPlans:
+    async def test_every_query_has_plan_check_params(self) -> None:
+        assert set(get_queries()) == set(QUERY_PARAMS)
+
+    async def test_queries_do_not_fall_back_to_sequential_scans(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        conn: AsyncConnection = app.state._conn
+        await seed_notifications(conn)
+        seed = await get_seed(conn)
+        table_rows = {
+            row.relname: row.reltuples
+            for row in await conn.execute(
+                sqlalchemy.text("select relname, reltuples from pg_class where relkind in ('r', 'p')")
+            )
+        }
+
+        seq_scans: list[str] = []
+        for name, query in get_queries().items():
+            if name in FULL_TABLE_QUERIES:
+                continue
+            for params in QUERY_PARAMS[name]:
+                plan = await explain(conn, query, params(seed))
+                seq_scans.extend(
+                    f"{name} scans {node['Relation Name']}"
+                    for node in walk(plan)
+                    if node["Node Type"] == "Seq Scan"
+                    and table_rows.get(node["Relation Name"], 0) > SEQ_SCAN_ROW_THRESHOLD
+                )
+        assert not seq_scans, seq_scans
+
+        await conn.rollback()
@@ -1,9 +1,22 @@
+import asyncio
+import json
+
 import fakeredis
+import fakeredis.aioredis
 import pytest
 import redis_lock
 from loguru import logger
 
-from app.celery.locking import rds
+from app.celery.locking import rds, task_lock
+from app.core.cache import TwoTierCache
+from app.core.locks import DistributedLock, LockNotAcquiredError, lock_metrics
+from app.core.redis import RedisPool
+
+
+class Connection:
+    """
+    Stands in for the connection whose transaction changed the cached values.
+    """
 
 
 def flaky(fn, timeout=10, max_runs=3):
@@ -30,3 +43,193 @@ def flaky(fn, timeout=10, max_runs=3):
 #             with redis_lock.Lock(rds, "test_lock", expire=1) as lock2:
 #                 logger.critical(f"acquired lock {lock2.get_owner_id()}")
 #                 logger.critical(f"acquired lock {lock2.id}")
+
+
+@pytest.fixture
+def redis_pool() -> RedisPool:
+    server = fakeredis.FakeServer()
+    pool = RedisPool("redis://", max_connections=1)
+    pool.use(sync=fakeredis.FakeStrictRedis(server=server), aio=fakeredis.aioredis.FakeRedis(server=server))
+    return pool
+
+
+class TestRedisPool:
+    @pytest.mark.asyncio
+    async def test_sync_and_async_facades_share_values(self, redis_pool: RedisPool) -> None:
+        redis_pool.sync.set_json("key", {"a": [1, 2]})
+        assert await redis_pool.aio.get_json("key") == {"a": [1, 2]}
+        await redis_pool.aio.set_json("key", None)
+        assert redis_pool.sync.get_json("key") is None
+        assert await redis_pool.aio.delete("key") == 1
+        assert redis_pool.sync.get_json("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_lock_is_exclusive_across_facades(self, redis_pool: RedisPool) -> None:
+        lock = redis_pool.aio.lock("lock", timeout=5)
+        assert await lock.acquire(blocking=False)
+        assert not redis_pool.sync.lock("lock", timeout=5).acquire(blocking=False)
+        await lock.release()
+        assert redis_pool.sync.lock("lock", timeout=5).acquire(blocking=False)
+
+    @pytest.mark.asyncio
+    async def test_async_subscribers_receive_published_messages(self, redis_pool: RedisPool) -> None:
+        pubsub = await redis_pool.aio.subscribe("channel")
+        assert redis_pool.sync.publish("channel", {"user_id": 1}) == 1
+        message = None
+        for _ in range(10):
+            message = await pubsub.get_message(timeout=0.1)
+            if message is not None:
+                break
+        assert message is not None
+        assert json.loads(message["data"]) == {"user_id": 1}
+        await pubsub.close()
+
+
+class TestDistributedLock:
+    @pytest.mark.asyncio
+    async def test_fencing_tokens_increase_with_every_acquisition(self, redis_pool: RedisPool) -> None:
+        async with DistributedLock("lock", redis=redis_pool.aio) as lock:
+            first = lock.token
+        async with DistributedLock("lock", redis=redis_pool.aio) as lock:
+            assert lock.token > first
+
+    @pytest.mark.asyncio
+    async def test_held_lock_is_rejected(self, redis_pool: RedisPool) -> None:
+        rejected = lock_metrics.rejected
+        async with DistributedLock("lock", redis=redis_pool.aio):
+            with pytest.raises(LockNotAcquiredError):
+                await DistributedLock("lock", redis=redis_pool.aio).acquire()
+            with pytest.raises(LockNotAcquiredError):
+                await DistributedLock("lock", blocking_timeout=0.2, redis=redis_pool.aio).acquire()
+        assert lock_metrics.rejected == rejected + 2
+
+    @pytest.mark.asyncio
+    async def test_blocking_acquire_waits_for_release(self, redis_pool: RedisPool) -> None:
+        holder = DistributedLock("lock", redis=redis_pool.aio)
+        await holder.acquire()
+        asyncio.get_running_loop().call_later(0.2, lambda: asyncio.ensure_future(holder.release()))
+        async with DistributedLock("lock", blocking_timeout=2, redis=redis_pool.aio) as lock:
+            assert lock.token > 1
+
+    @pytest.mark.asyncio
+    async def test_lease_is_extended_while_held(self, redis_pool: RedisPool) -> None:
+        async with DistributedLock("lock", lease=0.3, redis=redis_pool.aio) as lock:
+            await asyncio.sleep(0.6)
+            with pytest.raises(LockNotAcquiredError):
+                await DistributedLock("lock", redis=redis_pool.aio).acquire()
+        assert not lock.lost
+
+    @pytest.mark.asyncio
+    async def test_lost_lease_is_reported(self, redis_pool: RedisPool) -> None:
+        lost = lock_metrics.lost
+        async with DistributedLock("lock", lease=0.3, redis=redis_pool.aio) as lock:
+            await redis_pool.aio.delete(lock.key)
+            await asyncio.sleep(0.2)
+        assert lock.lost
+        assert lock_metrics.lost == lost + 1
+
+    @pytest.mark.asyncio
+    async def test_task_lock_fails_concurrent_tasks(
+        self, redis_pool: RedisPool, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr("app.core.locks.redis_pool", redis_pool)
+
+        @task_lock(main_key="task", lease=5)
+        async def task(value):
+            await asyncio.sleep(0.2)
+            return value
+
+        first = asyncio.create_task(task(1))
+        await asyncio.sleep(0.05)
+        with pytest.raises(LockNotAcquiredError):
+            await task(1)
+        assert await task(2) == 2
+        assert await first == 1
+
+
+class TestTwoTierCache:
+    @pytest.mark.asyncio
+    async def test_values_are_shared_and_invalidated_by_tag(self, redis_pool: RedisPool) -> None:
+        # two processes sharing redis
+        cache, other_cache = [
+            TwoTierCache("test", redis_pool=redis_pool, ttl=60, local_ttl=60, local_maxsize=10) for _ in range(2)
+        ]
+        await cache.set("a", "1", tags=["tag"])
+        await cache.set("b", "2", tags=["other_tag"])
+        assert await cache.get("a") == "1"
+        assert await other_cache.get("a") == "1"
+        assert await other_cache.get("a") == "1"
+        assert other_cache.stats() == {
+            "local_size": 1,
+            "local_hits": 1,
+            "redis_hits": 1,
+            "misses": 0,
+            "errors": 0,
+            "hit_ratio": 1,
+        }
+
+        await other_cache.invalidate_tags("tag")
+        assert await other_cache.get("a") is None
+        assert await other_cache.get("b") == "2"
+        # local values of other processes are only invalidated when they expire
+        assert await cache.get("a") == "1"
+        cache.local.clear()
+        assert await cache.get("a") is None
+
+    @pytest.mark.asyncio
+    async def test_tags_are_invalidated_once_committed(self, redis_pool: RedisPool) -> None:
+        cache = TwoTierCache("test", redis_pool=redis_pool, ttl=60, local_ttl=60, local_maxsize=10)
+        committed_conn, rolled_back_conn = Connection(), Connection()
+        await cache.set("a", "1", tags=["tag"])
+        await cache.set("b", "2", tags=["other_tag"])
+
+        cache.invalidate_tags_on_commit(committed_conn, "tag")
+        cache.invalidate_tags_on_commit(rolled_back_conn, "other_tag")
+        assert await cache.get("a") == "1"
+
+        await cache.invalidate_committed_tags(committed_conn)
+        cache.discard_uncommitted_tags(rolled_back_conn)
+        await cache.invalidate_committed_tags(rolled_back_conn)
+        assert await cache.get("a") is None
+        assert await cache.get("b") == "2"
+
+    @pytest.mark.asyncio
+    async def test_other_caches_are_invalidated_once_committed(self, redis_pool: RedisPool) -> None:
+        cache = TwoTierCache("test", redis_pool=redis_pool, ttl=60, local_ttl=60, local_maxsize=10)
+        committed_conn, rolled_back_conn = Connection(), Connection()
+        invalidated = []
+
+        cache.invalidate_on_commit(committed_conn, lambda: invalidated.append("committed"))
+        cache.invalidate_on_commit(rolled_back_conn, lambda: invalidated.append("rolled back"))
+        assert invalidated == []
+
+        await cache.invalidate_committed_tags(committed_conn)
+        cache.discard_uncommitted_tags(rolled_back_conn)
+        await cache.invalidate_committed_tags(rolled_back_conn)
+        assert invalidated == ["committed"]
+
+    @pytest.mark.asyncio
+    async def test_values_computed_before_their_tags_are_invalidated_are_not_set(self, redis_pool: RedisPool) -> None:
+        # two processes sharing redis
+        cache, other_cache = [
+            TwoTierCache("test", redis_pool=redis_pool, ttl=60, local_ttl=60, local_maxsize=10) for _ in range(2)
+        ]
+        generation = await cache.get_generation()
+        await other_cache.invalidate_tags("tag")
+        await cache.set("a", "1", tags=["tag"], generation=generation)
+        await cache.set("b", "2", tags=["other_tag"], generation=generation)
+        assert await cache.get("a") is None
+        assert await other_cache.get("a") is None
+        assert await other_cache.get("b") == "2"
+
+        generation = await cache.get_generation()
+        await cache.invalidate_tags("other_tag")
+        await cache.set("a", "1", tags=["tag"], generation=generation)
+        # shared, but not kept in memory since any invalidation in this process counts
+        assert "a" not in cache.local._entries
+        assert await other_cache.get("a") == "1"
+
+        generation = await cache.get_generation()
+        await cache.set("c", "3", tags=["tag"], generation=generation)
+        assert await cache.get("c") == "3"
+        assert cache.stats()["errors"] == 0
@@ -0,0 +1,241 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from app.db.gen.queries.global_notifications import (
+    CreateGlobalNotificationParams,
+)
+from app.db.gen.queries.models import Role
+from app.db.gen.queries.personal_notifications import (
+    CreatePersonalNotificationParams,
+)
+from app.db.gen.queries.users import (
+    GetAuthUserByUsernameRow,
+    GetUserByEmailRow,
+    UpdateGlobalLastNotificationAtParams,
+)
+from app.services.global_notifications import GlobalNotificationsService
+from app.services.maintenance import MaintenanceService
+from app.services.personal_notifications import PersonalNotificationsService
+from app.services.users import UsersService
+from app.stream.checker import NotificationsChecker
+from app.stream.models import NotificationsState
+from app.stream.registry import SubscriberRegistry
+from tests.conftest import run_migration
+
+pytestmark = pytest.mark.asyncio
+
+
+class TestSubscriberRegistry:
+    async def test_global_notifications_reach_subscribers_in_role_scope(self) -> None:
+        registry = SubscriberRegistry()
+        with registry.subscription(email="user@myapp.com", role=Role.USER) as user_sub, registry.subscription(
+            email="manager@myapp.com", role=Role.MANAGER
+        ) as manager_sub:
+            registry.publish_global(receiver_role=Role.MANAGER)
+            assert await manager_sub.wait_for_change(timeout=0.1)
+            assert not await user_sub.wait_for_change(timeout=0.1)
+
+            registry.publish_global(receiver_role=Role.USER)
+            assert await manager_sub.wait_for_change(timeout=0.1)
+            assert await user_sub.wait_for_change(timeout=0.1)
+        assert len(registry) == 0
+
+    async def test_personal_notifications_reach_receiver_only(self) -> None:
+        registry = SubscriberRegistry()
+        with registry.subscription(email="user@myapp.com", role=Role.USER) as sub, registry.subscription(
+            email="user2@myapp.com", role=Role.USER
+        ) as other_sub:
+            registry.publish_personal(receiver_email="user@myapp.com")
+            assert await sub.wait_for_change(timeout=0.1)
+            assert not await other_sub.wait_for_change(timeout=0.1)
+            # events are consumed once
+            assert not await sub.wait_for_change(timeout=0.1)
+
+
+class CountingNotificationsChecker(NotificationsChecker):
+    batches = 0
+
+    async def _check_batch(self, users: list[GetAuthUserByUsernameRow]) -> dict[int, NotificationsState]:
+        self.batches += 1
+        return await super()._check_batch(users)
+
+
+class TestNotificationsChecker:
+    async def test_concurrent_checks_are_answered_in_a_single_batch(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user_list: list[GetUserByEmailRow],
+    ) -> None:
+        @asynccontextmanager
+        async def connect():
+            yield app.state._conn
+
+        receiver, *others = test_user_list
+        await PersonalNotificationsService(app.state._conn).create_personal_notification(
+            notification=CreatePersonalNotificationParams(
+                sender=None,
+                receiver_email=receiver.email,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+
+        checker = CountingNotificationsChecker(connect)
+        states = await asyncio.gather(*(checker.check(user=user) for user in test_user_list * 3))
+        assert checker.batches == 1
+        for user, state in zip(test_user_list * 3, states):
+            assert state.has_new_personal_notifications == (user.user_id == receiver.user_id)
+
+        await app.state._conn.rollback()
+
+    async def test_global_notifications_are_checked_against_the_high_water_mark(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        @asynccontextmanager
+        async def connect():
+            yield app.state._conn
+
+        notification = await GlobalNotificationsService(app.state._conn).create_global_notification(
+            notification=CreateGlobalNotificationParams(
+                sender=None,
+                receiver_role=Role.USER,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+
+        checker = NotificationsChecker(connect)
+        assert (await checker.check(user=test_user)).has_new_global_notifications
+        seen = test_user.copy(update={"last_global_notification_at": notification.updated_at})
+        assert not (await checker.check(user=seen)).has_new_global_notifications
+
+        await app.state._conn.rollback()
+        GlobalNotificationsService.invalidate_latest_updated_at()
+
+
+class TestGlobalNotificationsHighWaterMark:
+    async def test_new_notifications_invalidate_the_high_water_mark(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+    ) -> None:
+        service = GlobalNotificationsService(app.state._conn)
+        latest_updated_at = await service.get_latest_updated_at()
+        last_seen_by_users = latest_updated_at.get(Role.USER, datetime.min)
+        assert not await service.has_new_global_notifications(
+            role=Role.USER, last_global_notification_at=last_seen_by_users
+        )
+
+        notification = await service.create_global_notification(
+            notification=CreateGlobalNotificationParams(
+                sender=None,
+                receiver_role=Role.MANAGER,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+        last_seen_by_managers = notification.updated_at - timedelta(microseconds=1)
+        assert await service.has_new_global_notifications(
+            role=Role.MANAGER, last_global_notification_at=last_seen_by_managers
+        )
+        assert await service.has_new_global_notifications(
+            role=Role.ADMIN, last_global_notification_at=last_seen_by_managers
+        )
+        # managers' notifications are not visible to users
+        assert not await service.has_new_global_notifications(
+            role=Role.USER, last_global_notification_at=last_seen_by_users
+        )
+
+        await app.state._conn.rollback()
+        GlobalNotificationsService.invalidate_latest_updated_at()
+
+
+class TestUserNotificationState:
+    async def test_counters_follow_notification_writes_and_reads(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn = app.state._conn
+        users_service = UsersService(conn)
+        notification = await GlobalNotificationsService(conn).create_global_notification(
+            notification=CreateGlobalNotificationParams(
+                sender=None,
+                receiver_role=Role.USER,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+        state = (await users_service.check_has_new_notifications(user_ids=[test_user.user_id]))[test_user.user_id]
+        assert state.has_new_global_notifications
+
+        await users_service.users_querier.update_global_last_notification_at(
+            arg=UpdateGlobalLastNotificationAtParams(
+                user_id=test_user.user_id, last_global_notification_at=notification.updated_at
+            )
+        )
+        state = (await users_service.check_has_new_notifications(user_ids=[test_user.user_id]))[test_user.user_id]
+        assert not state.has_new_global_notifications
+
+        # drifted counters are fixed by a rebuild
+        await conn.execute(sqlalchemy.text("update cache.user_notification_state set unread_global_count = 42"))
+        await MaintenanceService(conn).rebuild_user_notification_state()
+        state = (await users_service.check_has_new_notifications(user_ids=[test_user.user_id]))[test_user.user_id]
+        assert not state.has_new_global_notifications
+
+        await conn.rollback()
+
+    async def test_migration_counts_notifications_unread_before_it(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: GetUserByEmailRow,
+    ) -> None:
+        conn = app.state._conn
+        await run_migration(conn, revision="00000006", direction="downgrade")
+        await GlobalNotificationsService(conn).create_global_notification(
+            notification=CreateGlobalNotificationParams(
+                sender=None,
+                receiver_role=Role.USER,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+        await PersonalNotificationsService(conn).create_personal_notification(
+            notification=CreatePersonalNotificationParams(
+                sender=None,
+                receiver_email=test_user.email,
+                title="Test notification",
+                body="Test body",
+                label="Test label",
+                link=None,
+            )
+        )
+
+        await run_migration(conn, revision="00000006", direction="upgrade")
+        counts = await UsersService(conn).get_unread_notification_counts(user_id=test_user.user_id)
+        assert counts.unread_global_count >= 1
+        assert counts.unread_personal_count >= 1
+
+        await conn.rollback()
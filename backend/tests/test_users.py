@@ -1,13 +1,17 @@
+import asyncio
 import re
+import threading
 from pathlib import Path
 from typing import Callable, Optional, Set, Type, Union
 
 import jwt
 import pytest
+from fakeredis.aioredis import FakeRedis
 from fastapi import FastAPI, HTTPException, status
 from httpx import AsyncClient
 from loguru import logger
 from pydantic import EmailStr, ValidationError
+from redis.exceptions import ConnectionError as RedisConnectionError
 from starlette.datastructures import Secret
 from starlette.status import (
     HTTP_200_OK,
@@ -23,16 +27,28 @@ from starlette.status import (
 from app.api.routes.users import router as users_router
 from app.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    AUTH_USER_CACHE_TTL,
     JWT_ALGORITHM,
     JWT_AUDIENCE,
     UNIQUE_KEY,
 )
+from app.core.executors import BoundedExecutor, ExecutorBusyError
+from app.db.gen.queries.global_notifications import (
+    CreateGlobalNotificationParams,
+)
+from app.db.gen.queries.models import Role
 from app.db.gen.queries.password_reset_requests import (
     CreatePasswordResetRequestParams,
 )
-from app.db.gen.queries.users import GetUserRow
+from app.db.gen.queries.personal_notifications import (
+    CreatePersonalNotificationParams,
+)
+from app.db.gen.queries.users import GetUserByEmailRow
 from app.models.user import UserCreate, UserPublic, UserUpdate
 from app.services import auth_service
+from app.services.authentication import REVOCATION_EPOCH_KEY, AuthService
+from app.services.global_notifications import GlobalNotificationsService
+from app.services.personal_notifications import PersonalNotificationsService
 from app.services.users import UsersService
 from tests.conftest import TEST_USERS
 
@@ -77,7 +93,7 @@ class TestUserRoutes:
         self,
         app: FastAPI,
         create_authorized_client: Callable,
-        test_unverified_user: GetUserRow,
+        test_unverified_user: GetUserByEmailRow,
         test_user: UserPublic,
     ) -> None:
         authorized_client_unverified: AsyncClient = create_authorized_client(user=test_unverified_user)
@@ -106,7 +122,7 @@ class TestUserRoutes:
             res = await client.post(app.url_path_for("users:register-new-user"), json={"new_user": new_user})
             assert res.status_code == HTTP_201_CREATED
             users_service = UsersService(app.state._conn)
-            user_in_db = await users_service.get_user_by_email(email=new_user["email"], get_db_data=True)  # type: ignore
+            user_in_db = await users_service.get_user_by_email(email=new_user["email"])  # type: ignore
             assert user_in_db is not None
             assert user_in_db.is_verified
 
@@ -116,7 +132,7 @@ class TestUserRoutes:
         self,
         app: FastAPI,
         create_authorized_client: Callable,
-        test_unverified_user: GetUserRow,
+        test_unverified_user: GetUserByEmailRow,
         test_user: UserPublic,
     ) -> None:
         authorized_client: AsyncClient = create_authorized_client(user=test_user)
@@ -153,7 +169,7 @@ class TestUserRegistration:
         res = await client.post(app.url_path_for("users:register-new-user"), json={"new_user": new_user})
         assert res.status_code == HTTP_201_CREATED
 
-        user_in_db = await users_service.get_user_by_email(email=new_user["email"], get_db_data=True)  # type: ignore
+        user_in_db = await users_service.get_user_by_email(email=new_user["email"])  # type: ignore
         assert user_in_db is not None
         assert user_in_db.email == new_user["email"].lower()
         assert user_in_db.username == new_user["username"]
@@ -259,8 +275,8 @@ class TestUserRegistration:
         res = await client.post(app.url_path_for("users:register-new-user"), json={"new_user": new_user.dict()})
         assert res.status_code == HTTP_201_CREATED
 
-        user_in_db = await users_service.get_user_by_email(email=new_user.email, get_db_data=True)  # type: ignore
-        assert isinstance(user_in_db, GetUserRow)
+        user_in_db = await users_service.get_user_by_email(email=new_user.email)  # type: ignore
+        assert isinstance(user_in_db, GetUserByEmailRow)
         assert user_in_db is not None
         assert user_in_db.salt is not None
         assert user_in_db.password != new_user.password
@@ -287,7 +303,7 @@ class TestUserUpdate:
         self,
         app: FastAPI,
         create_authorized_client: Callable,
-        get_fixture: GetUserRow,
+        get_fixture: GetUserByEmailRow,
         attr: str,
         value: str,
         request,
@@ -375,6 +391,35 @@ class TestUserUpdate:
 
         await app.state._conn.rollback()
 
+    async def test_updated_password_is_stored_hashed(
+        self,
+        app: FastAPI,
+        create_authorized_client: Callable,
+        test_user5: UserPublic,
+    ) -> None:
+        authorized_client: AsyncClient = create_authorized_client(user=test_user5)
+        res = await authorized_client.put(
+            app.url_path_for("users:update-user-by-id"),
+            json={
+                "user_update": UserUpdate(
+                    password="anewpassword",
+                    old_password=TEST_USERS["test_user5"].password,
+                ).dict(),
+            },
+        )
+        assert res.status_code == HTTP_200_OK
+
+        user_in_db = await UsersService(app.state._conn).get_user_by_id(user_id=test_user5.user_id)
+        assert user_in_db is not None
+        assert auth_service.verify_password(
+            password="anewpassword", salt=user_in_db.salt, hashed_pw=user_in_db.password
+        )
+        assert not auth_service.verify_password(
+            password=TEST_USERS["test_user5"].password, salt=user_in_db.salt, hashed_pw=user_in_db.password
+        )
+
+        await app.state._conn.rollback()
+
     async def test_user_cannot_update_password_without_old_password(
         self,
         app: FastAPI,
@@ -606,6 +651,102 @@ class TestUserLogin:
 
         await app.state._conn.rollback()
 
+    async def test_verified_tokens_are_cached_until_revoked(
+        self, app: FastAPI, client: AsyncClient, test_user: UserPublic
+    ) -> None:
+
+        token = auth_service.create_access_token_for_user(user=test_user, secret_key=str(UNIQUE_KEY))
+        payload = auth_service.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+        assert auth_service.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY)) is payload
+
+        await auth_service.revoke_cached_tokens()
+        revalidated_payload = auth_service.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+        assert revalidated_payload is not payload
+        assert revalidated_payload == payload
+
+        await app.state._conn.rollback()
+
+    async def test_token_revocations_are_shared_between_processes(
+        self, app: FastAPI, client: AsyncClient, test_user: UserPublic
+    ) -> None:
+
+        other_process = AuthService()
+        other_process.redis_pool = auth_service.redis_pool
+        token = auth_service.create_access_token_for_user(user=test_user, secret_key=str(UNIQUE_KEY))
+        await other_process.refresh_revocation_epoch()
+        payload = other_process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+
+        await auth_service.revoke_cached_tokens()
+        await other_process.refresh_revocation_epoch()
+        # the shared epoch is read at most every AUTH_USER_CACHE_TTL seconds
+        assert other_process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY)) is payload
+
+        other_process.revocation_epoch_checked_at -= AUTH_USER_CACHE_TTL
+        await other_process.refresh_revocation_epoch()
+        assert other_process.revocation_epoch == auth_service.revocation_epoch
+        assert other_process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY)) is not payload
+
+        await app.state._conn.rollback()
+
+    async def test_token_revocations_without_redis_are_not_undone_by_the_next_refresh(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user: UserPublic,
+        response_cache_redis: FakeRedis,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+
+        process = AuthService()
+        process.redis_pool = auth_service.redis_pool
+        token = auth_service.create_access_token_for_user(user=test_user, secret_key=str(UNIQUE_KEY))
+        await process.revoke_cached_tokens()
+        payload = process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+
+        async def incr(*args, **kwargs):
+            raise RedisConnectionError("redis is down")
+
+        with monkeypatch.context() as m:
+            m.setattr(response_cache_redis, "incr", incr)
+            await process.revoke_cached_tokens()
+        assert process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY)) is not payload
+
+        process.revocation_epoch_checked_at -= AUTH_USER_CACHE_TTL
+        await process.refresh_revocation_epoch()
+        assert process.revocation_epoch == int(await response_cache_redis.get(REVOCATION_EPOCH_KEY))
+        assert process.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY)) is not payload
+
+        await app.state._conn.rollback()
+
+    async def test_expired_tokens_are_never_cached(
+        self, app: FastAPI, client: AsyncClient, test_user: UserPublic
+    ) -> None:
+
+        token = auth_service.create_access_token_for_user(user=test_user, secret_key=str(UNIQUE_KEY), expires_in=-1)
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                auth_service.get_payload_from_token(token=str(token), secret_key=str(UNIQUE_KEY))
+
+        await app.state._conn.rollback()
+
+
+class TestPasswordHashingExecutor:
+    async def test_calls_beyond_the_queue_are_rejected(self) -> None:
+        executor = BoundedExecutor("test", kind="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        assert executor.stats()["queued"] == 1
+
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(release.wait, 5)
+
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert executor.stats()["completed"] == 2
+        assert executor.stats()["rejected"] == 1
+        executor.shutdown()
+
 
 class TestUserMe:
     async def test_authenticated_user_can_retrieve_own_data(
@@ -624,6 +765,51 @@ class TestUserMe:
 
         await app.state._conn.rollback()
 
+    async def test_own_data_is_not_served_stale_after_update(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+    ) -> None:
+
+        res = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert res.status_code == HTTP_200_OK
+        assert UserPublic(**res.json()).email == test_user.email
+
+        new_email = "thisisanontakenemail@myapp.io"
+        res = await authorized_client.put(
+            app.url_path_for("users:update-user-by-id"),
+            json={"user_update": {"email": new_email}},
+        )
+        assert res.status_code == HTTP_200_OK
+
+        res = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert res.status_code == HTTP_200_OK
+        assert UserPublic(**res.json()).email == new_email
+
+        await app.state._conn.rollback()
+
+    async def test_own_data_includes_profile_but_not_credentials(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+    ) -> None:
+
+        res = await authorized_client.put(
+            app.url_path_for("profiles:update-own-profile"),
+            json={"profile_update": {"full_name": "Test User"}},
+        )
+        assert res.status_code == HTTP_200_OK
+
+        res = await authorized_client.get(app.url_path_for("users:get-current-user"))
+        assert res.status_code == HTTP_200_OK
+        assert res.json()["full_name"] == "Test User"
+        assert "salt" not in res.json()
+        assert "password" not in res.json()
+
+        await app.state._conn.rollback()
+
     async def test_user_cannot_access_own_data_if_not_authenticated(
         self,
         app: FastAPI,
@@ -709,3 +895,178 @@ class TestUserPasswordReset:
         assert res.status_code == HTTP_404_NOT_FOUND
 
         await app.state._conn.rollback()
+
+
+class TestNotificationsFeed:
+    async def test_user_can_page_through_global_notifications_feed_with_cursor(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+    ) -> None:
+        # created in the same transaction, so they share timestamps and are ordered by id
+        gn_service = GlobalNotificationsService(app.state._conn)
+        for i in range(7):
+            await gn_service.create_global_notification(
+                notification=CreateGlobalNotificationParams(
+                    sender=None,
+                    receiver_role=Role.USER,
+                    title=f"Test notification {i}",
+                    body="Test body",
+                    label="Test label",
+                    link=None,
+                )
+            )
+
+        items: list[dict] = []
+        cursor = None
+        while True:
+            res = await authorized_client.get(
+                app.url_path_for("users:get-global-notifications-feed"),
+                params={"page_chunk_size": 3, **({"cursor": cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            page = res.json()
+            assert len(page["items"]) <= 3
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        ids = [item["global_notification_id"] for item in items]
+        assert len(ids) == len(set(ids))
+        assert len(ids) >= 7
+        keys = [(item["event_timestamp"], item["global_notification_id"]) for item in items]
+        assert keys == sorted(keys, reverse=True)
+
+        res = await authorized_client.get(
+            app.url_path_for("users:get-global-notifications-feed"), params={"cursor": "not a cursor"}
+        )
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+        await app.state._conn.rollback()
+
+    async def test_user_can_page_through_personal_notifications_feed_with_cursor(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+        test_user2: UserPublic,
+    ) -> None:
+        # created in the same transaction, so they share timestamps and are ordered by id
+        pn_service = PersonalNotificationsService(app.state._conn)
+        for i in range(7):
+            for receiver in (test_user, test_user2):
+                await pn_service.create_personal_notification(
+                    notification=CreatePersonalNotificationParams(
+                        sender=None,
+                        receiver_email=receiver.email,
+                        title=f"Test notification {i}",
+                        body="Test body",
+                        label="Test label",
+                        link=None,
+                    )
+                )
+
+        items: list[dict] = []
+        cursor = None
+        while True:
+            res = await authorized_client.get(
+                app.url_path_for("users:get-personal-notifications-feed"),
+                params={"page_chunk_size": 3, **({"cursor": cursor} if cursor else {})},
+            )
+            assert res.status_code == HTTP_200_OK
+            page = res.json()
+            assert len(page["items"]) <= 3
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        ids = [item["personal_notification_id"] for item in items]
+        assert len(ids) == len(set(ids))
+        assert len(ids) >= 7
+        assert {item["receiver_email"] for item in items} == {test_user.email}
+        keys = [(item["event_timestamp"], item["personal_notification_id"]) for item in items]
+        assert keys == sorted(keys, reverse=True)
+
+        res = await authorized_client.get(
+            app.url_path_for("users:get-personal-notifications-feed"), params={"cursor": "not a cursor"}
+        )
+        assert res.status_code == HTTP_400_BAD_REQUEST
+
+        await app.state._conn.rollback()
+
+
+class TestUnreadNotificationCounts:
+    async def test_unread_counts_follow_new_and_seen_notifications(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+    ) -> None:
+        res = await authorized_client.get(app.url_path_for("users:get-unread-notification-counts"))
+        assert res.status_code == HTTP_200_OK
+        unread_personal_count = res.json()["unread_personal_count"]
+
+        service = PersonalNotificationsService(app.state._conn)
+        for title in ("First notification", "Second notification"):
+            await service.create_personal_notification(
+                notification=CreatePersonalNotificationParams(
+                    sender=None,
+                    receiver_email=test_user.email,
+                    title=title,
+                    body="Test body",
+                    label="Test label",
+                    link=None,
+                )
+            )
+        res = await authorized_client.get(app.url_path_for("users:get-unread-notification-counts"))
+        assert res.status_code == HTTP_200_OK
+        assert res.json()["unread_personal_count"] == unread_personal_count + 2
+
+        # the first page of the feed marks every notification as seen
+        res = await authorized_client.get(app.url_path_for("users:get-personal-notifications-feed"))
+        assert res.status_code == HTTP_200_OK
+        res = await authorized_client.get(app.url_path_for("users:get-unread-notification-counts"))
+        assert res.status_code == HTTP_200_OK
+        assert res.json()["unread_personal_count"] == 0
+
+        await app.state._conn.rollback()
+
+
+class TestNotificationsSearch:
+    async def test_search_matches_full_text_then_similar_labels(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user: UserPublic,
+    ) -> None:
+        service = PersonalNotificationsService(app.state._conn)
+        for title, label in (("Scheduled maintenance", "maintenance"), ("Password changed", "security")):
+            await service.create_personal_notification(
+                notification=CreatePersonalNotificationParams(
+                    sender=None,
+                    receiver_email=test_user.email,
+                    title=title,
+                    body="Test body",
+                    label=label,
+                    link=None,
+                )
+            )
+
+        res = await authorized_client.get(
+            app.url_path_for("users:search-personal-notifications"), params={"q": "passwords"}
+        )
+        assert res.status_code == HTTP_200_OK
+        assert not res.json()["fuzzy"]
+        assert "Password changed" in [item["title"] for item in res.json()["items"]]
+
+        res = await authorized_client.get(
+            app.url_path_for("users:search-personal-notifications"), params={"q": "securty"}
+        )
+        assert res.status_code == HTTP_200_OK
+        assert res.json()["fuzzy"]
+        assert "security" in [item["label"] for item in res.json()["items"]]
+
+        await app.state._conn.rollback()